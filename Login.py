@@ -15,10 +15,6 @@ if "logged_in" not in st.session_state:
 if "env" not in st.session_state:
     st.session_state.env = "prod"
 
-def on_env_change():
-    st.cache_data.clear()
-    st.cache_resource.clear()
-
 def check_password():
     def password_entered():
         if (
@@ -40,8 +36,7 @@ def check_password():
         
         is_homolog = st.toggle(
             "Modo Homologação", 
-            value=(st.session_state.env == "homolog"),
-            on_change=on_env_change
+            value=(st.session_state.env == "homolog")
         )
         st.session_state.env = "homolog" if is_homolog else "prod"
 
@@ -80,7 +75,6 @@ else:
         
         if st.button("Sair"):
             st.session_state.logged_in = False
-            st.cache_data.clear()
             st.toast("Você saiu com sucesso!")
             st.rerun()
             
@@ -0,0 +1,72 @@
+"""
+Carga e operações típicas do app contra cada backend de dados.
+
+    python -m benchmarks.bench_backends --contratos 400
+    SUPABASE_URL=... SUPABASE_KEY=... python -m benchmarks.bench_backends --supabase
+
+O SQLite é semeado com dados sintéticos; o Supabase é usado como está (só leituras,
+a menos que --escrever seja passado).
+"""
+import os
+import time
+import argparse
+from src.core.repository import LocalRepository, SupabaseRepository
+from src.core.schema import apply_schema
+from benchmarks.dados_sinteticos import gerar_contratos, gerar_parcelas
+
+
+def _medir(nome, fn, resultados):
+    t0 = time.perf_counter()
+    out = fn()
+    resultados.append((nome, time.perf_counter() - t0))
+    return out
+
+
+def rodar(repo, escrever: bool = True) -> list:
+    resultados = []
+    df, _ = _medir("load_table parcelas", lambda: repo.load_table("parcelas"), resultados)
+    _medir("apply_schema parcelas", lambda: apply_schema(df, "parcelas"), resultados)
+    _medir("load_table contratos", lambda: repo.load_table("contratos"), resultados)
+    _medir("count + max_id", lambda: (repo.count("parcelas"), repo.max_id("parcelas")), resultados)
+    _medir("select mês (ano, mes, status)", lambda: repo.select_frame(
+        "parcelas", filtros={"ano": 2025, "mes": 3, "status": "ABERTO"}), resultados)
+
+    if escrever:
+        novos = [{**gerar_parcelas(gerar_contratos(1), 2099, 2099)[0], "contrato": "BENCH"} for _ in range(100)]
+        inseridos = _medir("insert 100", lambda: repo.insert("parcelas", novos), resultados)
+        ids = [r["id"] for r in inseridos]
+        _medir("update 100 (in)", lambda: repo.update("parcelas", {"status": "LANÇADO"}, [("id", "in", ids)]), resultados)
+        _medir("upsert 100", lambda: repo.upsert("parcelas", [{**r, "valor": 1.0} for r in inseridos]), resultados)
+        _medir("delete 100", lambda: repo.delete("parcelas", {"contrato": "BENCH"}), resultados)
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--contratos", type=int, default=300)
+    parser.add_argument("--sqlite", default=":memory:")
+    parser.add_argument("--supabase", action="store_true")
+    parser.add_argument("--escrever", action="store_true", help="Também roda escritas no Supabase.")
+    args = parser.parse_args()
+
+    backends = []
+    local = LocalRepository(args.sqlite)
+    if local.count("parcelas") == 0:
+        contratos = gerar_contratos(args.contratos)
+        local.insert("contratos", contratos)
+        local.insert("parcelas", gerar_parcelas(contratos))
+    backends.append((local, True))
+
+    if args.supabase:
+        from supabase import create_client
+        client = create_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_KEY"])
+        backends.append((SupabaseRepository(client), args.escrever))
+
+    for repo, escrever in backends:
+        print(f"\n== {repo.name} ({repo.count('parcelas')} parcelas)")
+        for nome, segundos in rodar(repo, escrever):
+            print(f"{nome:<32} {segundos * 1000:10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
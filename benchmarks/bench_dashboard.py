@@ -0,0 +1,80 @@
+"""
+Tempo para montar as séries do dashboard: caminho antigo (máscaras e groupbys sobre as
+parcelas a cada rerun) contra o cubo do snapshot + uma etapa única de agregação.
+
+    python -m benchmarks.bench_dashboard --contratos 400 --repeticoes 20
+"""
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from src.core.cube import build_cube
+from src.core.schema import apply_schema, MESES
+from src.services.dashboard_service import agregar_series
+from benchmarks.dados_sinteticos import gerar_contratos, gerar_parcelas
+
+
+def caminho_antigo(df: pd.DataFrame, filtros: dict) -> dict:
+    """Reprodução do fluxo anterior: três recortes de linhas e um groupby por gráfico."""
+    mask_comum = (
+        df["ano"].isin(filtros["ano"]) & df["contrato"].isin(filtros["contrato"])
+        & df["tipo"].isin(filtros["tipo"]) & df["estabelecimento"].isin(filtros["estabelecimento"])
+        & df["status"].isin(filtros["status"])
+    )
+    sem_hcompany = ~df["contrato"].str.startswith("HCOMPANY") & df["classificacao"].isin(filtros["classificacao"])
+    df_filtrado = df[mask_comum & df["mes_nome"].isin(filtros["mes_nome"]) & sem_hcompany]
+    df_mensal = df[mask_comum & sem_hcompany]
+    df_hcompany = df[mask_comum]
+
+    hcompany = df_hcompany[
+        df_hcompany["contrato"].str.startswith("HCOMPANY") & (df_hcompany["status"] == "LANÇADO")
+    ].groupby(["mes", "mes_nome"], observed=True)["valor"].sum().reset_index()
+    return {
+        "mensal": df_mensal.groupby(["mes", "mes_nome"], observed=True)["valor"].sum().reset_index().sort_values("mes"),
+        "estabelecimento": df_filtrado.groupby("estabelecimento", observed=True)["valor"].sum().reset_index().sort_values("valor"),
+        "classificacao": df_filtrado.groupby("classificacao", observed=True)["valor"].sum().reset_index(),
+        "top_prestadores": df_filtrado.groupby("contrato", observed=True)["valor"].sum().nlargest(10).sort_values().reset_index(),
+        "hcompany": hcompany,
+    }
+
+
+def _tempo(fn, repeticoes: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeticoes):
+        fn()
+    return (time.perf_counter() - t0) / repeticoes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--contratos", type=int, default=400)
+    parser.add_argument("--repeticoes", type=int, default=20)
+    args = parser.parse_args()
+
+    contratos = gerar_contratos(args.contratos)
+    df = apply_schema(pd.DataFrame(gerar_parcelas(contratos)), "parcelas")
+    filtros = {
+        "ano": sorted(df["ano"].dropna().unique().tolist())[-2:],
+        "mes_nome": MESES[:3],
+        "contrato": sorted(df["contrato"].dropna().unique().tolist()),
+        "tipo": ["CONTRATO"],
+        "estabelecimento": sorted(df["estabelecimento"].dropna().unique().tolist()),
+        "status": ["LANÇADO"],
+        "classificacao": sorted(df["classificacao"].dropna().unique().tolist()),
+    }
+
+    t0 = time.perf_counter()
+    cube = build_cube(df)
+    montagem = time.perf_counter() - t0
+
+    antigo, novo = caminho_antigo(df, filtros), agregar_series(cube, filtros)
+    for nome in ("mensal", "estabelecimento", "classificacao", "top_prestadores"):
+        assert np.allclose(antigo[nome]["valor"].to_numpy(float), novo[nome]["valor"].to_numpy(float)), nome
+
+    print(f"{len(df)} parcelas, cubo com {len(cube)} combinações (montado em {montagem * 1000:.1f} ms, uma vez por snapshot)")
+    print(f"{'caminho antigo':<24} {_tempo(lambda: caminho_antigo(df, filtros), args.repeticoes) * 1000:10.2f} ms")
+    print(f"{'cubo + etapa única':<24} {_tempo(lambda: agregar_series(cube, filtros), args.repeticoes) * 1000:10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
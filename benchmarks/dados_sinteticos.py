@@ -0,0 +1,60 @@
+import random
+from datetime import datetime
+from dateutil.relativedelta import relativedelta
+
+PRESTADORES = [
+    "INGRAM MICRO", "TOTVS 2", "ALGAR TELECOM", "CLARO 3", "HCOMPANY GO", "HCOMPANY DF",
+    "UNE TELECOM", "SAP BRASIL", "PRODUTIVE", "OI FIBRA", "NEOMIND", "LUCAS BICALHO",
+    "JETTELECOM", "ILOC3", "HPFS", "GRENKE 4", "GLOBO", "COMPEX", "VELOMAX", "LINK DEDICADO VELOMAX",
+]
+ESTABELECIMENTOS = ["MATRIZ", "FILIAL GO", "FILIAL DF", "FILIAL SP"]
+CLASSIFICACOES = ["LINK", "SOFTWARE", "LOCAÇÃO", "TELEFONIA", "SERVIÇOS"]
+
+
+def gerar_contratos(n: int, seed: int = 7) -> list:
+    rnd = random.Random(seed)
+    contratos = []
+    for i in range(n):
+        nome = PRESTADORES[i % len(PRESTADORES)] + ("" if i < len(PRESTADORES) else f" {i}")
+        inicio = datetime(2020, 1, 1) + relativedelta(months=rnd.randint(0, 60))
+        contratos.append({
+            "situacao": rnd.choice(["ATIVO", "ATIVO", "ATIVO", "INATIVO"]),
+            "numero": rnd.choice(["PEDIDO", str(rnd.randint(1000, 9999))]),
+            "contrato": nome, "conta": str(float(rnd.randint(1, 50))),
+            "centro_custo": str(float(rnd.randint(1, 20))),
+            "estabelecimento": rnd.choice(ESTABELECIMENTOS),
+            "classificacao": rnd.choice(CLASSIFICACOES), "descricao": "",
+            "cnpj": f"{rnd.randint(10, 99)}.{rnd.randint(100, 999)}.{rnd.randint(100, 999)}/0001-{rnd.randint(10, 99)}",
+            "anexos": "NF / BOL", "valor_contrato": round(rnd.uniform(1000, 200000), 2),
+            "inicio": inicio.isoformat(),
+            "termino": (inicio + relativedelta(months=rnd.choice([12, 24, 36]), days=-1)).isoformat(),
+        })
+    return contratos
+
+
+def gerar_parcelas(contratos: list, ano_inicio: int = 2020, ano_fim: int = 2026, seed: int = 11) -> list:
+    """Uma parcela por contrato por mês, lançadas até o mês corrente e abertas depois."""
+    rnd = random.Random(seed)
+    hoje = datetime.now()
+    parcelas = []
+    for contrato_id, c in enumerate(contratos, start=1):
+        base = c["valor_contrato"] / 12
+        for ano in range(ano_inicio, ano_fim + 1):
+            for mes in range(1, 13):
+                emissao = datetime(ano, mes, 1)
+                lancada = emissao < hoje
+                parcelas.append({
+                    "contrato_id": contrato_id, "ano": ano, "mes": mes,
+                    "data_lancamento": emissao.isoformat() if lancada else None,
+                    "data_emissao": emissao.isoformat(),
+                    "data_vencimento": (emissao + relativedelta(months=1)).isoformat(),
+                    "tipo": "CONTRATO" if rnd.random() < 0.9 else "AVULSO",
+                    "contrato": c["contrato"], "classificacao": c["classificacao"],
+                    "referente": c["classificacao"],
+                    "documento": str(rnd.randint(1000, 999999)) if lancada else None,
+                    "estabelecimento": c["estabelecimento"],
+                    "status": "LANÇADO" if lancada else "ABERTO",
+                    "valor": round(base * rnd.uniform(0.8, 1.2), 2) if lancada else None,
+                    "situacao": c["situacao"],
+                })
+    return parcelas
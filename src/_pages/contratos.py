@@ -1,18 +1,32 @@
 import pandas as pd
 import streamlit as st
-from src.services.contratos_service import new_contract, delete_contract, active_deactive_contract, edit_contract, renew_contract, relatorio_anual
+from src.services.contratos_service import new_contract, delete_contract, active_deactive_contract, edit_contract, renew_contract
+from src.services.relatorio_service import gerar_relatorio, estilizar_relatorio
 from src.utils.stamp import ano_atual
-import io
-from src.core.database_connections import load_data
+import functools
+from src.core.database_connections import load_data, invalidate_env, get_filter_index, get_export_cache, export_key
+from src.utils.exporters import EXPORT_FORMATS, export_bytes
 from src.utils.formatters import formatar_brl
 
-def to_excel(df: pd.DataFrame) -> bytes:
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Relatorio')
-    return output.getvalue()
-
-def show_stats(df, coluna_valor, parcelas_df) -> None:
+def export_buttons(nome: str, dados, chave: tuple, key_prefix: str = "", formatos=("xlsx", "csv", "parquet")) -> None:
+    """
+    Um botão de download por formato. `dados` é um DataFrame ou um dict de abas já calculado;
+    os bytes só são gerados quando o botão é clicado e ficam em cache pela `chave` (ver export_key).
+    """
+    cache = get_export_cache()
+    for coluna, formato in zip(st.columns(len(formatos)), formatos):
+        _, extensao, mime = EXPORT_FORMATS[formato]
+        gerar = functools.partial(cache.get_or_build, (*chave, formato), functools.partial(export_bytes, formato, dados))
+        coluna.download_button(
+            label=f"📥 {extensao.upper()}", data=gerar, file_name=f"{nome}.{extensao}", mime=mime,
+            key=f"download_{key_prefix}{nome}_{formato}", on_click="ignore",
+        )
+
+def _assinatura(df: pd.DataFrame) -> int:
+    return int(pd.util.hash_pandas_object(df.index, index=False).sum()) ^ hash(tuple(df.columns))
+
+def show_stats(df, coluna_valor, anos) -> None:
+    """Contagem, exportação e total de `df`; o relatório anual (sobre `anos`) lê as parcelas só ao ser gerado."""
     count = len(df)
     total = df[coluna_valor].sum()
     
@@ -27,19 +41,31 @@ def show_stats(df, coluna_valor, parcelas_df) -> None:
         </div>    
         """, unsafe_allow_html=True)
 
+        tabela = "parcelas" if coluna_valor == "valor" else "contratos"
+        with st.popover("📥 Exportar visão"):
+            export_buttons(f"{tabela}_filtradas" if tabela == "parcelas" else f"{tabela}_filtrados", df,
+                           export_key(tabela, "visao", _assinatura(df)))
+
     with col2:
         chave_unica = f"contrato_bttn_relatorio_{coluna_valor}"
+        anos = sorted(anos) or [ano_atual]
+        padrao = ano_atual if ano_atual in anos else anos[-1]
+        c_anos, c_yoy = st.columns([3, 1])
+        inicio, fim = c_anos.select_slider(
+            "Anos do relatório", options=anos, value=(padrao, padrao), key=f"relatorio_anos_{coluna_valor}"
+        )
+        yoy = c_yoy.toggle("YoY", key=f"relatorio_yoy_{coluna_valor}", help="Compara com o ano anterior.")
+
         if st.button("Gerar relatório Anual", key=chave_unica):
-            df_styled = relatorio_anual(parcelas_df)
-            st.dataframe(df_styled)
+            parcelas_df = load_data("parcelas")
+            relatorio = gerar_relatorio(parcelas_df, fim if inicio == fim else (inicio, fim), yoy=yoy)
+            st.dataframe(estilizar_relatorio(relatorio))
             
-            st.download_button(
-                label=" 📥 Exportar para Excel",
-                data=to_excel(df_styled.data),
-                file_name=f"relatorio_anual_{ano_atual}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                key=f"download_excel_{chave_unica}" 
-            )
+            abas = {"Relatório": relatorio}
+            if inicio != fim:
+                abas.update({str(ano): gerar_relatorio(parcelas_df, ano) for ano in range(inicio, fim + 1)})
+            nome = f"relatorio_anual_{fim}" if inicio == fim else f"relatorio_{inicio}_{fim}"
+            export_buttons(nome, abas, export_key("parcelas", "relatorio", inicio, fim, yoy), key_prefix=f"{chave_unica}_")
             if st.button(" ↩️ Fechar relatório", key=f"contrato_bttn_fechar_{coluna_valor}"):
                 st.rerun()
 
@@ -104,9 +130,9 @@ def show_filters(df, filter_config) -> None:
             b_col2.button("Limpar", on_click=limpar_selecao, args=(key_state,), key=f'contratos_limpar_{key}')
             
             if key == "pedido":
-                 st.button("Recarregar tabela", on_click=st.cache_data.clear, key='contratos_atualizar')
+                 st.button("Recarregar tabela", on_click=invalidate_env, key='contratos_atualizar')
 
-def contratos(supabase) -> None:
+def contratos(repo) -> None:
     contratos_df = load_data("contratos")
     parcelas_df = load_data("parcelas")
 
@@ -119,17 +145,16 @@ def contratos(supabase) -> None:
     with st.expander("Filtros de Contratos", expanded=True):
         show_filters(contratos_df, filter_config)
     
-    mask = (
-        contratos_df["situacao"].isin(st.session_state.contratos_situacao_selecionado) &
-        contratos_df["contrato"].isin(st.session_state.contratos_contrato_selecionado) &
-        contratos_df["estabelecimento"].isin(st.session_state.contratos_estabelecimento_selecionado) &
-        contratos_df["classificacao"].isin(st.session_state.contratos_classificacao_selecionado)
-    )
-    
+    selecao = {
+        dim: st.session_state[f"contratos_{dim}_selecionado"]
+        for dim in ["situacao", "contrato", "estabelecimento", "classificacao"]
+    }
+    flags = {}
     if st.session_state.contratos_pedido_selecionado == ["Pedido"]:
-        mask &= (contratos_df["numero"] == "PEDIDO")
+        flags["pedido"] = True
     elif st.session_state.contratos_pedido_selecionado == ['Contrato']:
-        mask &= (contratos_df["numero"] != "PEDIDO")
+        flags["pedido"] = False
+    mask = get_filter_index("contratos", contratos_df).mask(selecao, flags)
 
     contratos_filtrado = contratos_df[mask].drop(columns=["id", 'inicio'])
     
@@ -151,7 +176,7 @@ def contratos(supabase) -> None:
         }
     )
 
-    show_stats(contratos_filtrado, "valor_contrato", parcelas_df)
+    show_stats(contratos_filtrado, "valor_contrato", get_filter_index("parcelas", parcelas_df).values("ano"))
     st.divider()
     
     if "navegacao_acoes_contratos" not in st.session_state:
@@ -175,4 +200,4 @@ def contratos(supabase) -> None:
     }
     
     if acao_selecionada in acoes:
-        acoes[acao_selecionada](contratos_df, supabase)
\ No newline at end of file
+        acoes[acao_selecionada](contratos_df, repo)
\ No newline at end of file
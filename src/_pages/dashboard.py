@@ -1,7 +1,10 @@
+import functools
+from datetime import date
 import streamlit as st
 from src.utils.stamp import ano_atual, mes_atual
-from src.core.database_connections import load_data
-from src.services.dashboard_service import filtrar_dados_dashboard
+from src.core.database_connections import load_data, cached_figure
+from dateutil.relativedelta import relativedelta
+from src.services.dashboard_service import series_dashboard, filtros_dashboard, linhas_gantt, GANTT_AGRUPAMENTOS
 from src.utils.plots import (
     plot_despesa_mensal, 
     plot_total_estabelecimento_bar, 
@@ -61,6 +64,42 @@ def show_filters(df):
             c1.button("Todos", on_click=selecionar_todos, args=(key, options), key=f'btn_all_{key}', use_container_width=True)
             c2.button("Limpar", on_click=limpar_selecao, args=(key,), key=f'btn_clr_{key}', use_container_width=True)
 
+def show_gantt(contratos_df):
+    hoje = date.today()
+    c1, c2, c3, c4 = st.columns([1.2, 1, 1.2, 0.6])
+    janela = c1.date_input(
+        "Janela", value=(hoje - relativedelta(years=1), hoje + relativedelta(years=2)), key="gantt_janela", format="DD/MM/YYYY"
+    )
+    agrupamento = c2.selectbox("Agrupar por", list(GANTT_AGRUPAMENTOS), key="gantt_agrupar")
+    agrupar = GANTT_AGRUPAMENTOS[agrupamento]
+
+    grupo = None
+    if agrupar:
+        grupos = sorted(contratos_df[agrupar].dropna().unique().tolist())
+        escolha = c3.selectbox("Detalhar grupo", ["(todos)"] + grupos, key=f"gantt_grupo_{agrupar}")
+        grupo = None if escolha == "(todos)" else escolha
+
+    if len(janela) != 2:
+        st.info("Selecione o início e o fim da janela.")
+        return
+    inicio, fim = janela
+
+    pagina = int(st.session_state.get("gantt_pagina", 1)) - 1
+    barras, paginas = linhas_gantt(contratos_df, inicio, fim, agrupar, grupo, pagina)
+    if pagina >= paginas:
+        pagina = paginas - 1
+        st.session_state.gantt_pagina = paginas
+    c4.number_input(f"Página (de {paginas})", min_value=1, max_value=paginas, step=1, key="gantt_pagina")
+
+    if barras.empty:
+        st.info("Nenhum contrato vigente na janela selecionada.")
+        return
+
+    filtros = {"hoje": hoje.isoformat(), "janela": (inicio.isoformat(), fim.isoformat()),
+               "agrupar": agrupar or "", "grupo": grupo or "", "pagina": pagina}
+    fig = cached_figure("contratos", "gantt", filtros, lambda: plot_gantt_contratos(barras))
+    st.plotly_chart(fig, use_container_width=True)
+
 def show_dashboard():
     st.title("Dashboard de Despesas")
     st.divider()
@@ -75,42 +114,55 @@ def show_dashboard():
 
         show_filters(parcelas_df)
 
-        df_filtrado, df_mensal, df_hcompany = filtrar_dados_dashboard(parcelas_df)
+        filtros = filtros_dashboard()
+        series = functools.cache(lambda: series_dashboard(parcelas_df))
+
+        def figura(chart_id, serie, plot, **layout):
+            def build():
+                dados = series()[serie]
+                if dados.empty:
+                    return None
+                fig = plot(dados)
+                if layout:
+                    fig.update_layout(**layout)
+                return fig
+            return cached_figure("parcelas", chart_id, filtros, build)
 
         main_col, side_col = st.columns([2.5, 1.7])
         
         with main_col:
             with st.container(border=True):
-                if not df_mensal.empty:
-                    st.plotly_chart(plot_despesa_mensal(df_mensal), use_container_width=True)
+                fig = figura("despesa_mensal", "mensal", plot_despesa_mensal)
+                if fig is not None:
+                    st.plotly_chart(fig, use_container_width=True)
                 else:
                     st.info("Nenhum dado de despesa mensal para exibir.")
 
-            if not df_filtrado.empty:
+            fig_estab = figura("estabelecimento", "estabelecimento", plot_total_estabelecimento_bar)
+            if fig_estab is not None:
                 sub_col1, sub_col2 = st.columns(2)
                 with sub_col1, st.container(border=True):
-                    st.plotly_chart(plot_total_estabelecimento_bar(df_filtrado), use_container_width=True)
+                    st.plotly_chart(fig_estab, use_container_width=True)
                 with sub_col2, st.container(border=True):
-                    st.plotly_chart(plot_classificacao(df_filtrado), use_container_width=True)
+                    st.plotly_chart(figura("classificacao", "classificacao", plot_classificacao), use_container_width=True)
             else:
                 st.info("Nenhum dado de estabelecimento para exibir.")
 
         with side_col:
             with st.container(border=True):
-                if not df_filtrado.empty:
-                    fig = plot_top_prestadores(df_filtrado)
-                    fig.update_layout(height=450)
+                fig = figura("top_prestadores", "top_prestadores", plot_top_prestadores, height=450)
+                if fig is not None:
                     st.plotly_chart(fig, use_container_width=True)
                 else:
                     st.info("Nenhum dado para o Top 10 Prestadores.")
 
             with st.container(border=True):
-                st.plotly_chart(plot_faturamento_hcompany(df_hcompany, st.session_state.dash_ano_selecionado), use_container_width=True)
+                st.plotly_chart(figura("faturamento_hcompany", "hcompany", plot_faturamento_hcompany), use_container_width=True)
 
     with tab_gantt:
         contratos_df = load_data("contratos")
         if not contratos_df.empty:
-            st.plotly_chart(plot_gantt_contratos(contratos_df), use_container_width=False)
+            show_gantt(contratos_df)
         else:
             st.warning("Sem dados de contratos para exibir o Gantt.")
 
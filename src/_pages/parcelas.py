@@ -1,8 +1,11 @@
+import pandas as pd
 import streamlit as st
 from src.utils.stamp import mes_atual, ano_atual
 from src._pages.contratos import show_stats
-from src.core.database_connections import load_data
-from src.services.parcelas_service import view_lancar, view_modificar, view_adicionar, view_excluir
+from src.core.database_connections import load_data, query_data
+from src.core.query import filter_frame, normalize_filters
+from src.core.schema import MESES
+from src.services.parcelas_service import view_lancar, view_lancar_lote, view_modificar, view_adicionar, view_excluir
 
 def selecionar_todos(chave_estado, opcoes):
     st.session_state[chave_estado] = opcoes
@@ -10,38 +13,63 @@ def selecionar_todos(chave_estado, opcoes):
 def limpar_selecao(chave_estado):
     st.session_state[chave_estado] = []
 
-def render_filters(df):
+FILTROS = [
+    ("ano", "Ano", "multiselect"),
+    ("mes_nome", "Mês", "multiselect"),
+    ("contrato", "Contrato", "multiselect"),
+    ("status", "Status", "segmented"),
+    ("tipo", "Tipo", "segmented"),
+    ("situacao", "Situação", "segmented")
+]
+
+def _chave(col_name):
+    return 'home_mes_selecionado' if col_name == "mes_nome" else f'home_{col_name}_selecionado'
+
+def _iniciar_filtros(contratos):
+    defaults = {
+        "ano": [ano_atual],
+        "mes_nome": [mes_atual],
+        "contrato": contratos["contrato"].dropna().sort_values().unique().tolist(),
+        "status": "ABERTO",
+        "tipo": "CONTRATO",
+        "situacao": "ATIVO"
+    }
+    for col_name, _, _ in FILTROS:
+        if _chave(col_name) not in st.session_state:
+            st.session_state[_chave(col_name)] = defaults[col_name]
+
+def _opcoes_filtros(contratos, df_mes) -> dict:
+    """
+    Opções dos filtros sem ler o histórico de parcelas: anos da vigência dos contratos, contratos e
+    situações do cadastro, status e tipo das parcelas dos meses escolhidos. O valor selecionado sempre entra.
+    """
+    inicio, termino = contratos["inicio"].min(), contratos["termino"].max()
+    anos = set(range(inicio.year, termino.year + 1)) if pd.notna(inicio) and pd.notna(termino) else set()
+    opcoes = {
+        "ano": anos | {ano_atual},
+        "mes_nome": set(MESES),
+        "contrato": set(contratos["contrato"].dropna()),
+        "situacao": set(contratos["situacao"].dropna()),
+        "status": set(),
+        "tipo": set(),
+    }
+    for col_name, valores in opcoes.items():
+        if col_name in df_mes.columns:
+            valores.update(df_mes[col_name].dropna().unique().tolist())
+        atual = st.session_state.get(_chave(col_name))
+        valores.update(atual if isinstance(atual, list) else [atual] if atual is not None else [])
+    return {
+        col_name: [m for m in MESES if m in valores] if col_name == "mes_nome" else sorted(valores)
+        for col_name, valores in opcoes.items()
+    }
+
+def render_filters(opcoes):
     with st.expander("Filtros de Visualização", expanded=True):
         cols = st.columns(6)
-        
-        filters_conf = [
-            ("ano", "Ano", "multiselect"),
-            ("mes_nome", "Mês", "multiselect"),
-            ("contrato", "Contrato", "multiselect"),
-            ("status", "Status", "segmented"),
-            ("tipo", "Tipo", "segmented"),
-            ("situacao", "Situação", "segmented")
-        ]
-
-        defaults = {
-            "ano": [ano_atual],
-            "mes_nome": [mes_atual],
-            "contrato": df["contrato"].dropna().sort_values().unique().tolist(),
-            "status": "ABERTO",
-            "tipo": "CONTRATO",
-            "situacao": "ATIVO"
-        }
-
-        for i, (col_name, label, widget_type) in enumerate(filters_conf):
-            key = f'home_{col_name}_selecionado' if col_name != "mes_nome" else 'home_mes_selecionado'
-            if col_name == "contrato": key = 'home_contrato_selecionado' 
-
-            if key not in st.session_state:
-                st.session_state[key] = defaults[col_name]
 
-            options = df[col_name].dropna().unique().tolist()
-            if col_name == "ano": options = sorted(options)
-            if col_name == "contrato": options = sorted(options)
+        for i, (col_name, label, widget_type) in enumerate(FILTROS):
+            key = _chave(col_name)
+            options = opcoes[col_name]
 
             with cols[i]:
                 if widget_type == "multiselect":
@@ -53,23 +81,27 @@ def render_filters(df):
                     st.segmented_control(label, options=options, key=key)
 
 
-def home(supabase):
+def home(repo):
     st.title("Lançamento de Parcelas")
     st.divider()
 
     try:
-        df = load_data("parcelas")
-        render_filters(df)
-
-        mask = (
-            df["ano"].isin(st.session_state.home_ano_selecionado) &
-            df["mes_nome"].isin(st.session_state.home_mes_selecionado) &
-            df["contrato"].isin(st.session_state.home_contrato_selecionado) &
-            (df["situacao"] == st.session_state.home_situacao_selecionado) &
-            (df["tipo"] == st.session_state.home_tipo_selecionado) &
-            (df["status"] == st.session_state.home_status_selecionado)
-        )
-        df_filter = df[mask]
+        # Só os meses escolhidos vêm do banco; o histórico inteiro é lido apenas pelas ações que precisam dele.
+        contratos = load_data("contratos")
+        _iniciar_filtros(contratos)
+        df_mes = query_data("parcelas", filtros=[
+            ("ano", "in", st.session_state.home_ano_selecionado),
+            ("mes_nome", "in", st.session_state.home_mes_selecionado),
+        ])
+        opcoes = _opcoes_filtros(contratos, df_mes)
+        render_filters(opcoes)
+
+        df_filter = filter_frame(df_mes, normalize_filters([
+            ("contrato", "in", st.session_state.home_contrato_selecionado),
+            ("situacao", "eq", st.session_state.home_situacao_selecionado),
+            ("tipo", "eq", st.session_state.home_tipo_selecionado),
+            ("status", "eq", st.session_state.home_status_selecionado),
+        ]))
 
         cols_drop_aberto = ["data_lancamento", 'documento', "mes_nome", "classificacao", "situacao", "contrato_id", "id", 'mes', 'data_vencimento', 'referente']
         cols_drop_lancado = ['mes','classificacao', 'data_emissao', 'situacao', 'id', 'contrato_id', 'status','mes_nome']
@@ -90,23 +122,24 @@ def home(supabase):
             "valor": st.column_config.NumberColumn("Valor", format='R$ %.2f')
         }, hide_index=True)
 
-        show_stats(df_show, "valor", df)
+        show_stats(df_show, "valor", opcoes["ano"])
         st.divider()
 
         if "navegacao_acoes_parcelas" not in st.session_state:
             st.session_state.navegacao_acoes_parcelas = "Lançar Parcela"
             
-        opcoes_acao = ["Lançar Parcela", "Modificar / Reverter", "Adicionar Parcela", "Excluir Parcela"]
+        opcoes_acao = ["Lançar Parcela", "Lançar em Lote", "Modificar / Reverter", "Adicionar Parcela", "Excluir Parcela"]
         acao = st.segmented_control("Selecione a ação:", options=opcoes_acao, selection_mode="single", key="navegacao_acoes_parcelas")
         
         if not acao: acao = "Lançar Parcela"
         st.write("---")
 
         actions_map = {
-            "Lançar Parcela": lambda: view_lancar(df, df_filter, supabase),
-            "Modificar / Reverter": lambda: view_modificar(df, df_filter, supabase),
-            "Adicionar Parcela": lambda: view_adicionar(df, df_filter, supabase),
-            "Excluir Parcela": lambda: view_excluir(df, supabase)
+            "Lançar Parcela": lambda: view_lancar(df_mes, df_filter, repo),
+            "Lançar em Lote": lambda: view_lancar_lote(df_mes, df_filter, repo),
+            "Modificar / Reverter": lambda: view_modificar(df_mes, df_filter, repo),
+            "Adicionar Parcela": lambda: view_adicionar(load_data("parcelas"), df_filter, repo),
+            "Excluir Parcela": lambda: view_excluir(load_data("parcelas"), repo)
         }
         
         if acao in actions_map:
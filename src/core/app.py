@@ -1,22 +1,28 @@
 import streamlit as st
-from src.core.database_connections import get_supabase_client
+from src.core.database_connections import get_repository
 from src._pages.parcelas import home
 from src._pages.contratos import contratos
 from src._pages.dashboard import show_dashboard
 
 def main():
     current_env = st.session_state.get("env", "prod")
-    supabase = get_supabase_client(current_env)
+    repo = get_repository(current_env)
 
     logo1, logo2 = st.columns([0.2, 1])
     with logo1: st.image("src/logo/ContraX_Logo.png", width=240, caption="Gestão de Contratos")
     with logo2: st.image("src/logo/hcompany_branco_intranet.png", width=200)
 
-    tab_lancamentos, tab_contratos, tab_dashboard = st.tabs([" Lançamentos ", " Contratos ", " Dashboard "])
+    # Só a aba aberta roda: Lançamentos lê apenas o mês escolhido, sem pagar o histórico que Contratos e Dashboard carregam.
+    tab_lancamentos, tab_contratos, tab_dashboard = st.tabs(
+        [" Lançamentos ", " Contratos ", " Dashboard "], key="aba_principal", on_change="rerun"
+    )
 
-    with tab_lancamentos: home(supabase)
-    with tab_contratos: contratos(supabase)
-    with tab_dashboard: show_dashboard()
+    if tab_lancamentos.open:
+        with tab_lancamentos: home(repo)
+    if tab_contratos.open:
+        with tab_contratos: contratos(repo)
+    if tab_dashboard.open:
+        with tab_dashboard: show_dashboard()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
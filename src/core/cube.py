@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+from src.core.filter_index import FilterIndex, INDEX_FLAGS
+from src.core.schema import month_names
+
+# Granularidade do cubo de parcelas: qualquer filtro do dashboard é um recorte dessas dimensões.
+CUBE_DIMS = ["ano", "mes", "contrato", "tipo", "estabelecimento", "status", "classificacao"]
+
+
+class AggregateCube:
+    """
+    Soma de `valor` e contagem de linhas por combinação de CUBE_DIMS (+ `mes_nome`).
+    O tamanho depende do número de combinações, não do de parcelas; filtros viram
+    recortes por bitmap e os gráficos agregam o recorte como agregariam as linhas.
+    """
+
+    def __init__(self, frame: pd.DataFrame):
+        self.frame = frame
+        flags = {nome: fn(frame[coluna]) for nome, (coluna, fn) in INDEX_FLAGS["parcelas"].items()}
+        self.index = FilterIndex(frame, [*CUBE_DIMS, "mes_nome"], flags)
+        self.valores = pd.to_numeric(frame["valor"]).fillna(0).to_numpy(dtype="float64")
+        self._codes = {}
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def mask(self, selecao: dict = None, flags: dict = None):
+        return self.index.mask(selecao, flags)
+
+    def slice(self, selecao: dict = None, flags: dict = None) -> pd.DataFrame:
+        return self.frame[self.mask(selecao, flags)]
+
+    def codes(self, dim: str):
+        """Códigos por linha (-1 = nulo) e rótulos ordenados de `dim`, calculados uma vez."""
+        if dim not in self._codes:
+            self._codes[dim] = pd.factorize(self.frame[dim], sort=True)
+        return self._codes[dim]
+
+    def totals(self, dim: str, mask, nulos: str = None) -> pd.Series:
+        """
+        Soma de `valor` por valor de `dim` nas linhas de `mask`, só com os grupos presentes (como observed=True).
+        Com `nulos`, linhas sem valor em `dim` entram num grupo com esse rótulo em vez de serem ignoradas.
+        """
+        codes, labels = self.codes(dim)
+        mask = np.asarray(mask, dtype=bool)
+        sel = mask & (codes >= 0)
+        somas = np.bincount(codes[sel], weights=self.valores[sel], minlength=len(labels))
+        presentes = np.bincount(codes[sel], minlength=len(labels)) > 0
+        out = pd.Series(somas[presentes], index=pd.Index(labels[presentes], name=dim), name="valor")
+
+        sem_valor = mask & (codes < 0)
+        if nulos is not None and sem_valor.any():
+            extra = pd.Series([self.valores[sem_valor].sum()], index=pd.Index([nulos], name=dim), name="valor")
+            out.index = out.index.astype(object)
+            out = pd.concat([out, extra])
+        return out
+
+
+def build_cube(df: pd.DataFrame) -> AggregateCube:
+    dims = [c for c in CUBE_DIMS if c in df.columns]
+    if df.empty or "valor" not in df.columns:
+        frame = pd.DataFrame(columns=[*CUBE_DIMS, "mes_nome", "valor", "linhas"])
+        return AggregateCube(frame)
+
+    frame = (
+        df.groupby(dims, observed=True, dropna=False, sort=False)["valor"]
+        .agg(valor="sum", linhas="size")
+        .reset_index()
+    )
+    frame["mes_nome"] = month_names(frame["mes"])
+    return AggregateCube(frame)
@@ -1,12 +1,35 @@
+import os
+import threading
 import streamlit as st
 import pandas as pd
 from supabase import create_client, Client
-from src.utils.stamp import mes_dict
+from src.core.delta_sync import SnapshotStore, TableSnapshot, Delta, compute_delta, merge_delta, snapshot_watermark
+from src.core.disk_snapshot import load_snapshot, save_snapshot_async, drop_snapshots
+from src.core.schema import apply_schema, memory_report, MESES
+from src.core.query import QueryCache, normalize_columns, normalize_filters, filter_frame
+from src.core.repository import Repository, SupabaseRepository, LocalRepository, local_path
+from src.core.filter_index import FilterIndex, build_filter_index, INDEX_DIMS
+from src.core.cube import AggregateCube, build_cube
+from src.core.lru_cache import LRUCache
+from src.core.row_lookup import RowLookup, build_row_lookup
+
+FETCH_MODE = "offset"
+# "supabase" (padrão) ou "sqlite" para rodar o app inteiro sobre um banco local embarcado.
+BACKEND = os.environ.get("CONTRAX_BACKEND", "supabase")
+CACHE_MAX_MB = int(os.environ.get("CONTRAX_CACHE_MB", "512"))
+# Incrementar sempre que TABLE_SCHEMAS mudar: snapshots locais de outra versão são descartados.
+SCHEMA_VERSION = 2
+# Versão do snapshot gravada em `df.attrs` pelo load_data: estruturas derivadas só valem para ela.
+VERSION_ATTR = "contrax_snapshot_version"
+_fetch_reports = {}
+
+# load_data entrega views rasas do snapshot compartilhado; com Copy-on-Write uma sessão que
+# altera o frame recebido ganha a própria cópia sem tocar no snapshot (padrão no pandas 3).
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
 
 @st.cache_resource
 def get_supabase_client(env: str) -> Client:
-    env = st.session_state.get("env", "prod")
-    
     if env == "homolog":
         url = st.secrets["connections_homolog"]["supabase"]["SUPABASE_URL"]
         key = st.secrets["connections_homolog"]["supabase"]["SUPABASE_KEY"]
@@ -16,48 +39,309 @@ def get_supabase_client(env: str) -> Client:
 
     return create_client(url, key)
 
-@st.cache_data(ttl=300)
+@st.cache_resource
+def get_repository(env: str) -> Repository:
+    if BACKEND == "sqlite":
+        return LocalRepository(local_path(env))
+    return SupabaseRepository(get_supabase_client(env), fetch_mode=FETCH_MODE)
+
+@st.cache_resource
+def get_snapshot_store() -> SnapshotStore:
+    return SnapshotStore(ttl=300, max_bytes=CACHE_MAX_MB * 1024 * 1024)
+
+@st.cache_resource
+def get_query_cache() -> QueryCache:
+    return QueryCache(ttl=300)
+
+@st.cache_resource
+def get_figure_cache() -> LRUCache:
+    return LRUCache(max_entries=64)
+
+@st.cache_resource
+def get_export_cache() -> LRUCache:
+    return LRUCache(max_entries=16)
+
+@st.cache_resource
+def get_report_cache() -> LRUCache:
+    """Colunas mensais do relatório anual, por conteúdo do mês (ver relatorio_service.pivo_anual)."""
+    return LRUCache(max_entries=240)
+
+def get_fetch_report(table_name: str):
+    """Tempos por página da última leitura completa de `table_name` (ou None)."""
+    return _fetch_reports.get((st.session_state.get("env", "prod"), table_name))
+
+def mark_stale(table_name: str, rows=None) -> None:
+    """
+    Marca a tabela para sincronização incremental na próxima leitura.
+    `rows` (linhas ou ids devolvidos pelo Supabase) são relidas mesmo sem `updated_at`.
+    """
+    ids = [r["id"] if isinstance(r, dict) else r for r in (rows or [])]
+    env = st.session_state.get("env", "prod")
+    get_snapshot_store().mark_stale(env, table_name, ids)
+    get_query_cache().invalidate(env, table_name)
+
+def write_through(table_name: str, upserted=None, deleted=None) -> None:
+    """
+    Aplica no snapshot em memória o resultado de uma escrita bem-sucedida.
+    `upserted` são as linhas completas devolvidas pelo insert/update; `deleted`, as linhas
+    (ou ids) removidas. Se o patch local falhar, só as linhas afetadas são marcadas para releitura.
+    """
+    upserted = list(upserted or [])
+    deleted_ids = {int(r["id"] if isinstance(r, dict) else r) for r in (deleted or [])}
+    env = st.session_state.get("env", "prod")
+
+    def apply(snap: TableSnapshot) -> TableSnapshot:
+        df = merge_delta(snap.df, Delta(rows=upserted, deleted_ids=deleted_ids))
+        novo = _snapshot_from(_post_process(df, table_name) if df is not snap.df else df)
+        novo.loaded_at, novo.stale, novo.pending_ids = snap.loaded_at, snap.stale, snap.pending_ids
+        novo.reconciled_at = snap.reconciled_at
+        return novo
+
+    store = get_snapshot_store()
+    get_query_cache().invalidate(env, table_name)
+    try:
+        if store.patch(env, table_name, apply):
+            save_snapshot_async(env, table_name, store.get(env, table_name), SCHEMA_VERSION)
+    except Exception:
+        mark_stale(table_name, upserted + list(deleted_ids))
+
+def invalidate_env(env: str = None, table_name: str = None) -> None:
+    """
+    Descarta os caches de um ambiente (padrão: o da sessão), ou só de uma tabela dele, inclusive
+    os snapshots em disco: a próxima leitura é uma carga completa do servidor, não a cópia local.
+    O outro ambiente e o client do Supabase não são afetados.
+    """
+    env = env or st.session_state.get("env", "prod")
+    drop_snapshots(env, table_name)
+    get_snapshot_store().clear(env, table_name)
+    get_query_cache().invalidate(env, table_name)
+    get_figure_cache().invalidate(env, table_name)
+    get_export_cache().invalidate(env, table_name)
+    get_report_cache().invalidate(env, table_name)
+
+def get_cache_usage() -> dict:
+    """Bytes de snapshots em memória por ambiente e o orçamento configurado."""
+    store = get_snapshot_store()
+    return {"por_ambiente": store.usage(), "orcamento": store.max_bytes}
+
+def _post_process(df: pd.DataFrame, table_name: str) -> pd.DataFrame:
+    return apply_schema(df, table_name)
+
+def data_version(table_name: str) -> int:
+    """Versão do snapshot de `table_name` no ambiente atual (0 se ainda não carregado)."""
+    snap = get_snapshot_store().get(st.session_state.get("env", "prod"), table_name)
+    return snap.version if snap is not None else 0
+
+def get_memory_report(table_name: str) -> pd.DataFrame:
+    """Memória por coluna do snapshot em cache de `table_name` no ambiente atual."""
+    snap = get_snapshot_store().get(st.session_state.get("env", "prod"), table_name)
+    return memory_report(snap.df) if snap is not None else pd.DataFrame()
+
+def _same_frame(df: pd.DataFrame, snap: TableSnapshot) -> bool:
+    """`df` veio do load_data desta versão do snapshot e ainda tem as mesmas linhas, na mesma ordem."""
+    return df.attrs.get(VERSION_ATTR) == snap.version and len(df) == len(snap.df) and df.index.equals(snap.df.index)
+
+def snapshot_derived(table_name: str, nome: str, build, df: pd.DataFrame = None):
+    """
+    `build(snapshot_df)` calculado uma única vez por versão do snapshot e compartilhado entre sessões.
+    Se `df` for passado e não for o load_data da versão atual (frame já filtrado, ou de uma versão
+    anterior com o mesmo formato), calcula sobre ele sem guardar.
+    """
+    snap = get_snapshot_store().get(st.session_state.get("env", "prod"), table_name)
+    if snap is None or (df is not None and not _same_frame(df, snap)):
+        return build(df if df is not None else pd.DataFrame())
+
+    valor = snap.derived.get(nome)
+    if valor is None:
+        valor = snap.derived.setdefault(nome, build(snap.df))
+    return valor
+
+def get_filter_index(table_name: str, df: pd.DataFrame = None) -> FilterIndex:
+    """Índice de bitmaps dos filtros de `table_name`, posicional em relação a `df` (padrão: o snapshot)."""
+    return snapshot_derived(table_name, "filter_index", lambda base: build_filter_index(base, table_name), df)
+
+def get_row_lookup(df: pd.DataFrame = None) -> RowLookup:
+    """Posições das parcelas por período/status, contrato e id (ver RowLookup)."""
+    return snapshot_derived("parcelas", "row_lookup", build_row_lookup, df)
+
+def get_parcelas_cube(df: pd.DataFrame = None) -> AggregateCube:
+    """Cubo de soma/contagem de parcelas por (ano, mes, contrato, tipo, estabelecimento, status, classificacao)."""
+    return snapshot_derived("parcelas", "cube", build_cube, df)
+
+def cached_figure(table_name: str, chart_id: str, filtros, build):
+    """
+    Figura de `chart_id` para a versão atual do snapshot de `table_name` e os `filtros` dados;
+    `build()` só roda quando essa combinação ainda não está no cache.
+    """
+    env = st.session_state.get("env", "prod")
+    key = (env, table_name, data_version(table_name), normalize_filters(filtros), chart_id)
+    return get_figure_cache().get_or_build(key, build)
+
+def export_key(table_name: str, *partes) -> tuple:
+    """Chave de cache de uma exportação: muda quando o snapshot de `table_name` muda."""
+    return (st.session_state.get("env", "prod"), table_name, data_version(table_name), *partes)
+
+def _full_load(repo: Repository, env: str, table_name: str) -> TableSnapshot:
+    df, report = repo.load_table(table_name)
+    if report is not None:
+        _fetch_reports[(env, table_name)] = report
+
+    return _snapshot_from(_post_process(df, table_name))
+
+def _snapshot_from(df: pd.DataFrame) -> TableSnapshot:
+    max_id = int(df["id"].max()) if "id" in df.columns and not df.empty else 0
+    return TableSnapshot(df=df, count=len(df), max_id=max_id, watermark=snapshot_watermark(df))
+
+def _sync(repo: Repository, env: str, table_name: str, snap: TableSnapshot) -> TableSnapshot:
+    """
+    Aplica o delta do servidor a `snap`, ou relê a tabela inteira quando SnapshotStore.needs_full,
+    e devolve o snapshot que ficou valendo. Sem mudanças o próprio `snap` é mantido (SnapshotStore.touch).
+    """
+    store = get_snapshot_store()
+    pendentes = set(snap.pending_ids)
+    if store.needs_full(snap):
+        novo = _full_load(repo, env, table_name)
+        if novo.df.equals(snap.df):
+            store.touch(env, table_name, snap, pendentes, reconciled_at=novo.reconciled_at)
+            return snap
+    else:
+        delta = compute_delta(repo, table_name, snap)
+        if delta.empty:
+            store.touch(env, table_name, snap, pendentes)
+            return snap
+        novo = _snapshot_from(_post_process(merge_delta(snap.df, delta), table_name))
+        novo.reconciled_at = snap.reconciled_at
+    return _install(env, table_name, snap, novo, pendentes)
+
+def _install(env: str, table_name: str, base: TableSnapshot, novo: TableSnapshot, pendentes: set) -> TableSnapshot:
+    """
+    Troca `base` por `novo` só se ninguém mexeu no snapshot durante a sincronização (compare-and-swap).
+    Ids marcados depois de `pendentes` serem lidos continuam pendentes. Se houve escrita local
+    (write_through) ou outra sincronização no meio, o snapshot atual é mantido e marcado para reler.
+    """
+    instalado = novo
+
+    def swap(atual: TableSnapshot) -> TableSnapshot:
+        nonlocal instalado
+        if atual is not base:
+            atual.pending_ids.update(novo.pending_ids)
+            atual.stale = True
+            instalado = atual
+            return atual
+        novo.pending_ids.update(atual.pending_ids - pendentes)
+        novo.stale = bool(novo.pending_ids)
+        return novo
+
+    get_snapshot_store().patch(env, table_name, swap)
+    if instalado is novo:
+        save_snapshot_async(env, table_name, novo, SCHEMA_VERSION)
+    return instalado
+
+def _reconcile_async(repo: Repository, env: str, table_name: str, snap: TableSnapshot) -> None:
+    """
+    Reconcilia em segundo plano um snapshot vindo do disco, sem segurar o primeiro render. Como ele
+    não tem `reconciled_at`, _sync relê a tabela inteira em vez de confiar em contagem e maior id.
+    """
+    store = get_snapshot_store()
+
+    def run():
+        try:
+            _sync(repo, env, table_name, snap)
+        except Exception:
+            store.mark_stale(env, table_name)
+
+    threading.Thread(target=run, daemon=True, name=f"contrax-reconcile-{table_name}").start()
+
 def load_data(table_name: str) -> pd.DataFrame:
+    """
+    Snapshot da tabela no ambiente da sessão, compartilhado entre todas as sessões do processo.
+    O retorno é uma view sem cópia (Copy-on-Write): pode ser alterado à vontade pelo chamador.
+    """
     current_env = st.session_state.get("env", "prod")
-    supabase = get_supabase_client(current_env)
-    all_data = []
-    offset = 0
-    batch_size = 1000
+    repo = get_repository(current_env)
+    store = get_snapshot_store()
+    snap = store.get(current_env, table_name)
+
+    if snap is None:
+        snap = load_snapshot(current_env, table_name, SCHEMA_VERSION)
+        if snap is not None:
+            store.put(current_env, table_name, snap)
+            _reconcile_async(repo, current_env, table_name, snap)
 
     try:
-        while True:
-            data = supabase.table(table_name).select("*").range(offset, offset + batch_size - 1).execute()
-
-            if not data.data:
-                break
-            
-            all_data.extend(data.data)
-            offset += batch_size
-            
+        if snap is None or snap.df.empty:
+            snap = _full_load(repo, current_env, table_name)
+            store.put(current_env, table_name, snap)
+            save_snapshot_async(current_env, table_name, snap, SCHEMA_VERSION)
+        elif store.needs_sync(snap):
+            # Sem mudanças, _sync mantém o snapshot: mesma versão, índices e figuras em cache continuam valendo.
+            snap = _sync(repo, current_env, table_name, snap)
     except Exception as e:
-        st.error(f"Erro de conexão com o Supabase na tabela '{table_name}'. O banco pode estar pausado ou indisponível.")
+        st.error(f"Erro de conexão com o banco ({repo.name}) na tabela '{table_name}'. O banco pode estar pausado ou indisponível.")
         st.error(f"Detalhe técnico: {e}")
 
-        return pd.DataFrame()
-
-    df = pd.DataFrame(all_data)
-    
-    if df.empty:
-        return df
-
-    if table_name == "parcelas":
-        cols_date = ["data_lancamento", "data_emissao", "data_vencimento"]
-        for col in cols_date:
-            if col in df.columns:
-                df[col] = pd.to_datetime(df[col], errors="coerce")
-        
-        cols_cat = ["tipo", "contrato", "estabelecimento", "status"]
-        for col in cols_cat:
-            if col in df.columns:
-                df[col] = df[col].astype("category")
-        
-        if 'mes' in df.columns:
-            month_display_map = {v: k for k, v in mes_dict.items()}
-            df['mes_nome'] = df['mes'].map(lambda x: month_display_map.get(x, f'Mês {x}'))
-
-    return df
\ No newline at end of file
+        return _view(snap) if snap is not None else pd.DataFrame()
+
+    return _view(snap)
+
+def _view(snap: TableSnapshot) -> pd.DataFrame:
+    """Cópia rasa do df do snapshot marcada com a versão dele (ver snapshot_derived)."""
+    df = snap.df.copy(deep=False)
+    df.attrs[VERSION_ATTR] = snap.version
+    return df
+
+def _server_query(columns: tuple, filtros: tuple):
+    """Traduz colunas derivadas (mes_nome) para as colunas reais antes de enviar ao servidor."""
+    server_cols = tuple(sorted({"mes" if c == "mes_nome" else c for c in columns}))
+    server_filtros = []
+    for coluna, op, valor in filtros:
+        if coluna == "mes_nome":
+            numero = lambda nome: MESES.index(nome) + 1
+            if op == "eq":
+                valor = numero(valor)
+            elif op == "in":
+                valor = tuple(numero(v) for v in valor)
+            coluna = "mes"
+        server_filtros.append((coluna, op, valor))
+    return server_cols, tuple(server_filtros)
+
+def query_data(table_name: str, columns=None, filtros=None) -> pd.DataFrame:
+    """
+    Consulta com projeção e filtros simples (eq/in/range), ex.:
+    `query_data("parcelas", ["contrato", "valor"], {"ano": 2025, "mes": [1, 2], "status": "LANÇADO"})`.
+
+    Com o snapshot da tabela em memória e em dia, o recorte é feito localmente sem rede.
+    Caso contrário, colunas e filtros vão para o banco e o resultado fica em cache
+    pela chave normalizada da consulta até a próxima escrita na tabela.
+    """
+    current_env = st.session_state.get("env", "prod")
+    columns = normalize_columns(columns)
+    filtros = normalize_filters(filtros)
+
+    store = get_snapshot_store()
+    snap = store.get(current_env, table_name)
+    if snap is not None and not snap.df.empty and not store.needs_sync(snap):
+        dims = INDEX_DIMS.get(table_name, [])
+        if filtros and all(op in ("eq", "in") and coluna in dims for coluna, op, _ in filtros):
+            mask = get_filter_index(table_name).mask({coluna: valor for coluna, _, valor in filtros})
+            out = snap.df[mask]
+            return out[list(columns)] if columns else out
+        return filter_frame(snap.df, filtros, columns)
+
+    cache = get_query_cache()
+    key = (current_env, table_name, columns, filtros)
+    df = cache.get(key)
+    if df is None:
+        server_cols, server_filtros = _server_query(columns, filtros)
+        try:
+            df = get_repository(current_env).select_frame(table_name, server_cols, server_filtros)
+        except Exception as e:
+            st.error(f"Erro ao consultar a tabela '{table_name}'.")
+            st.error(f"Detalhe técnico: {e}")
+            return pd.DataFrame()
+        df = _post_process(df, table_name)
+        if columns:
+            df = df[list(columns)]
+        cache.put(key, df)
+
+    return df.copy()
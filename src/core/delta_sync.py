@@ -0,0 +1,211 @@
+import time
+import itertools
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import pandas as pd
+
+WATERMARK_COLUMN = "updated_at"
+# Sem `updated_at` no servidor, uma edição que não muda contagem nem maior id escapa do delta:
+# a cada FULL_RECONCILE_TTLS vencimentos do TTL a tabela é relida inteira.
+FULL_RECONCILE_TTLS = 12
+
+
+@dataclass
+class TableSnapshot:
+    df: pd.DataFrame
+    count: int
+    max_id: int
+    watermark: object = None
+    loaded_at: float = field(default_factory=time.monotonic)
+    stale: bool = False
+    pending_ids: set = field(default_factory=set)
+    nbytes: int = 0
+    version: int = 0
+    # Última leitura completa da tabela (monotonic); None quando nunca houve neste processo.
+    reconciled_at: float = field(default_factory=time.monotonic)
+    # Estruturas derivadas do df (índices, agregados), calculadas sob demanda uma vez por versão.
+    derived: dict = field(default_factory=dict, repr=False)
+
+
+@dataclass
+class Delta:
+    rows: list
+    deleted_ids: set
+    watermark: object = None
+    ids_checked: bool = False
+
+    @property
+    def empty(self) -> bool:
+        return not self.rows and not self.deleted_ids
+
+
+def snapshot_watermark(df: pd.DataFrame):
+    if WATERMARK_COLUMN not in df.columns or df.empty:
+        return None
+    value = df[WATERMARK_COLUMN].max()
+    return None if pd.isna(value) else value
+
+
+def compute_delta(repo, table_name: str, snap: TableSnapshot) -> Delta:
+    """
+    Descobre o que mudou no servidor desde `snap`.
+
+    Inserções e exclusões são detectadas por contagem + maior id (ids são sequenciais):
+    se ambos batem com o snapshot, nada entrou nem saiu e a lista de ids nem é baixada.
+    Alterações vêm da coluna `updated_at` quando ela existe e, sempre, dos ids que os
+    serviços marcaram como pendentes após uma escrita. Edições feitas por fora sem `updated_at`
+    só aparecem na releitura completa periódica (ver SnapshotStore.needs_full).
+    """
+    count = repo.count(table_name)
+    max_id = repo.max_id(table_name)
+
+    refetch = set(snap.pending_ids)
+    deleted = set()
+    ids_checked = False
+
+    if count != snap.count or max_id != snap.max_id:
+        server_ids = repo.ids(table_name)
+        local_ids = set(snap.df["id"].astype(int)) if "id" in snap.df.columns else set()
+        deleted = local_ids - server_ids
+        refetch |= server_ids - local_ids
+        refetch -= deleted
+        ids_checked = True
+
+    rows = []
+    watermark = snap.watermark
+    if watermark is not None:
+        changed = repo.select(table_name, filtros=[(WATERMARK_COLUMN, "gt", _watermark_param(watermark))])
+        rows.extend(changed)
+        refetch -= {int(r["id"]) for r in changed}
+
+    if refetch:
+        fetched = repo.select(table_name, filtros=[("id", "in", sorted(refetch))])
+        deleted |= refetch - {int(r["id"]) for r in fetched}
+        rows.extend(fetched)
+
+    return Delta(rows=rows, deleted_ids=deleted, watermark=watermark, ids_checked=ids_checked)
+
+
+def _watermark_param(value):
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+def merge_delta(df: pd.DataFrame, delta: Delta) -> pd.DataFrame:
+    """Troca as linhas alteradas, acrescenta as novas e remove as excluídas, mantendo a ordem por id."""
+    if delta.empty:
+        return df
+
+    novos = pd.DataFrame(delta.rows)
+    remover = set(delta.deleted_ids)
+    if not novos.empty:
+        remover |= set(novos["id"].astype(int))
+
+    base = df[~df["id"].isin(remover)] if remover else df
+    if novos.empty:
+        return base.reset_index(drop=True)
+
+    # Categorias diferentes viram object no concat; quem chama reaplica o pós-processamento.
+    base = base.astype({c: "object" for c in base.columns if isinstance(base[c].dtype, pd.CategoricalDtype)})
+    merged = pd.concat([base, novos], ignore_index=True)
+    return merged.sort_values("id", kind="stable").reset_index(drop=True)
+
+
+class SnapshotStore:
+    """
+    Último snapshot de cada tabela, num namespace por ambiente (prod/homolog convivem sem
+    derrubar um ao outro). Acima de `max_bytes` os snapshots menos usados são descartados;
+    a próxima leitura deles volta do disco.
+
+    O `df` de um snapshot guardado nunca é alterado: toda mudança de dados cria um novo objeto
+    com `version` maior e troca a referência sob o lock, então leitores nunca veem meio-termo.
+    Só os metadados de sincronização (stale, pending_ids, loaded_at, reconciled_at) mudam no
+    próprio objeto, sob o lock (mark_stale, touch); `derived` é o cache daquela versão.
+    """
+
+    def __init__(self, ttl: float = 300, max_bytes: int = 512 * 1024 * 1024, full_every: int = FULL_RECONCILE_TTLS):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.full_every = full_every
+        self._snapshots = OrderedDict()
+        self._lock = threading.Lock()
+        self._versions = itertools.count(1)
+
+    def get(self, env: str, table_name: str):
+        with self._lock:
+            snap = self._snapshots.get((env, table_name))
+            if snap is not None:
+                self._snapshots.move_to_end((env, table_name))
+            return snap
+
+    def _store(self, key, snap: TableSnapshot) -> None:
+        snap.nbytes = int(snap.df.memory_usage(deep=True).sum())
+        snap.version = next(self._versions)
+        self._snapshots[key] = snap
+        self._snapshots.move_to_end(key)
+        total = sum(s.nbytes for s in self._snapshots.values())
+        for antigo in list(self._snapshots):
+            if total <= self.max_bytes or antigo == key:
+                break
+            total -= self._snapshots.pop(antigo).nbytes
+
+    def put(self, env: str, table_name: str, snap: TableSnapshot) -> None:
+        with self._lock:
+            self._store((env, table_name), snap)
+
+    def needs_sync(self, snap: TableSnapshot) -> bool:
+        return snap.stale or (time.monotonic() - snap.loaded_at) > self.ttl
+
+    def needs_full(self, snap: TableSnapshot) -> bool:
+        """Hora de reler a tabela inteira em vez do delta (a cada `full_every` TTLs)."""
+        return snap.reconciled_at is None or (time.monotonic() - snap.reconciled_at) > self.ttl * self.full_every
+
+    def touch(self, env: str, table_name: str, snap: TableSnapshot, ids_vistos=(), reconciled_at: float = None) -> bool:
+        """
+        Sincronização sem mudanças: mantém `snap` (mesma versão e derivados) e só renova `loaded_at`
+        (e `reconciled_at`, se veio de uma releitura completa). Ids marcados depois de `ids_vistos`
+        serem lidos continuam pendentes. False se `snap` já foi trocado.
+        """
+        with self._lock:
+            if self._snapshots.get((env, table_name)) is not snap:
+                return False
+            snap.pending_ids.difference_update(ids_vistos)
+            snap.stale = bool(snap.pending_ids)
+            snap.loaded_at = time.monotonic()
+            if reconciled_at is not None:
+                snap.reconciled_at = reconciled_at
+            return True
+
+    def patch(self, env: str, table_name: str, apply) -> bool:
+        """Substitui o snapshot por `apply(snapshot)` de forma atômica. False se não houver snapshot."""
+        with self._lock:
+            snap = self._snapshots.get((env, table_name))
+            if snap is None:
+                return False
+            novo = apply(snap)
+            if novo is not snap:
+                self._store((env, table_name), novo)
+            return True
+
+    def mark_stale(self, env: str, table_name: str, ids=None) -> None:
+        with self._lock:
+            snap = self._snapshots.get((env, table_name))
+            if snap is None:
+                return
+            snap.stale = True
+            if ids:
+                snap.pending_ids.update(int(i) for i in ids)
+
+    def clear(self, env: str = None, table_name: str = None) -> None:
+        """Descarta snapshots de um ambiente (e opcionalmente só uma tabela); sem argumentos, todos."""
+        with self._lock:
+            for key in list(self._snapshots):
+                if (env is None or key[0] == env) and (table_name is None or key[1] == table_name):
+                    del self._snapshots[key]
+
+    def usage(self) -> dict:
+        """Bytes em memória por ambiente."""
+        uso = {}
+        for (env, _), snap in list(self._snapshots.items()):
+            uso[env] = uso.get(env, 0) + snap.nbytes
+        return uso
@@ -0,0 +1,106 @@
+import os
+import json
+import time
+import logging
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import pyarrow as pa
+import pyarrow.parquet as pq
+from src.core.delta_sync import TableSnapshot
+
+FORMAT_VERSION = 1
+HEADER_KEY = b"contrax"
+CACHE_DIR = Path(os.environ.get("CONTRAX_CACHE_DIR", ".cache")) / "snapshots"
+
+logger = logging.getLogger(__name__)
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="contrax-snapshot")
+
+
+def snapshot_path(env: str, table_name: str) -> Path:
+    return CACHE_DIR / f"{env}__{table_name}.parquet"
+
+
+def save_snapshot(env: str, table_name: str, snap: TableSnapshot, schema_version: int) -> None:
+    """Grava o snapshot já tipado em Parquet (zstd) com um cabeçalho de versão no metadata do arquivo."""
+    header = {
+        "format": FORMAT_VERSION,
+        "schema": schema_version,
+        "env": env,
+        "table": table_name,
+        "count": snap.count,
+        "max_id": snap.max_id,
+        "watermark": snap.watermark.isoformat() if hasattr(snap.watermark, "isoformat") else snap.watermark,
+        "saved_at": time.time(),
+    }
+    table = pa.Table.from_pandas(snap.df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[HEADER_KEY] = json.dumps(header).encode()
+    table = table.replace_schema_metadata(metadata)
+
+    path = snapshot_path(env, table_name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    pq.write_table(table, tmp, compression="zstd")
+    os.replace(tmp, path)
+
+
+def save_snapshot_async(env: str, table_name: str, snap: TableSnapshot, schema_version: int) -> None:
+    def run():
+        try:
+            save_snapshot(env, table_name, snap, schema_version)
+        except Exception:
+            logger.exception("Falha ao gravar snapshot local de %s/%s", env, table_name)
+
+    _writer.submit(run)
+
+
+def drop_snapshots(env: str, table_name: str = None) -> None:
+    """
+    Apaga os snapshots locais de um ambiente (ou só de uma tabela). Roda na fila de gravação e
+    espera por ela, então uma gravação já enfileirada não recria o arquivo depois.
+    """
+    def run():
+        for path in CACHE_DIR.glob(f"{env}__{table_name or '*'}.parquet"):
+            path.unlink(missing_ok=True)
+
+    _writer.submit(run).result()
+
+
+def read_header(path: Path):
+    try:
+        metadata = pq.read_schema(path).metadata or {}
+        return json.loads(metadata[HEADER_KEY])
+    except Exception:
+        return None
+
+
+def load_snapshot(env: str, table_name: str, schema_version: int):
+    """
+    Lê o snapshot local. Arquivos de outro formato/versão de schema (ou corrompidos) são
+    apagados e None é devolvido, forçando a reconstrução a partir do servidor.
+    """
+    path = snapshot_path(env, table_name)
+    if not path.exists():
+        return None
+
+    header = read_header(path)
+    if (
+        header is None
+        or header.get("format") != FORMAT_VERSION
+        or header.get("schema") != schema_version
+        or header.get("table") != table_name
+    ):
+        path.unlink(missing_ok=True)
+        return None
+
+    try:
+        df = pq.read_table(path).to_pandas()
+    except Exception:
+        path.unlink(missing_ok=True)
+        return None
+
+    # reconciled_at=None: o arquivo pode ter perdido edições que contagem e maior id não mostram,
+    # então a primeira sincronização dele é uma leitura completa (ver SnapshotStore.needs_full).
+    return TableSnapshot(
+        df=df, count=header["count"], max_id=header["max_id"], watermark=header.get("watermark"), reconciled_at=None,
+    )
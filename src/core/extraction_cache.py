@@ -0,0 +1,135 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from pathlib import Path
+
+CACHE_DIR = Path(os.environ.get("CONTRAX_CACHE_DIR", ".cache")) / "extracoes"
+MAX_BYTES = int(float(os.environ.get("CONTRAX_EXTRACTION_CACHE_MB", "20")) * 1024 * 1024)
+
+logger = logging.getLogger(__name__)
+
+
+def content_key(file_bytes: bytes, versao: str) -> str:
+    """SHA-256 do conteúdo do arquivo junto com a versão do prompt/modelos."""
+    h = hashlib.sha256()
+    h.update(versao.encode())
+    h.update(b"\0")
+    h.update(file_bytes)
+    return h.hexdigest()
+
+
+class ExtractionCache:
+    """
+    Resultados de extração de notas em disco, endereçados pelo conteúdo (ver content_key): o mesmo PDF
+    reenviado, em qualquer sessão, não chama o modelo de novo. Um JSON por entrada; acima de
+    `max_bytes` as entradas usadas há mais tempo (mtime, atualizado a cada acerto) são apagadas.
+    """
+
+    def __init__(self, path: Path = CACHE_DIR, max_bytes: int = MAX_BYTES):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._bytes = None
+
+    def _arquivo(self, chave: str) -> Path:
+        return self.path / chave[:2] / f"{chave}.json"
+
+    def _entradas(self) -> list:
+        return list(self.path.glob("*/*.json")) if self.path.exists() else []
+
+    def _total(self) -> int:
+        if self._bytes is None:
+            self._bytes = sum(p.stat().st_size for p in self._entradas())
+        return self._bytes
+
+    def get(self, chave: str):
+        arquivo = self._arquivo(chave)
+        try:
+            resultado = json.loads(arquivo.read_text(encoding="utf-8"))
+            os.utime(arquivo)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return resultado
+
+    def put(self, chave: str, resultado: dict) -> None:
+        arquivo = self._arquivo(chave)
+        dados = json.dumps(resultado, ensure_ascii=False).encode("utf-8")
+        try:
+            arquivo.parent.mkdir(parents=True, exist_ok=True)
+            anterior = arquivo.stat().st_size if arquivo.exists() else 0
+            tmp = arquivo.with_suffix(f".{threading.get_ident()}.tmp")
+            tmp.write_bytes(dados)
+            os.replace(tmp, arquivo)
+        except OSError:
+            logger.exception("Falha ao gravar extração em cache (%s)", chave)
+            return
+        with self._lock:
+            if self._bytes is None:
+                # A primeira varredura do disco já inclui o arquivo recém-gravado.
+                self._total()
+            else:
+                self._bytes += len(dados) - anterior
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Apaga as entradas menos usadas até ficar abaixo de 90% do limite (chamado com o lock)."""
+        entradas = []
+        for p in self._entradas():
+            try:
+                info = p.stat()
+                entradas.append((info.st_mtime_ns, info.st_size, p))
+            except OSError:
+                continue
+        entradas.sort()
+        total = sum(tamanho for _, tamanho, _ in entradas)
+        alvo = self.max_bytes * 0.9
+        for _, tamanho, p in entradas:
+            if total <= alvo:
+                break
+            try:
+                p.unlink()
+                total -= tamanho
+            except OSError:
+                continue
+        self._bytes = total
+
+    def get_or_extract(self, file_bytes: bytes, versao: str, extrair):
+        """Resultado em cache para o conteúdo, ou `extrair()`; resultados com "error" não são guardados."""
+        chave = content_key(file_bytes, versao)
+        resultado = self.get(chave)
+        if resultado is not None:
+            return resultado
+        resultado = extrair()
+        if not resultado.get("error"):
+            self.put(chave, resultado)
+        return resultado
+
+    def clear(self) -> None:
+        with self._lock:
+            for p in self._entradas():
+                try:
+                    p.unlink()
+                except OSError:
+                    continue
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "taxa_acerto": self.hits / total if total else 0.0,
+                "entradas": len(self._entradas()),
+                "bytes": self._total(),
+                "orcamento": self.max_bytes,
+            }
@@ -0,0 +1,196 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import pandas as pd
+import pyarrow as pa
+
+PAGE_SIZE = 1000
+MAX_WORKERS = 4
+FETCH_MODES = ("offset", "keyset")
+
+
+@dataclass
+class PageTiming:
+    pagina: int
+    inicio: int
+    linhas: int
+    segundos: float
+
+
+@dataclass
+class FetchReport:
+    tabela: str
+    modo: str
+    total_esperado: int = 0
+    total_linhas: int = 0
+    segundos_total: float = 0.0
+    paginas: list = field(default_factory=list)
+
+    @property
+    def pagina_mais_lenta(self) -> float:
+        return max((p.segundos for p in self.paginas), default=0.0)
+
+    @property
+    def soma_paginas(self) -> float:
+        return sum(p.segundos for p in self.paginas)
+
+    def resumo(self) -> dict:
+        return {
+            "tabela": self.tabela,
+            "modo": self.modo,
+            "linhas": self.total_linhas,
+            "paginas": len(self.paginas),
+            "wall_s": round(self.segundos_total, 3),
+            "soma_paginas_s": round(self.soma_paginas, 3),
+            "pagina_mais_lenta_s": round(self.pagina_mais_lenta, 3),
+        }
+
+
+def count_rows(supabase, table_name: str) -> int:
+    resp = supabase.table(table_name).select("*", count="exact", head=True).execute()
+    return resp.count or 0
+
+
+def _id_bounds(supabase, table_name: str):
+    first = supabase.table(table_name).select("id").order("id").limit(1).execute().data
+    last = supabase.table(table_name).select("id").order("id", desc=True).limit(1).execute().data
+    if not first or not last:
+        return None, None
+    return int(first[0]["id"]), int(last[0]["id"])
+
+
+def _timed(report_pages: list, pagina: int, inicio: int, run):
+    t0 = time.perf_counter()
+    data = run()
+    report_pages.append(PageTiming(pagina, inicio, len(data), time.perf_counter() - t0))
+    return data
+
+
+def _decode_rows(page: list) -> list:
+    return page
+
+
+def _decode_arrow(page: list):
+    # Converte a página para colunas Arrow assim que chega; a lista de dicts é liberada em seguida.
+    return pa.Table.from_pylist(page) if page else None
+
+
+def _fetch_offset(supabase, table_name, columns, total, page_size, max_workers, report, decode):
+    def fetch_page(offset):
+        query = supabase.table(table_name).select(columns).order("id")
+        return query.range(offset, offset + page_size - 1).execute().data or []
+
+    def worker(item):
+        idx, offset = item
+        page = _timed(report.paginas, idx, offset, lambda: fetch_page(offset))
+        return len(page), decode(page)
+
+    offsets = list(range(0, total, page_size))
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = list(pool.map(worker, enumerate(offsets)))
+
+    # Linhas inseridas entre a contagem e a leitura ficam depois do último offset.
+    offset = total
+    while not results or results[-1][0] == page_size:
+        n, page = worker((len(results), offset))
+        if not n:
+            break
+        results.append((n, page))
+        offset += page_size
+
+    return [page for _, page in results]
+
+
+def _fetch_keyset(supabase, table_name, columns, total, page_size, max_workers, report, decode):
+    min_id, max_id = _id_bounds(supabase, table_name)
+    if min_id is None:
+        return []
+
+    n_ranges = max(1, -(-total // page_size))
+    width = max(page_size, -(-(max_id - min_id + 1) // n_ranges))
+    bounds = [(lo, lo + width) for lo in range(min_id, max_id + 1, width)]
+    # A última faixa fica aberta para capturar ids criados depois da leitura dos limites.
+    bounds[-1] = (bounds[-1][0], None)
+
+    def fetch_range(item):
+        idx, (lo, hi) = item
+        chunks = []
+        last_id = lo - 1
+        while True:
+            def run():
+                query = supabase.table(table_name).select(columns).gt("id", last_id)
+                if hi is not None:
+                    query = query.lt("id", hi)
+                return query.order("id").limit(page_size).execute().data or []
+
+            page = _timed(report.paginas, idx, last_id + 1, run)
+            if not page:
+                break
+            full = len(page) == page_size
+            last_id = int(page[-1]["id"])
+            chunks.append(decode(page))
+            del page
+            # Uma faixa fechada com no máximo `page_size` ids cabe inteira numa página.
+            if not full or (hi is not None and hi - lo <= page_size):
+                break
+        return chunks
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return [chunk for chunks in pool.map(fetch_range, enumerate(bounds)) for chunk in chunks]
+
+
+def _fetch(supabase, table_name, columns, mode, page_size, max_workers, decode):
+    if mode not in FETCH_MODES:
+        raise ValueError(f"Modo de leitura desconhecido: {mode}")
+    if mode == "keyset" and columns != "*" and "id" not in columns.split(","):
+        columns = f"id,{columns}"
+
+    report = FetchReport(tabela=table_name, modo=mode)
+    t0 = time.perf_counter()
+
+    report.total_esperado = count_rows(supabase, table_name)
+    fetcher = _fetch_offset if mode == "offset" else _fetch_keyset
+    pages = fetcher(supabase, table_name, columns, report.total_esperado, page_size, max_workers, report, decode)
+
+    report.paginas.sort(key=lambda p: (p.pagina, p.inicio))
+    report.total_linhas = sum(p.linhas for p in report.paginas)
+    return pages, report, t0
+
+
+def fetch_table(supabase, table_name: str, columns: str = "*", mode: str = "offset",
+                page_size: int = PAGE_SIZE, max_workers: int = MAX_WORKERS):
+    """
+    Lê a tabela inteira em páginas concorrentes (no máximo `max_workers` em paralelo).
+
+    - "offset": conta as linhas e dispara um `.range()` por página, ordenado por id.
+    - "keyset": divide o intervalo de ids em faixas e pagina cada faixa por `id > último`.
+
+    Retorna (linhas, FetchReport) com o tempo de cada página.
+    """
+    pages, report, t0 = _fetch(supabase, table_name, columns, mode, page_size, max_workers, _decode_rows)
+    rows = [row for page in pages for row in page]
+    report.segundos_total = time.perf_counter() - t0
+    return rows, report
+
+
+def fetch_frame(supabase, table_name: str, columns: str = "*", mode: str = "offset",
+                page_size: int = PAGE_SIZE, max_workers: int = MAX_WORKERS):
+    """
+    Igual a `fetch_table`, mas cada página vira colunas Arrow assim que chega e o resultado
+    é um DataFrame: o pico de memória fica perto do tamanho final, sem a lista de dicts inteira.
+    """
+    pages, report, t0 = _fetch(supabase, table_name, columns, mode, page_size, max_workers, _decode_arrow)
+    tables = [t for t in pages if t is not None]
+    del pages
+
+    if not tables:
+        df = pd.DataFrame()
+    else:
+        # Uma página só com nulos numa coluna tem tipo null; "permissive" também une int com float.
+        table = pa.concat_tables(tables, promote_options="permissive")
+        del tables
+        df = table.to_pandas(self_destruct=True, split_blocks=True)
+        del table
+
+    report.segundos_total = time.perf_counter() - t0
+    return df, report
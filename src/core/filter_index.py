@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+
+# Dimensões de filtro por tabela e flags derivadas (máscaras booleanas pré-calculadas).
+INDEX_DIMS = {
+    "parcelas": ["ano", "mes_nome", "contrato", "tipo", "estabelecimento", "status", "classificacao", "situacao"],
+    "contratos": ["situacao", "contrato", "estabelecimento", "classificacao"],
+}
+INDEX_FLAGS = {
+    "parcelas": {"hcompany": ("contrato", lambda s: s.astype(str).str.startswith("HCOMPANY"))},
+    "contratos": {"pedido": ("numero", lambda s: s.astype(str) == "PEDIDO")},
+}
+
+
+class FilterIndex:
+    """
+    Bitmaps (bits empacotados) por valor de cada dimensão de um snapshot. Uma seleção vira
+    OR dos bitmaps dos valores escolhidos e AND entre dimensões; dimensão com tudo
+    selecionado (e sem nulos) é pulada, e seleções grandes usam o complemento das não escolhidas.
+    """
+
+    def __init__(self, df: pd.DataFrame, dims, flags=None):
+        self.size = len(df)
+        self._nbytes = (self.size + 7) // 8
+        self._dims = {}
+        self._flags = {}
+
+        for dim in dims:
+            if dim not in df.columns:
+                continue
+            codes, uniques = pd.factorize(df[dim])
+            order = np.argsort(codes, kind="stable")
+            limites = np.searchsorted(codes[order], np.arange(-1, len(uniques) + 1))
+            bitmaps = np.empty((len(uniques), self._nbytes), dtype=np.uint8)
+            for code in range(len(uniques)):
+                bitmaps[code] = self._pack(order[limites[code + 1]:limites[code + 2]])
+            self._dims[dim] = {
+                "valores": {v: i for i, v in enumerate(uniques.tolist())},
+                "bitmaps": bitmaps,
+                "nulos": self._pack(order[limites[0]:limites[1]]),
+                "tem_nulos": bool(limites[1] > limites[0]),
+            }
+
+        for nome, serie in (flags or {}).items():
+            self._flags[nome] = np.packbits(np.asarray(serie, dtype=bool))
+
+    def _pack(self, posicoes) -> np.ndarray:
+        bits = np.zeros(self.size, dtype=bool)
+        bits[posicoes] = True
+        return np.packbits(bits)
+
+    def values(self, dim: str) -> list:
+        return list(self._dims[dim]["valores"]) if dim in self._dims else []
+
+    def _dim_bits(self, dim: str, selecionados):
+        info = self._dims[dim]
+        if not isinstance(selecionados, (list, tuple, set, frozenset)):
+            selecionados = [selecionados]
+        codes = sorted({info["valores"][v] for v in selecionados if v in info["valores"]})
+        total = len(info["valores"])
+
+        if len(codes) == total and not info["tem_nulos"]:
+            return None
+        if not codes:
+            return np.zeros(self._nbytes, dtype=np.uint8)
+        if len(codes) * 2 > total:
+            fora = np.setdiff1d(np.arange(total), codes)
+            excluir = info["nulos"].copy()
+            if len(fora):
+                excluir |= np.bitwise_or.reduce(info["bitmaps"][fora], axis=0)
+            return ~excluir
+        return np.bitwise_or.reduce(info["bitmaps"][codes], axis=0)
+
+    def mask(self, selecao: dict = None, flags: dict = None) -> np.ndarray:
+        """
+        `selecao`: {dimensão: valores aceitos}; `flags`: {flag: True/False exigido}.
+        Devolve um array booleano do tamanho do snapshot.
+        """
+        bits = None
+        for dim, selecionados in (selecao or {}).items():
+            dim_bits = self._dim_bits(dim, selecionados)
+            if dim_bits is not None:
+                bits = dim_bits if bits is None else bits & dim_bits
+
+        for nome, exigido in (flags or {}).items():
+            flag = self._flags[nome] if exigido else ~self._flags[nome]
+            bits = flag if bits is None else bits & flag
+
+        if bits is None:
+            return np.ones(self.size, dtype=bool)
+        return np.unpackbits(bits, count=self.size).view(bool)
+
+
+def build_filter_index(df: pd.DataFrame, table_name: str) -> FilterIndex:
+    flags = {
+        nome: fn(df[coluna])
+        for nome, (coluna, fn) in INDEX_FLAGS.get(table_name, {}).items()
+        if coluna in df.columns
+    }
+    return FilterIndex(df, INDEX_DIMS.get(table_name, []), flags)
@@ -0,0 +1,51 @@
+import threading
+from collections import OrderedDict
+
+_AUSENTE = object()
+
+
+class LRUCache:
+    """
+    Resultados prontos (figuras Plotly, bytes de exportação) por chave que começa com
+    (env, tabela, versão do snapshot, ...), com descarte LRU acima de `max_entries`. Uma versão nova
+    do snapshot muda a chave, então entradas antigas só saem por LRU. O que é guardado não deve
+    ser alterado por quem recebe.
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, build):
+        with self._lock:
+            valor = self._entries.get(key, _AUSENTE)
+            if valor is not _AUSENTE:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return valor
+            self.misses += 1
+
+        valor = build()
+        with self._lock:
+            self._entries[key] = valor
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return valor
+
+    def invalidate(self, env: str, table_name: str = None) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == env and (table_name is None or k[1] == table_name)]:
+                del self._entries[key]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "taxa_acerto": self.hits / total if total else 0.0,
+            "entradas": len(self._entries),
+        }
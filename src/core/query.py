@@ -0,0 +1,96 @@
+import time
+import threading
+import pandas as pd
+
+OPERATORS = ("eq", "in", "range", "gt")
+
+
+def normalize_filters(filtros) -> tuple:
+    """
+    Aceita `{"ano": 2025, "mes": [1, 2], "valor": (10, None)}` ou uma lista de
+    `(coluna, op, valor)` com op em eq/in/range/gt e devolve uma tupla canônica e hashable.
+    Listas viram "in" (um único valor vira "eq"); tuplas de dois itens viram "range" (limites inclusivos, None = aberto).
+    """
+    if not filtros:
+        return ()
+    items = filtros.items() if isinstance(filtros, dict) else [((c, op), v) for c, op, v in filtros]
+
+    normalizados = []
+    for chave, valor in items:
+        coluna, op = chave if isinstance(chave, tuple) else (chave, None)
+        if op is None:
+            if isinstance(valor, tuple):
+                op = "range"
+            elif isinstance(valor, (list, set, frozenset)):
+                op = "in"
+            else:
+                op = "eq"
+        if op not in OPERATORS:
+            raise ValueError(f"Operador não suportado: {op}")
+
+        if op == "in":
+            valores = tuple(sorted(set(valor), key=str))
+            if len(valores) == 1:
+                op, valor = "eq", valores[0]
+            else:
+                valor = valores
+        elif op == "range":
+            valor = tuple(valor)
+        normalizados.append((coluna, op, valor))
+
+    return tuple(sorted(normalizados, key=lambda f: (f[0], f[1])))
+
+
+def normalize_columns(columns) -> tuple:
+    if not columns or columns == "*":
+        return ()
+    return tuple(sorted(set(columns)))
+
+
+def filter_frame(df: pd.DataFrame, filtros: tuple, columns: tuple = ()) -> pd.DataFrame:
+    """Avalia os filtros normalizados localmente, sobre um snapshot já em memória."""
+    mask = pd.Series(True, index=df.index)
+    for coluna, op, valor in filtros:
+        serie = df[coluna]
+        if op == "eq":
+            mask &= serie == valor
+        elif op == "in":
+            mask &= serie.isin(valor)
+        elif op == "gt":
+            mask &= serie > valor
+        else:
+            lo, hi = valor
+            if lo is not None:
+                mask &= serie >= lo
+            if hi is not None:
+                mask &= serie <= hi
+    out = df[mask.fillna(False).astype(bool)]
+    return out[list(columns)] if columns else out
+
+
+class QueryCache:
+    """Resultados de consultas por (env, tabela, colunas, filtros), invalidados por tabela."""
+
+    def __init__(self, ttl: float = 300):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None or (time.monotonic() - entry[1]) > self.ttl:
+            return None
+        return entry[0]
+
+    def put(self, key, df: pd.DataFrame) -> None:
+        with self._lock:
+            self._entries[key] = (df, time.monotonic())
+
+    def invalidate(self, env: str, table_name: str = None) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == env and (table_name is None or k[1] == table_name)]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
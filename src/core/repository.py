@@ -0,0 +1,364 @@
+import os
+import math
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from src.core.fetch_engine import fetch_frame, fetch_table, count_rows
+from src.core.query import normalize_filters
+
+PAGE_SIZE = 1000
+IN_CHUNK = 200
+
+
+class Repository(ABC):
+    """
+    Acesso a dados usado pelo app. Filtros seguem `query.normalize_filters`
+    (dict ou tuplas `(coluna, op, valor)` com op eq/in/range/gt). As escritas devolvem
+    as linhas completas afetadas, como o Supabase faz com `returning=representation`.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def count(self, table_name: str) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def max_id(self, table_name: str) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def load_table(self, table_name: str):
+        """Tabela inteira como DataFrame cru (sem schema) e o relatório de leitura, se houver."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def ids(self, table_name: str) -> set:
+        raise NotImplementedError
+
+    @abstractmethod
+    def select(self, table_name: str, columns=(), filtros=None) -> list:
+        raise NotImplementedError
+
+    def select_frame(self, table_name: str, columns=(), filtros=None) -> pd.DataFrame:
+        return pd.DataFrame(self.select(table_name, columns, filtros))
+
+    @abstractmethod
+    def insert(self, table_name: str, rows) -> list:
+        raise NotImplementedError
+
+    @abstractmethod
+    def update(self, table_name: str, values: dict, filtros) -> list:
+        raise NotImplementedError
+
+    def update_rows(self, table_name: str, rows) -> list:
+        """
+        Atualiza cada linha pelo seu `id` com os demais campos dela. Só UPDATE: um id que não
+        existe mais não é recriado, apenas não volta no resultado.
+        """
+        atualizadas = []
+        for row in rows:
+            valores = {c: v for c, v in row.items() if c != "id"}
+            atualizadas.extend(self.update(table_name, valores, {"id": row["id"]}))
+        return atualizadas
+
+    @abstractmethod
+    def delete(self, table_name: str, filtros) -> list:
+        raise NotImplementedError
+
+    @abstractmethod
+    def upsert(self, table_name: str, rows) -> list:
+        raise NotImplementedError
+
+
+def _split_in_filters(filtros: tuple):
+    """Quebra um filtro "in" grande em vários, para não estourar o tamanho da URL/parâmetros."""
+    grandes = [f for f in filtros if f[1] == "in" and len(f[2]) > IN_CHUNK]
+    if not grandes:
+        return [filtros]
+    coluna, _, valores = grandes[0]
+    resto = tuple(f for f in filtros if f is not grandes[0])
+    return [
+        resto + ((coluna, "in", valores[i:i + IN_CHUNK]),)
+        for i in range(0, len(valores), IN_CHUNK)
+    ]
+
+
+class SupabaseRepository(Repository):
+    name = "supabase"
+
+    def __init__(self, client, fetch_mode: str = "offset"):
+        self.client = client
+        self.fetch_mode = fetch_mode
+
+    def _filtered(self, query, filtros: tuple):
+        for coluna, op, valor in filtros:
+            if op == "eq":
+                query = query.eq(coluna, valor)
+            elif op == "in":
+                query = query.in_(coluna, list(valor))
+            elif op == "gt":
+                query = query.gt(coluna, valor)
+            else:
+                lo, hi = valor
+                if lo is not None:
+                    query = query.gte(coluna, lo)
+                if hi is not None:
+                    query = query.lte(coluna, hi)
+        return query
+
+    def count(self, table_name):
+        return count_rows(self.client, table_name)
+
+    def max_id(self, table_name):
+        data = self.client.table(table_name).select("id").order("id", desc=True).limit(1).execute().data
+        return int(data[0]["id"]) if data else 0
+
+    def load_table(self, table_name):
+        return fetch_frame(self.client, table_name, mode=self.fetch_mode)
+
+    def ids(self, table_name):
+        rows, _ = fetch_table(self.client, table_name, columns="id", mode="keyset")
+        return {int(r["id"]) for r in rows}
+
+    def _pages(self, table_name, columns, filtros):
+        select = ",".join(columns) if columns else "*"
+        if columns and "id" not in columns:
+            select = f"id,{select}"
+        for parte in _split_in_filters(normalize_filters(filtros)):
+            offset = 0
+            while True:
+                query = self._filtered(self.client.table(table_name).select(select), parte).order("id")
+                page = query.range(offset, offset + PAGE_SIZE - 1).execute().data or []
+                if page:
+                    yield page
+                if len(page) < PAGE_SIZE:
+                    break
+                offset += PAGE_SIZE
+
+    def select(self, table_name, columns=(), filtros=None):
+        return [row for page in self._pages(table_name, columns, filtros) for row in page]
+
+    def select_frame(self, table_name, columns=(), filtros=None):
+        tables = [pa.Table.from_pylist(page) for page in self._pages(table_name, columns, filtros)]
+        if not tables:
+            return pd.DataFrame(columns=list(columns) if columns else None)
+        df = pa.concat_tables(tables, promote_options="permissive").to_pandas()
+        return df[list(columns)] if columns else df
+
+    def insert(self, table_name, rows):
+        return self.client.table(table_name).insert(list(rows)).execute().data or []
+
+    def update(self, table_name, values, filtros):
+        query = self.client.table(table_name).update(values)
+        return self._filtered(query, normalize_filters(filtros)).execute().data or []
+
+    def update_rows(self, table_name, rows):
+        """
+        Um select das linhas atuais e um único upsert delas com os campos novos: duas requisições
+        para o lote inteiro, gravado numa só instrução (tudo ou nada). Ids que não existem mais
+        ficam de fora do upsert, então não são recriados.
+        """
+        rows = list(rows)
+        if not rows:
+            return []
+        atuais = {int(r["id"]): r for r in self.select(table_name, filtros=[("id", "in", [r["id"] for r in rows])])}
+        completas = [{**atuais[int(r["id"])], **r} for r in rows if int(r["id"]) in atuais]
+        if not completas:
+            return []
+        return self.client.table(table_name).upsert(completas, on_conflict="id").execute().data or []
+
+    def delete(self, table_name, filtros):
+        query = self.client.table(table_name).delete()
+        return self._filtered(query, normalize_filters(filtros)).execute().data or []
+
+    def upsert(self, table_name, rows):
+        return self.client.table(table_name).upsert(list(rows), on_conflict="id").execute().data or []
+
+
+LOCAL_SCHEMA = {
+    "contratos": {
+        "situacao": "TEXT", "numero": "TEXT", "contrato": "TEXT", "conta": "TEXT",
+        "centro_custo": "TEXT", "estabelecimento": "TEXT", "classificacao": "TEXT",
+        "descricao": "TEXT", "cnpj": "TEXT", "anexos": "TEXT", "valor_contrato": "REAL",
+        "inicio": "TEXT", "termino": "TEXT",
+    },
+    "parcelas": {
+        "contrato_id": "INTEGER", "ano": "INTEGER", "mes": "INTEGER", "data_lancamento": "TEXT",
+        "data_emissao": "TEXT", "data_vencimento": "TEXT", "tipo": "TEXT", "contrato": "TEXT",
+        "classificacao": "TEXT", "referente": "TEXT", "documento": "TEXT",
+        "estabelecimento": "TEXT", "status": "TEXT", "valor": "REAL", "situacao": "TEXT",
+    },
+}
+LOCAL_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_parcelas_ano_mes ON parcelas (ano, mes, status)",
+    "CREATE INDEX IF NOT EXISTS ix_parcelas_contrato ON parcelas (contrato)",
+    "CREATE INDEX IF NOT EXISTS ix_contratos_contrato ON contratos (contrato)",
+]
+
+
+def _quoted(cols) -> str:
+    return ", ".join(f'"{c}"' for c in cols)
+
+
+def _sql_value(value):
+    if value is None or value is pd.NA or value is pd.NaT:
+        return None
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, (pd.Timestamp, datetime, date)):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class LocalRepository(Repository):
+    """Mesmo contrato do Supabase sobre um SQLite embarcado (arquivo ou ':memory:'), sem rede."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str = ":memory:"):
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._create_schema()
+
+    def _create_schema(self):
+        with self._lock, self._conn:
+            for table_name, colunas in LOCAL_SCHEMA.items():
+                cols = ", ".join(f'"{c}" {t}' for c, t in colunas.items())
+                self._conn.execute(
+                    f'CREATE TABLE IF NOT EXISTS "{table_name}" (id INTEGER PRIMARY KEY AUTOINCREMENT, {cols})'
+                )
+            for ddl in LOCAL_INDEXES:
+                self._conn.execute(ddl)
+
+    def _where(self, filtros):
+        clauses, params = [], []
+        for coluna, op, valor in normalize_filters(filtros):
+            if op == "eq":
+                clauses.append(f'"{coluna}" = ?')
+                params.append(_sql_value(valor))
+            elif op == "in":
+                if not valor:
+                    clauses.append("0")
+                    continue
+                clauses.append(f'"{coluna}" IN ({", ".join("?" * len(valor))})')
+                params.extend(_sql_value(v) for v in valor)
+            elif op == "gt":
+                clauses.append(f'"{coluna}" > ?')
+                params.append(_sql_value(valor))
+            else:
+                lo, hi = valor
+                if lo is not None:
+                    clauses.append(f'"{coluna}" >= ?')
+                    params.append(_sql_value(lo))
+                if hi is not None:
+                    clauses.append(f'"{coluna}" <= ?')
+                    params.append(_sql_value(hi))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(r) for r in self._conn.execute(sql, params).fetchall()]
+
+    def count(self, table_name):
+        return self._query(f'SELECT COUNT(*) AS n FROM "{table_name}"')[0]["n"]
+
+    def max_id(self, table_name):
+        return self._query(f'SELECT COALESCE(MAX(id), 0) AS m FROM "{table_name}"')[0]["m"]
+
+    def load_table(self, table_name):
+        with self._lock:
+            return pd.read_sql_query(f'SELECT * FROM "{table_name}" ORDER BY id', self._conn), None
+
+    def ids(self, table_name):
+        return {r["id"] for r in self._query(f'SELECT id FROM "{table_name}"')}
+
+    def select(self, table_name, columns=(), filtros=None):
+        cols = _quoted(sorted({"id", *columns})) if columns else "*"
+        where, params = self._where(filtros)
+        return self._query(f'SELECT {cols} FROM "{table_name}"{where} ORDER BY id', params)
+
+    def select_frame(self, table_name, columns=(), filtros=None):
+        df = super().select_frame(table_name, columns, filtros)
+        return df[list(columns)] if columns and not df.empty else df
+
+    def _write(self, statements):
+        out = []
+        with self._lock, self._conn:
+            for sql, params in statements:
+                out.extend(dict(r) for r in self._conn.execute(sql, params).fetchall())
+        return out
+
+    def insert(self, table_name, rows):
+        statements = []
+        for row in rows:
+            cols = list(row)
+            statements.append((
+                f'INSERT INTO "{table_name}" ({_quoted(cols)}) '
+                f'VALUES ({", ".join("?" * len(cols))}) RETURNING *',
+                [_sql_value(row[c]) for c in cols],
+            ))
+        return self._write(statements)
+
+    def update(self, table_name, values, filtros):
+        where, params = self._where(filtros)
+        sets = ", ".join(f'"{c}" = ?' for c in values)
+        return self._write([(
+            f'UPDATE "{table_name}" SET {sets}{where} RETURNING *',
+            [_sql_value(v) for v in values.values()] + params,
+        )])
+
+    def update_rows(self, table_name, rows):
+        statements = []
+        for row in rows:
+            cols = [c for c in row if c != "id"]
+            sets = ", ".join(f'"{c}" = ?' for c in cols)
+            statements.append((
+                f'UPDATE "{table_name}" SET {sets} WHERE id = ? RETURNING *',
+                [_sql_value(row[c]) for c in cols] + [_sql_value(row["id"])],
+            ))
+        return self._write(statements)
+
+    def delete(self, table_name, filtros):
+        where, params = self._where(filtros)
+        return self._write([(f'DELETE FROM "{table_name}"{where} RETURNING *', params)])
+
+    def upsert(self, table_name, rows):
+        statements = []
+        for row in rows:
+            cols = list(row)
+            updates = ", ".join(f'"{c}" = excluded."{c}"' for c in cols if c != "id")
+            statements.append((
+                f'INSERT INTO "{table_name}" ({_quoted(cols)}) '
+                f'VALUES ({", ".join("?" * len(cols))}) ON CONFLICT(id) DO UPDATE SET {updates} RETURNING *',
+                [_sql_value(row[c]) for c in cols],
+            ))
+        return self._write(statements)
+
+
+def copy_tables(origem: Repository, destino: Repository, tables=("contratos", "parcelas")) -> dict:
+    """Copia tabelas inteiras (com ids) de um backend para outro, ex. Supabase -> SQLite local."""
+    copiadas = {}
+    for table_name in tables:
+        df, _ = origem.load_table(table_name)
+        rows = df.astype(object).where(df.notna(), None).to_dict("records")
+        for i in range(0, len(rows), PAGE_SIZE):
+            destino.upsert(table_name, rows[i:i + PAGE_SIZE])
+        copiadas[table_name] = len(rows)
+    return copiadas
+
+
+def local_path(env: str) -> str:
+    base = Path(os.environ.get("CONTRAX_CACHE_DIR", ".cache"))
+    return os.environ.get("CONTRAX_SQLITE_PATH") or str(base / f"contrax_{env}.sqlite")
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+_VAZIO = np.array([], dtype=np.intp)
+
+
+def _chave(valor):
+    if isinstance(valor, tuple):
+        return tuple(_chave(v) for v in valor)
+    return valor.item() if isinstance(valor, np.generic) else valor
+
+
+class RowLookup:
+    """
+    Posições das parcelas de um snapshot por (ano, mes), (ano, mes, status), contrato e id.
+    Montado uma vez por versão; as telas de ação recortam por posição em vez de mascarar o frame
+    inteiro, e as opções saem como ids (int) com rótulos montados por coluna, sem iterrows.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self._periodo = self._grupos(["ano", "mes"])
+        self._periodo_status = self._grupos(["ano", "mes", "status"])
+        self._contrato = self._grupos(["contrato"])
+        self._ids = pd.Index(df["id"]) if "id" in df.columns else pd.Index([], dtype="Int64")
+
+    def _grupos(self, colunas) -> dict:
+        if not set(colunas) <= set(self.df.columns) or self.df.empty:
+            return {}
+        por = colunas if len(colunas) > 1 else colunas[0]
+        grupos = self.df.groupby(por, observed=True, dropna=True, sort=False).indices
+        return {_chave(k): np.sort(v) for k, v in grupos.items()}
+
+    def positions(self, ano: int, mes: int, status: str = None) -> np.ndarray:
+        if status is None:
+            return self._periodo.get((int(ano), int(mes)), _VAZIO)
+        return self._periodo_status.get((int(ano), int(mes), status), _VAZIO)
+
+    def contract_positions(self, contrato) -> np.ndarray:
+        return self._contrato.get(contrato, _VAZIO)
+
+    def contracts(self) -> list:
+        return sorted(self._contrato, key=str)
+
+    def position(self, id_parcela: int):
+        """Posição da parcela `id_parcela` no snapshot, ou None."""
+        pos = self._ids.get_indexer([id_parcela])[0]
+        return None if pos < 0 else int(pos)
+
+    def row(self, id_parcela: int):
+        pos = self.position(id_parcela)
+        return None if pos is None else self.df.iloc[pos]
+
+    def rows(self, posicoes, sort_by: str = None) -> pd.DataFrame:
+        linhas = self.df.iloc[posicoes]
+        return linhas.sort_values(sort_by, kind="stable") if sort_by else linhas
+
+    def options(self, linhas: pd.DataFrame, colunas, prefixos=None) -> tuple:
+        """
+        (ids, rótulos) para um selectbox/radio: `ids` é a lista de ids (int) e `rótulos` um dict
+        id -> texto com as `colunas` separadas por " | " (cada uma com seu prefixo opcional).
+        """
+        prefixos = prefixos or {}
+        ids = linhas["id"].astype("int64").tolist()
+        partes = [prefixos.get(c, "") + linhas[c].astype(str) for c in colunas]
+        texto = partes[0]
+        for parte in partes[1:]:
+            texto = texto + " | " + parte
+        return ids, dict(zip(ids, texto.tolist()))
+
+
+def build_row_lookup(df: pd.DataFrame) -> RowLookup:
+    return RowLookup(df)
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+from src.utils.stamp import mes_dict
+
+MESES = list(mes_dict.keys())
+
+# Tipos por tabela. Texto de baixa cardinalidade vira category, ano/mês viram inteiros
+# pequenos (nullable) e valores monetários float nullable. Mudou aqui? Suba SCHEMA_VERSION.
+TABLE_SCHEMAS = {
+    "parcelas": {
+        "datas": ["data_lancamento", "data_emissao", "data_vencimento"],
+        "categorias": ["tipo", "contrato", "estabelecimento", "status", "classificacao", "situacao", "referente"],
+        "inteiros": {"id": "Int64", "contrato_id": "Int32", "ano": "Int16", "mes": "Int8"},
+        "floats": {"valor": "Float64"},
+        "mes_nome": "mes",
+    },
+    "contratos": {
+        "datas": ["inicio", "termino"],
+        "categorias": ["situacao", "contrato", "estabelecimento", "classificacao", "numero", "anexos"],
+        "inteiros": {"id": "Int64"},
+        "floats": {"valor_contrato": "Float64"},
+    },
+}
+
+
+def month_names(mes: pd.Series) -> pd.Series:
+    """Nome do mês (jan..dez) a partir do número, sem laço por linha. Fora de 1..12 vira 'Mês N'."""
+    numeros = pd.to_numeric(mes, errors="coerce")
+    codes = numeros.fillna(0).astype("int64").to_numpy() - 1
+    validos = (codes >= 0) & (codes < 12)
+    codes = np.where(validos, codes, -1)
+
+    if validos.all() or numeros.isna().all():
+        return pd.Series(pd.Categorical.from_codes(codes, categories=MESES, ordered=True), index=mes.index)
+
+    extras = sorted({int(n) for n in numeros[~validos].dropna()})
+    categorias = MESES + [f"Mês {n}" for n in extras]
+    extra_codes = {n: 12 + i for i, n in enumerate(extras)}
+    fora = ~validos & numeros.notna().to_numpy()
+    codes[fora] = [extra_codes[int(n)] for n in numeros[fora]]
+    return pd.Series(pd.Categorical.from_codes(codes, categories=categorias, ordered=True), index=mes.index)
+
+
+def apply_schema(df: pd.DataFrame, table_name: str) -> pd.DataFrame:
+    """Aplica os tipos de TABLE_SCHEMAS. Idempotente: pode rodar de novo após um merge."""
+    schema = TABLE_SCHEMAS.get(table_name)
+    if schema is None or df.empty:
+        return df
+
+    conversoes = {}
+    for col in schema.get("datas", []):
+        if col in df.columns and not pd.api.types.is_datetime64_any_dtype(df[col]):
+            conversoes[col] = pd.to_datetime(df[col], errors="coerce")
+
+    for col in schema.get("categorias", []):
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            conversoes[col] = df[col].astype("category")
+
+    for col, dtype in {**schema.get("inteiros", {}), **schema.get("floats", {})}.items():
+        if col in df.columns and df[col].dtype != dtype:
+            conversoes[col] = pd.to_numeric(df[col], errors="coerce").astype(dtype)
+
+    if "mes_nome" in schema and schema["mes_nome"] in df.columns:
+        conversoes["mes_nome"] = month_names(df[schema["mes_nome"]])
+
+    return df.assign(**conversoes) if conversoes else df
+
+
+def memory_report(df: pd.DataFrame) -> pd.DataFrame:
+    """Bytes ocupados por coluna (deep), do maior para o menor."""
+    uso = df.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        "coluna": uso.index,
+        "dtype": [str(df[c].dtype) for c in uso.index],
+        "bytes": uso.to_numpy(),
+    })
+    report["kb"] = (report["bytes"] / 1024).round(1)
+    return report.sort_values("bytes", ascending=False, ignore_index=True)
@@ -0,0 +1,114 @@
+import re
+import unicodedata
+import numpy as np
+import pandas as pd
+from src.core.database_connections import snapshot_derived
+
+# Peso de cada evidência no score de uma nota contra uma parcela (soma 1).
+PESOS = {"cnpj": 0.5, "nome": 0.3, "valor": 0.2}
+# Abaixo disso a nota fica sem parcela. Só o valor (0.2) nunca basta.
+SCORE_MINIMO = 0.35
+# Quantos lançamentos recentes do contrato formam o valor de referência.
+HISTORICO_VALOR = 3
+PALAVRAS_IGNORADAS = {
+    "LTDA", "SA", "S/A", "ME", "EPP", "EIRELI", "DE", "DO", "DA", "DOS", "DAS", "E",
+    "COMERCIO", "SERVICOS", "BRASIL", "DO BRASIL",
+}
+COLUNAS_CASAMENTO = [
+    "arquivo", "numero_doc", "valor_doc", "cnpj_emitente", "nome_emitente",
+    "id", "contrato", "score", "problema",
+]
+
+
+def _digitos(valor) -> str:
+    return re.sub(r"\D", "", "" if valor is None or valor is pd.NA or (isinstance(valor, float) and np.isnan(valor)) else str(valor))
+
+
+def _tokens(nome) -> frozenset:
+    """Palavras do nome sem acento, números e termos societários (LTDA, S/A...)."""
+    texto = unicodedata.normalize("NFKD", "" if nome is None or nome is pd.NA else str(nome))
+    texto = "".join(c for c in texto if not unicodedata.combining(c)).upper()
+    return frozenset(p for p in re.split(r"[^A-Z0-9/]+", texto) if p and not p.isdigit() and p not in PALAVRAS_IGNORADAS)
+
+
+def _similaridade(a: frozenset, b: frozenset) -> float:
+    """Sobreposição de palavras: 1 quando um nome está contido no outro."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+def _valores_referencia(parcelas: pd.DataFrame) -> pd.Series:
+    lancadas = parcelas[(parcelas["status"] == "LANÇADO") & parcelas["valor"].notna()]
+    recentes = lancadas.sort_values(["ano", "mes"], kind="stable").groupby("contrato", observed=True).tail(HISTORICO_VALOR)
+    return recentes.groupby("contrato", observed=True)["valor"].median().astype("float64")
+
+
+def valores_referencia(df: pd.DataFrame) -> pd.Series:
+    """Mediana dos últimos lançamentos de cada contrato, calculada uma vez por versão do snapshot."""
+    return snapshot_derived("parcelas", "valores_referencia", _valores_referencia, df)
+
+
+def casar_notas(notas: list, parcelas: pd.DataFrame, contratos: pd.DataFrame = None, referencias: pd.Series = None) -> pd.DataFrame:
+    """
+    Casa cada nota extraída (dicts de `process_invoices`) com uma parcela em aberto de `parcelas`.
+    Score = CNPJ do emitente igual ao do contrato, semelhança do nome do emitente com o contrato e
+    proximidade do valor (da parcela ou, sem ele, da `referencias` do contrato). Atribuição gulosa
+    um-para-um do maior score para o menor; abaixo de SCORE_MINIMO a nota fica sem parcela.
+    """
+    casamento = pd.DataFrame([
+        {
+            "arquivo": n.get("arquivo", ""), "numero_doc": str(n.get("numero_doc") or "").strip(),
+            "valor_doc": pd.to_numeric(n.get("valor_doc"), errors="coerce"),
+            "cnpj_emitente": n.get("cnpj_emitente") or "", "nome_emitente": n.get("nome_emitente") or "",
+            "id": None, "contrato": None, "score": 0.0, "problema": n.get("error") or "",
+        }
+        for n in notas
+    ], columns=COLUNAS_CASAMENTO)
+    if casamento.empty or parcelas.empty:
+        casamento.loc[casamento["problema"] == "", "problema"] = "Sem parcela em aberto para casar."
+        return casamento
+
+    cnpj_contrato = {}
+    if contratos is not None and not contratos.empty and "cnpj" in contratos.columns:
+        cnpj_contrato = dict(zip(contratos["id"].astype("int64"), contratos["cnpj"].map(_digitos)))
+    cnpjs_parcela = np.array([
+        cnpj_contrato.get(int(c), "") if pd.notna(c) else "" for c in parcelas.get("contrato_id", pd.Series([None] * len(parcelas)))
+    ], dtype=object)
+
+    nomes_contrato = {c: _tokens(c) for c in parcelas["contrato"].dropna().unique()}
+    tokens_parcela = [nomes_contrato.get(c, frozenset()) for c in parcelas["contrato"]]
+
+    referencia = pd.to_numeric(parcelas["valor"], errors="coerce").to_numpy(dtype="float64", na_value=np.nan, copy=True)
+    if referencias is not None:
+        sem_valor = np.isnan(referencia)
+        referencia[sem_valor] = parcelas["contrato"].astype(object).map(referencias).to_numpy(dtype="float64", na_value=np.nan)[sem_valor]
+
+    validas = casamento["problema"] == ""
+    cnpj_nota = casamento["cnpj_emitente"].map(_digitos).to_numpy(dtype=object)
+    tokens_nota = [_tokens(n) for n in casamento["nome_emitente"]]
+    valor_nota = casamento["valor_doc"].to_numpy(dtype="float64", na_value=np.nan)
+
+    cnpj = (cnpj_nota[:, None] == cnpjs_parcela[None, :]) & (cnpj_nota[:, None] != "")
+    nome = np.array([[_similaridade(t, p) for p in tokens_parcela] for t in tokens_nota]).reshape(len(casamento), len(parcelas))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        distancia = np.abs(valor_nota[:, None] - referencia[None, :]) / referencia[None, :]
+    valor = np.nan_to_num(1 - np.clip(distancia, 0, 1), nan=0.0)
+
+    score = PESOS["cnpj"] * cnpj + PESOS["nome"] * nome + PESOS["valor"] * valor
+    score[~validas.to_numpy()] = -1
+
+    ids = parcelas["id"].astype("int64").to_numpy()
+    contratos_parcela = parcelas["contrato"].astype(object).to_numpy()
+    notas_livres = np.ones(len(casamento), dtype=bool)
+    parcelas_livres = np.ones(len(parcelas), dtype=bool)
+    for plano in np.argsort(-score, axis=None, kind="stable"):
+        i, j = divmod(int(plano), len(parcelas))
+        if score[i, j] < SCORE_MINIMO:
+            break
+        if notas_livres[i] and parcelas_livres[j]:
+            notas_livres[i] = parcelas_livres[j] = False
+            casamento.loc[i, ["id", "contrato", "score"]] = [int(ids[j]), contratos_parcela[j], round(float(score[i, j]), 2)]
+
+    casamento.loc[notas_livres & validas.to_numpy(), "problema"] = "Nenhuma parcela em aberto compatível."
+    return casamento
@@ -1,12 +1,12 @@
-import time
 import pandas as pd
 import streamlit as st
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
 from src.utils.stamp import ano_atual
-from src.utils.formatters import formatar_brl
+from src.services.relatorio_service import gerar_relatorio, estilizar_relatorio
+from src.core.database_connections import write_through
 
-def new_contract(df, supabase) -> None:
+def new_contract(df, repo) -> None:
     ccol1, = st.columns(1)
 
     with ccol1:
@@ -47,8 +47,8 @@ def new_contract(df, supabase) -> None:
                     }
                     
                     try:
-                        response = supabase.table("contratos").insert(new_contrato).execute()
-                        new_id = response.data[0]["id"]
+                        inserted = repo.insert("contratos", [new_contrato])
+                        new_id = inserted[0]["id"]
                         
                         batch_parcelas = []
                         for i in range(duracao):
@@ -64,16 +64,16 @@ def new_contract(df, supabase) -> None:
                                 "valor": valor_parcela
                             })
                         
-                        supabase.table("parcelas").insert(batch_parcelas).execute()
+                        inserted_parcelas = repo.insert("parcelas", batch_parcelas)
+                        write_through("contratos", upserted=inserted)
+                        write_through("parcelas", upserted=inserted_parcelas)
                         st.toast(f"Contrato criado com {len(batch_parcelas)} parcelas.")
-                        time.sleep(1)
-                        st.cache_data.clear()
                         st.rerun()
                     except Exception as e:
                         st.error(f"Erro ao criar contrato: {e}")
 
 
-def delete_contract(df, supabase) -> None: 
+def delete_contract(df, repo) -> None: 
     ccol2, = st.columns(1)
     
     with ccol2:
@@ -84,16 +84,17 @@ def delete_contract(df, supabase) -> None:
 
             if st.form_submit_button("Confirmar Exclusão", type="primary"):
                 try:
-                    supabase.table("contratos").delete().eq("contrato", contrato_exc).execute()
-                    supabase.table("parcelas").delete().eq("contrato", contrato_exc).execute()
-                    st.success("Contrato excluído!")
-                    st.cache_data.clear()
+                    del_contratos = repo.delete("contratos", {"contrato": contrato_exc})
+                    del_parcelas = repo.delete("parcelas", {"contrato": contrato_exc})
+                    write_through("contratos", deleted=del_contratos)
+                    write_through("parcelas", deleted=del_parcelas)
+                    st.toast("Contrato excluído!")
                     st.rerun()
                 except Exception as e:
                     st.error(f"Erro ao excluir: {e}")
 
 
-def active_deactive_contract(df, supabase) -> None:
+def active_deactive_contract(df, repo) -> None:
     coll3, = st.columns(1)
     
     with coll3:
@@ -116,16 +117,17 @@ def active_deactive_contract(df, supabase) -> None:
                 with st.form(f"form_{novo_status.lower()}_contrato"):
                     if st.form_submit_button(btn_label, type="primary"):
                         try:
-                            supabase.table("contratos").update({"situacao": novo_status}).eq("contrato", contrato_sel).execute()
-                            supabase.table("parcelas").update({"situacao": novo_status}).eq("contrato", contrato_sel).execute()
-                            st.success(f"Contrato {novo_status.lower()} com sucesso!")
-                            st.cache_data.clear()
+                            upd_contratos = repo.update("contratos", {"situacao": novo_status}, {"contrato": contrato_sel})
+                            upd_parcelas = repo.update("parcelas", {"situacao": novo_status}, {"contrato": contrato_sel})
+                            write_through("contratos", upserted=upd_contratos)
+                            write_through("parcelas", upserted=upd_parcelas)
+                            st.toast(f"Contrato {novo_status.lower()} com sucesso!")
                             st.rerun()
                         except Exception as e:
                             st.error(f"Erro ao alterar status: {e}")
 
 
-def edit_contract(df, supabase) -> None:
+def edit_contract(df, repo) -> None:
     coll4, = st.columns(1)
     
     with coll4:
@@ -138,7 +140,7 @@ def edit_contract(df, supabase) -> None:
         contrato_edit = st.selectbox("Selecione o Contrato", options=opcoes_contrato)
         st.markdown("##### Dados do Contrato")
         
-        dados = supabase.table("contratos").select("*").eq("contrato", contrato_edit).execute().data[0]
+        dados = repo.select("contratos", filtros={"contrato": contrato_edit})[0]
         dados["valor_contrato"] = dados.get("valor_contrato") or 1
 
         with st.form("form_editar_contrato", clear_on_submit=True):
@@ -181,15 +183,15 @@ def edit_contract(df, supabase) -> None:
                     edited_contract["termino"] = (data_inicio + relativedelta(months=duracao, days=-1)).isoformat()
 
                 try:
-                    supabase.table("contratos").update(edited_contract).eq("contrato", contrato_edit).execute()
-                    st.success("Atualizado com sucesso!")
-                    st.cache_data.clear()
+                    upd = repo.update("contratos", edited_contract, {"contrato": contrato_edit})
+                    write_through("contratos", upserted=upd)
+                    st.toast("Atualizado com sucesso!")
                     st.rerun()
                 except Exception as e:
                     st.error(f"Erro ao atualizar: {e}")
 
 
-def renew_contract(df, supabase) -> None:
+def renew_contract(df, repo) -> None:
     coll5, = st.columns(1)
     
     with coll5:
@@ -217,68 +219,14 @@ def renew_contract(df, supabase) -> None:
                         "termino": (hoje + relativedelta(days=dias_renovar)).isoformat(),
                         "situacao": "ATIVO",
                     }
-                    supabase.table("contratos").update(renovacao).eq("contrato", contrato_renew).execute()
-                    st.success("Renovado com sucesso!")
-                    st.cache_data.clear()
+                    upd = repo.update("contratos", renovacao, {"contrato": contrato_renew})
+                    write_through("contratos", upserted=upd)
+                    st.toast("Renovado com sucesso!")
                     st.rerun()
                 except Exception as e:
                     st.error(f"Erro ao renovar: {e}")
 
 
-def relatorio_anual(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    df['valor'] = pd.to_numeric(df["valor"], errors="coerce").fillna(0)
-    df['ano'] = pd.to_numeric(df['ano'], errors='coerce')
-    
-    df = df[(df["ano"] == ano_atual) & (df["status"] == 'LANÇADO')]
-
-    if "" not in df['contrato'].cat.categories:
-        df['contrato'] = df['contrato'].cat.add_categories([""])
-    
-    contratos_limpos = df['contrato'].fillna("")
-    contratos_match = contratos_limpos.str.upper().str.strip()
-
-    df["contrato_unificado"] = contratos_limpos.str.replace(r'\s+\d+$', '', regex=True)
-    
-    mappings = {
-        "INGR": "INGRAM", "INGRAM": "INGRAM", "TOTVS": "TOTVS", "ALGAR": "ALGAR",
-        "CLARO": "CLARO", "HCOMPANY": "HCOMPANY", "UNE": "UNE TELECOM", "SAP": "SAP",
-        "PRODUTIVE": "PRODUTIVE", "OI": "OI TELECOM", "NEOMIND": "NEOMIND",
-        "LUCAS": "LUCAS BICALHO", "JETTELECOM": "JETTELECOM", "ILOC3": "ILOC3 LOCAÇÕES",
-        "HPFS": "HPFS - LOCAÇÃO", "GRENKE": "GRENKE", "GLOBO": "GLOBO SOLUÇÕES", "COMPEX": "COMPEX"
-    }
-    
-    for key, val in mappings.items():
-        df.loc[contratos_match.str.startswith(key), "contrato_unificado"] = val
-    
-    df.loc[contratos_match.str.contains("VELOMAX"), "contrato_unificado"] = "VELOMAX"
-    df["contrato_unificado"] = df["contrato_unificado"].replace("", "Sem Contrato")
-
-    if 'mes' in df.columns:
-        df['mes'] = pd.to_numeric(df['mes'], errors='coerce')
-        meses_ordenados = list(df.sort_values(by='mes')['mes_nome'].unique())
-    else:
-        meses_ordenados = sorted(list(df['mes_nome'].unique()))
-
-    df_relatorio = pd.pivot_table(
-        df, index="contrato_unificado", columns="mes_nome", values="valor",
-        aggfunc="sum", fill_value=0
-    )
-
-    colunas_presentes = [mes for mes in meses_ordenados if mes in df_relatorio.columns]
-    if colunas_presentes:
-        df_relatorio = df_relatorio[colunas_presentes]
-
-    df_relatorio["Total"] = df_relatorio.sum(axis=1)
-    df_relatorio = df_relatorio.reset_index().rename(columns={'contrato_unificado': 'Contrato'})
-    
-    df_relatorio = df_relatorio[~df_relatorio['Contrato'].str.startswith("HCOMPANY")]
-
-    colunas_numericas = df_relatorio.columns.drop('Contrato')
-    somas_colunas = df_relatorio[colunas_numericas].sum()
-    linha_total = pd.DataFrame(somas_colunas).T
-    linha_total['Contrato'] = '[TOTAL R$]:'
-    
-    df_relatorio = pd.concat([df_relatorio, linha_total], ignore_index=True)
-    
-    return df_relatorio.style.format(formatar_brl, subset=colunas_numericas)
\ No newline at end of file
+def relatorio_anual(df: pd.DataFrame, ano: int = ano_atual):
+    """Relatório mensal do ano por contrato unificado, formatado em R$ (ver relatorio_service)."""
+    return estilizar_relatorio(gerar_relatorio(df, ano))
@@ -1,37 +1,95 @@
+import pandas as pd
 import streamlit as st
+from src.core.cube import AggregateCube
+from src.core.database_connections import get_parcelas_cube
+from src.core.schema import MESES, month_names
 
-def filtrar_dados_dashboard(df):
+# Filtro do dashboard -> chave no session_state.
+FILTROS_DASHBOARD = {
+    "ano": "dash_ano_selecionado",
+    "mes_nome": "dash_mes_selecionado",
+    "contrato": "dash_contrato_selecionado",
+    "tipo": "dash_tipo_selecionado",
+    "estabelecimento": "dash_estabelecimento_selecionado",
+    "status": "dash_status_selecionado",
+    "classificacao": "dash_classificacao_selecionada",
+}
+
+def filtros_dashboard() -> dict:
+    """Seleção atual dos filtros do dashboard, por dimensão."""
+    return {dim: st.session_state[chave] for dim, chave in FILTROS_DASHBOARD.items()}
+
+def agregar_series(cube: AggregateCube, filtros: dict) -> dict:
+    """
+    Todas as séries do dashboard numa etapa só: as máscaras saem do índice do cubo uma vez
+    e cada série é uma soma por código (bincount) sobre as linhas já recortadas.
+    Devolve DataFrames pequenos, no formato que cada gráfico plota.
+    """
+    mask_comum = cube.mask({dim: filtros[dim] for dim in ("ano", "contrato", "tipo", "estabelecimento", "status")})
+    mask_mensal = mask_comum & cube.mask({"classificacao": filtros["classificacao"]}, flags={"hcompany": False})
+    mask_filtrado = mask_mensal & cube.mask({"mes_nome": filtros["mes_nome"]})
+    mask_hcompany = mask_comum & cube.mask({"status": "LANÇADO"}, flags={"hcompany": True})
+
+    mensal = cube.totals("mes", mask_mensal).reset_index()
+    mensal.insert(1, "mes_nome", month_names(mensal["mes"]))
+
+    prestadores = cube.totals("contrato", mask_filtrado)
+
+    hcompany = cube.totals("mes", mask_hcompany)
+    hcompany.index = hcompany.index.astype("int64")
+    hcompany = hcompany.reindex(range(1, 13), fill_value=0.0).rename_axis("mes").reset_index()
+    hcompany.insert(0, "mes_nome", MESES)
+
+    return {
+        "mensal": mensal,
+        "estabelecimento": cube.totals("estabelecimento", mask_filtrado).sort_values().reset_index(),
+        "classificacao": cube.totals("classificacao", mask_filtrado).reset_index(),
+        "top_prestadores": prestadores.nlargest(10).sort_values().reset_index(),
+        "hcompany": hcompany,
+    }
+
+def series_dashboard(df: pd.DataFrame) -> dict:
+    """Séries dos gráficos para os filtros do session_state, a partir do cubo do snapshot de `df`."""
+    return agregar_series(get_parcelas_cube(df), filtros_dashboard())
+
+GANTT_AGRUPAMENTOS = {"Contrato": None, "Classificação": "classificacao", "Estabelecimento": "estabelecimento"}
+
+def linhas_gantt(contratos_df: pd.DataFrame, inicio, fim, agrupar: str = None, grupo=None,
+                 pagina: int = 0, por_pagina: int = 40):
     """
-    Aplica os filtros do session_state ao DataFrame de parcelas.
+    Barras do Gantt dentro da janela [inicio, fim], já recortadas nela.
+    Com `agrupar` e sem `grupo`, uma barra por grupo (do primeiro início ao último término, com a
+    contagem de contratos); com `grupo`, só os contratos dele. Devolve (página de barras, total de páginas).
     """
-    
-    mask_comum = (
-        (df["ano"].isin(st.session_state.dash_ano_selecionado)) &
-        (df["contrato"].isin(st.session_state.dash_contrato_selecionado)) &
-        (df["tipo"].isin(st.session_state.dash_tipo_selecionado)) &
-        (df["estabelecimento"].isin(st.session_state.dash_estabelecimento_selecionado)) &
-        (df["status"].isin(st.session_state.dash_status_selecionado))
-    )
-
-    df_filtrado = df[
-        mask_comum &
-        (df["mes_nome"].isin(st.session_state.dash_mes_selecionado)) &
-        (~df["contrato"].str.startswith("HCOMPANY")) &
-        (df["classificacao"].isin(st.session_state.dash_classificacao_selecionada))
-    ]
-
-    df_mensal = df[
-        mask_comum &
-        (~df["contrato"].str.startswith("HCOMPANY")) &
-        (df["classificacao"].isin(st.session_state.dash_classificacao_selecionada))
-    ]
-
-    df_hcompany = df[
-        (df["ano"].isin(st.session_state.dash_ano_selecionado)) &
-        (df["contrato"].isin(st.session_state.dash_contrato_selecionado)) &
-        (df["tipo"].isin(st.session_state.dash_tipo_selecionado)) &
-        (df["estabelecimento"].isin(st.session_state.dash_estabelecimento_selecionado)) &
-        (df["status"].isin(st.session_state.dash_status_selecionado))
-    ]
-
-    return df_filtrado, df_mensal, df_hcompany
\ No newline at end of file
+    inicio, fim = pd.Timestamp(inicio), pd.Timestamp(fim)
+    datas = contratos_df[["inicio", "termino"]]
+    if not all(pd.api.types.is_datetime64_any_dtype(datas[c]) for c in datas.columns):
+        datas = datas.apply(pd.to_datetime, errors="coerce")
+
+    na_janela = datas["inicio"].notna() & datas["termino"].notna() & (datas["inicio"] <= fim) & (datas["termino"] >= inicio)
+    if agrupar and grupo is not None:
+        na_janela &= contratos_df[agrupar] == grupo
+
+    base = pd.DataFrame({
+        "rotulo": contratos_df.loc[na_janela, "contrato"].astype(str),
+        "grupo": contratos_df.loc[na_janela, agrupar].astype(str) if agrupar else "",
+        "inicio": datas.loc[na_janela, "inicio"],
+        "termino": datas.loc[na_janela, "termino"],
+    })
+
+    if agrupar and grupo is None:
+        barras = (
+            base.groupby("grupo", sort=True)
+            .agg(inicio=("inicio", "min"), termino=("termino", "max"), contratos=("rotulo", "size"))
+            .reset_index()
+            .rename(columns={"grupo": "rotulo"})
+        )
+    else:
+        barras = base.assign(contratos=1).sort_values(["inicio", "rotulo"], ignore_index=True)
+
+    barras["inicio"] = barras["inicio"].clip(lower=inicio)
+    barras["termino"] = barras["termino"].clip(upper=fim)
+
+    paginas = max(1, -(-len(barras) // por_pagina))
+    pagina = min(max(pagina, 0), paginas - 1)
+    return barras.iloc[pagina * por_pagina:(pagina + 1) * por_pagina], paginas
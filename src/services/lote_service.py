@@ -0,0 +1,133 @@
+import io
+import numpy as np
+import pandas as pd
+
+COLUNAS_GRADE = ["lancar", "id", "contrato", "referente", "valor", "documento"]
+COLUNAS_ERROS = ["linha", "id", "contrato", "problema"]
+# Cabeçalhos aceitos na planilha além dos nomes da grade.
+ALIASES_PLANILHA = {
+    "valor r$": "valor", "valor (r$)": "valor",
+    "n° documento": "documento", "nº documento": "documento", "número do documento": "documento",
+    "numero do documento": "documento", "numero_doc": "documento",
+    "lançar": "lancar",
+}
+
+
+def grade_lancamento(parcelas: pd.DataFrame) -> pd.DataFrame:
+    """Grade editável das parcelas em aberto: marca `lancar` e preenche valor/documento por linha."""
+    grade = pd.DataFrame({
+        "lancar": False,
+        "id": parcelas["id"].astype("int64").to_numpy(),
+        "contrato": parcelas["contrato"].astype(str).to_numpy(),
+        "referente": parcelas["referente"].astype(object).where(parcelas["referente"].notna(), "").astype(str).to_numpy()
+        if "referente" in parcelas.columns else "",
+        "valor": pd.to_numeric(parcelas["valor"], errors="coerce").to_numpy(dtype="float64", na_value=np.nan),
+        "documento": "",
+    })
+    return grade[COLUNAS_GRADE]
+
+
+def _numeros(serie: pd.Series) -> pd.Series:
+    """Valores da planilha como float: aceita número, '1.234,56', 'R$ 1234,56' e '1234.56'."""
+    if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+        return pd.Series(pd.to_numeric(serie, errors="coerce").to_numpy(dtype="float64", na_value=np.nan), index=serie.index)
+    texto = serie.astype("string").str.replace("R$", "", regex=False).str.strip()
+    brasileiro = texto.str.contains(",", regex=False, na=False)
+    texto = texto.where(~brasileiro, texto.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    return pd.Series(pd.to_numeric(texto, errors="coerce").to_numpy(dtype="float64", na_value=np.nan), index=serie.index)
+
+
+def ler_planilha(arquivo) -> pd.DataFrame:
+    """
+    Planilha de lançamento (xlsx ou csv) no formato da grade. Precisa de `valor`, `documento` e
+    `id` ou `contrato`; sem a coluna `lancar`, todas as linhas são lançadas.
+    """
+    nome = getattr(arquivo, "name", "")
+    conteudo = arquivo.getvalue() if hasattr(arquivo, "getvalue") else arquivo
+    if str(nome).lower().endswith(".csv"):
+        texto = conteudo.decode("utf-8-sig") if isinstance(conteudo, bytes) else conteudo
+        planilha = pd.read_csv(io.StringIO(texto), sep=None, engine="python", dtype=str)
+    else:
+        planilha = pd.read_excel(io.BytesIO(conteudo))
+
+    colunas = {c: str(c).strip().lower() for c in planilha.columns}
+    planilha = planilha.rename(columns={c: ALIASES_PLANILHA.get(n, n) for c, n in colunas.items()})
+    faltando = {"valor", "documento"} - set(planilha.columns)
+    if faltando or not {"id", "contrato"} & set(planilha.columns):
+        raise ValueError(
+            "A planilha precisa das colunas 'valor', 'documento' e 'id' ou 'contrato'."
+            + (f" Faltando: {', '.join(sorted(faltando))}." if faltando else "")
+        )
+
+    planilha = planilha.dropna(how="all").reset_index(drop=True)
+    if "lancar" not in planilha.columns:
+        planilha["lancar"] = True
+    for col in ("id", "contrato"):
+        if col not in planilha.columns:
+            planilha[col] = None
+    return planilha
+
+
+def _ids_por_contrato(parcelas: pd.DataFrame) -> dict:
+    """contrato -> id da parcela em aberto, só para contratos com uma única parcela no período."""
+    contagem = parcelas["contrato"].astype(str).value_counts()
+    unicos = parcelas[parcelas["contrato"].astype(str).isin(contagem.index[contagem == 1])]
+    return dict(zip(unicos["contrato"].astype(str), unicos["id"].astype("int64")))
+
+
+def validar_lote(lote: pd.DataFrame, parcelas: pd.DataFrame, data_lancamento: str):
+    """
+    Valida localmente as linhas marcadas de `lote` (grade ou planilha) contra as `parcelas` em aberto
+    do período. Devolve (registros para update_rows, DataFrame de erros); havendo erro, nada deve ser gravado.
+    Linhas sem `id` são casadas pelo contrato quando ele tem uma única parcela em aberto no período.
+    """
+    marcadas = lote[lote["lancar"].fillna(False).astype(str).str.strip().str.lower().isin(["true", "1", "1.0", "sim", "s", "x"])]
+    if marcadas.empty:
+        return [], pd.DataFrame(columns=COLUNAS_ERROS)
+
+    linhas = marcadas.index.to_numpy() + 1
+    contratos = marcadas["contrato"].astype(object).where(marcadas["contrato"].notna(), "").astype(str).str.strip()
+    ids = pd.Series(_numeros(marcadas["id"]).to_numpy(), index=marcadas.index)
+    sem_id = ids.isna()
+    if sem_id.any():
+        ids[sem_id] = contratos[sem_id].map(_ids_por_contrato(parcelas))
+
+    valores = _numeros(marcadas["valor"])
+    documentos = marcadas["documento"].astype(object).where(marcadas["documento"].notna(), "").astype(str).str.strip()
+    abertos = set(parcelas["id"].astype("int64"))
+
+    problemas = [
+        (sem_id & ids.isna(), "Contrato sem parcela única em aberto no período; informe o id."),
+        (ids.notna() & ~ids.isin(abertos), "Parcela não está em aberto no período selecionado."),
+        (ids.notna() & ids.duplicated(keep=False), "Parcela repetida no lote."),
+        (valores.isna(), "Valor ausente ou inválido."),
+        (valores.notna() & (valores <= 0), "Valor deve ser maior que zero."),
+        (documentos == "", "Número do documento não informado."),
+    ]
+    erros = pd.DataFrame([
+        {"linha": int(linha), "id": None if pd.isna(i) else int(i), "contrato": contrato, "problema": texto}
+        for mascara, texto in problemas
+        for linha, i, contrato in zip(linhas[mascara.to_numpy()], ids[mascara], contratos[mascara])
+    ], columns=COLUNAS_ERROS).sort_values("linha", kind="stable", ignore_index=True)
+
+    if not erros.empty:
+        return [], erros
+
+    registros = [
+        {"id": int(i), "valor": round(float(v), 2), "documento": doc, "data_lancamento": data_lancamento, "status": "LANÇADO"}
+        for i, v, doc in zip(ids, valores, documentos)
+    ]
+    return registros, erros
+
+
+def parcelas_indisponiveis(repo, registros: list) -> dict:
+    """
+    Confere no servidor, antes de gravar, se as parcelas do lote ainda existem e seguem ABERTO
+    (o snapshot pode estar alguns minutos atrasado). Devolve {id: motivo} das que não servem.
+    """
+    ids = [r["id"] for r in registros]
+    atuais = {int(r["id"]): r.get("status") for r in repo.select("parcelas", columns=("status",), filtros=[("id", "in", ids)])}
+    return {
+        i: "excluída" if i not in atuais else f"já está {atuais[i]}"
+        for i in ids if atuais.get(i) != "ABERTO"
+    }
@@ -1,24 +1,59 @@
 from dateutil.relativedelta import relativedelta
-import time
-from src.utils.gemini_extractor import process_invoice 
+from src.utils.gemini_extractor import process_invoice, process_invoices, default_cache, extraction_client
 from src.utils.stamp import data_lanc
+from src.core.database_connections import write_through, mark_stale, get_row_lookup, get_filter_index, load_data
+from src.services.conciliacao_service import casar_notas, valores_referencia
+from src.core.schema import MESES
+from src.services.lote_service import grade_lancamento, ler_planilha, validar_lote, parcelas_indisponiveis
+from src.utils.exporters import to_xlsx, XLSX_MIME
+from src.utils.formatters import formatar_brl
+import functools
+import numpy as np
+import pandas as pd
 import streamlit as st
 
-def view_lancar(df, df_filter, supabase):
+def _legenda_cache_notas():
+    uso = default_cache().stats()
+    st.caption(
+        f"Cache de notas: {uso['hits']} acerto(s), {uso['misses']} leitura(s) pelo modelo "
+        f"({uso['taxa_acerto']:.0%} de acerto) | {uso['entradas']} nota(s) guardada(s), "
+        f"{uso['bytes'] / 1024:.0f} KB de {uso['orcamento'] / 1024 / 1024:.0f} MB"
+    )
+
+
+def _latencia_modelos():
+    uso = extraction_client().stats()
+    if not uso["latencia"]:
+        return
+    with st.expander("⏱️ Latência do modelo"):
+        st.dataframe(pd.DataFrame([
+            {
+                "Modelo": modelo, "Chamadas": d["chamadas"], "Média (s)": round(d["media_s"], 2),
+                "p50 (s)": d["p50_s"], "p95 (s)": d["p95_s"],
+                "OK": d["desfechos"].get("ok", 0), "Erros": d["desfechos"].get("erro", 0),
+                "Timeouts": d["desfechos"].get("timeout", 0),
+                "Circuito aberto": uso["circuitos"].get(modelo, {}).get("aberto", False),
+            }
+            for modelo, d in uso["latencia"].items()
+        ]), hide_index=True, use_container_width=True)
+
+
+def view_lancar(df, df_filter, repo):
     st.subheader("Lançar Nova Parcela")
     
     if df_filter.empty:
         st.warning("Selecione um ano e mês com parcelas para poder lançar.", icon="🚨")
         return
     
-    filtro_lancaveis = (df["status"] == "ABERTO") & (df["mes"] == int(df_filter["mes"].iloc[0])) & (df["ano"] == int(df_filter["ano"].iloc[0]))
-    parcelas_lancaveis = df[filtro_lancaveis].sort_values(by="contrato", ascending=True)
+    lookup = get_row_lookup(df)
+    ano, mes = int(df_filter["ano"].iloc[0]), int(df_filter["mes"].iloc[0])
+    parcelas_lancaveis = lookup.rows(lookup.positions(ano, mes, "ABERTO"), sort_by="contrato")
     
     if parcelas_lancaveis.empty:
         st.warning("Não há parcelas em aberto para o mês e ano atuais.", icon="🚨")
         return
     
-    options_box = {f"{row['contrato']} | {row['id']}": row['id'] for _, row in parcelas_lancaveis.iterrows()}
+    ids_lancaveis, rotulos_lancaveis = lookup.options(parcelas_lancaveis, ["contrato", "id"])
     
     if "form_valor" not in st.session_state:
         st.session_state.form_valor = 0.0
@@ -35,13 +70,17 @@ def view_lancar(df, df_filter, supabase):
         if uploaded_file != st.session_state.last_file:
             st.session_state.form_valor = 0.0
             st.session_state.form_doc = ""
-            with st.spinner("🧠 Lendo documento com IA..."):
+            with st.spinner("🧠 Lendo documento..."):
                 info = process_invoice(uploaded_file)
             st.session_state.form_valor = info.get('valor_doc', 0.0)
             st.session_state.form_doc = info.get('numero_doc', '')
             st.session_state.last_file = uploaded_file
-            if st.session_state.form_valor > 0:
+            if st.session_state.form_valor > 0 and info.get("origem") == "local":
+                st.toast("Dados lidos direto do PDF!", icon="📄")
+            elif st.session_state.form_valor > 0:
                 st.toast("Dados preenchidos com Inteligência Artificial!", icon="✨")
+        _legenda_cache_notas()
+        _latencia_modelos()
     else:
         if st.session_state.last_file is not None:
             st.session_state.last_file = None
@@ -51,18 +90,20 @@ def view_lancar(df, df_filter, supabase):
     with st.form("form_lancar", clear_on_submit=True):
         st.subheader("2. Confirmar Lançamento")
         
-        contrato_lanc = st.selectbox("Contrato para Lançamento:", options=["Selecione um contrato..."] + list(options_box.keys()), index=0)
+        id_lanc = st.selectbox(
+            "Contrato para Lançamento:", options=ids_lancaveis, index=None,
+            format_func=rotulos_lancaveis.get, placeholder="Selecione um contrato...",
+        )
         valor_lanc = st.number_input("Valor R$", value=st.session_state.form_valor, format="%.2f", step=1.0, min_value=0.0)
         doc_lanc = st.text_input("Número do Documento", value=st.session_state.form_doc)
         
         submitted = st.form_submit_button("Confirmar Lançamento")
         
         if submitted:
-            if contrato_lanc == "Selecione um contrato..." or not doc_lanc or valor_lanc <= 0:
+            if id_lanc is None or not doc_lanc or valor_lanc <= 0:
                 st.warning("É necessário selecionar um contrato e preencher todos os campos devidamente.", icon="🚨")
             else:
                 try:
-                    id_lanc = options_box[contrato_lanc]
                     data_iso = data_lanc.isoformat() if hasattr(data_lanc, 'isoformat') else data_lanc
                     update_data = {
                         "valor": valor_lanc,
@@ -70,16 +111,15 @@ def view_lancar(df, df_filter, supabase):
                         "documento": doc_lanc,
                         "status": "LANÇADO"
                     }
-                    upd = supabase.table("parcelas").update(update_data).eq("id", id_lanc).execute()
+                    upd = repo.update("parcelas", update_data, {"id": id_lanc})
                     
-                    if upd.data:
-                        st.success("Parcela atualizada com sucesso! ✅")
+                    if upd:
                         st.session_state.form_valor = 0.0
                         st.session_state.form_doc = ""
                         st.session_state.last_file = None
                         st.session_state.upload_key += 1
-                        st.cache_data.clear()
-                        time.sleep(1)
+                        write_through("parcelas", upserted=upd)
+                        st.toast("Parcela atualizada com sucesso! ✅")
                         st.rerun()
                     else:
                         st.error("Não foi possível lançar a parcela. 😕", icon="❌")
@@ -87,40 +127,197 @@ def view_lancar(df, df_filter, supabase):
                     st.error(f"Erro: {e}", icon="❌")
 
 
-def view_modificar(df, df_filter, supabase):
+def _grade_de_notas(grade, parcelas_lancaveis, versao):
+    """Lê as notas enviadas em paralelo, casa com as parcelas em aberto e devolve a grade já preenchida."""
+    arquivos = st.file_uploader(
+        "Notas fiscais (PDF)", type=["pdf"], accept_multiple_files=True, key=f"lote_pdfs_{versao}"
+    )
+    if not arquivos:
+        st.info("Envie as notas do mês: são lidas em paralelo e cada uma é casada com uma parcela em aberto.")
+        return None
+
+    # Extrações por arquivo enviado; só os arquivos novos vão para o modelo.
+    anteriores = st.session_state.get("lote_extracoes", {})
+    extracoes = {a.file_id: anteriores[a.file_id] for a in arquivos if a.file_id in anteriores}
+    novos = [a for a in arquivos if a.file_id not in extracoes]
+
+    if novos:
+        barra = st.progress(0.0, text=f"Lendo {len(novos)} nota(s)...")
+        with st.status(f"🧠 Lendo {len(novos)} nota(s)...", expanded=True) as painel:
+            concluidas = []
+
+            def progresso(i, nome, resultado):
+                concluidas.append(i)
+                icone = "❌" if resultado.get("error") else "📄" if resultado.get("origem") == "local" else "✅"
+                painel.write(f"{icone} {nome}")
+                barra.progress(len(concluidas) / len(novos), text=f"{len(concluidas)}/{len(novos)} nota(s) lidas")
+
+            for arquivo, resultado in zip(novos, process_invoices(novos, on_result=progresso)):
+                extracoes[arquivo.file_id] = resultado
+            painel.update(label=f"{len(novos)} nota(s) lidas", state="complete", expanded=False)
+    st.session_state.lote_extracoes = extracoes
+    _legenda_cache_notas()
+    _latencia_modelos()
+
+    casamento = casar_notas(
+        [extracoes[a.file_id] for a in arquivos], parcelas_lancaveis, load_data("contratos"), valores_referencia(load_data("parcelas"))
+    )
+    st.dataframe(casamento, hide_index=True, use_container_width=True, column_config={
+        "arquivo": st.column_config.TextColumn("Arquivo"),
+        "numero_doc": st.column_config.TextColumn("N° Documento"),
+        "valor_doc": st.column_config.NumberColumn("Valor", format="R$ %.2f"),
+        "cnpj_emitente": st.column_config.TextColumn("CNPJ Emitente"),
+        "nome_emitente": st.column_config.TextColumn("Emitente"),
+        "id": st.column_config.NumberColumn("ID Parcela", format="%d"),
+        "contrato": st.column_config.TextColumn("Contrato"),
+        "score": st.column_config.ProgressColumn("Confiança", min_value=0.0, max_value=1.0, format="%.2f"),
+        "problema": st.column_config.TextColumn("Problema"),
+    })
+
+    casadas = casamento.dropna(subset=["id"])
+    preenchida = grade.set_index("id")
+    ids = casadas["id"].astype("int64").to_numpy()
+    preenchida.loc[ids, "lancar"] = True
+    preenchida.loc[ids, "valor"] = casadas["valor_doc"].to_numpy(dtype="float64")
+    preenchida.loc[ids, "documento"] = casadas["numero_doc"].to_numpy()
+    st.caption(f"{len(casadas)} de {len(casamento)} nota(s) casadas. Revise a grade antes de confirmar.")
+    return preenchida.reset_index()[grade.columns]
+
+
+def view_lancar_lote(df, df_filter, repo):
+    st.subheader("Lançar Parcelas em Lote")
+
+    if df_filter.empty:
+        st.warning("Selecione um ano e mês com parcelas para poder lançar.", icon="🚨")
+        return
+
+    lookup = get_row_lookup(df)
+    ano, mes = int(df_filter["ano"].iloc[0]), int(df_filter["mes"].iloc[0])
+    parcelas_lancaveis = lookup.rows(lookup.positions(ano, mes, "ABERTO"), sort_by="contrato")
+
+    if parcelas_lancaveis.empty:
+        st.warning("Não há parcelas em aberto para o mês e ano atuais.", icon="🚨")
+        return
+
+    grade = grade_lancamento(parcelas_lancaveis)
+    # As parcelas em aberto entram nas chaves: depois de gravar, grade e upload voltam limpos.
+    versao = abs(hash(tuple(parcelas_lancaveis["id"].tolist())))
+    origem = st.segmented_control(
+        "Origem dos lançamentos:", options=["Grade", "Planilha", "Notas (PDF)"], default="Grade", key="lote_origem"
+    ) or "Grade"
+
+    if origem == "Notas (PDF)":
+        grade = _grade_de_notas(grade, parcelas_lancaveis, versao)
+        if grade is None:
+            return
+
+    if origem != "Planilha":
+        # Grade pré-preenchida pelas notas muda de chave quando o casamento muda.
+        assinatura = hash(tuple(grade.loc[grade["lancar"], ["id", "valor", "documento"]].itertuples(index=False, name=None)))
+        lote = st.data_editor(
+            grade, hide_index=True, use_container_width=True, key=f"lote_grade_{ano}_{mes}_{versao}_{assinatura}",
+            disabled=["id", "contrato", "referente"],
+            column_config={
+                "lancar": st.column_config.CheckboxColumn("Lançar", width="small"),
+                "id": st.column_config.NumberColumn("ID", format="%d", width="small"),
+                "contrato": st.column_config.TextColumn("Contrato"),
+                "referente": st.column_config.TextColumn("Referente"),
+                "valor": st.column_config.NumberColumn("Valor", format="R$ %.2f", min_value=0.0),
+                "documento": st.column_config.TextColumn("N° Documento"),
+            },
+        )
+    else:
+        st.download_button(
+            "📥 Modelo da planilha", data=functools.partial(to_xlsx, {"Lancamentos": grade}),
+            file_name=f"lancamentos_{ano}_{mes:02d}.xlsx", mime=XLSX_MIME, key="lote_modelo", on_click="ignore",
+        )
+        arquivo = st.file_uploader("Planilha preenchida (xlsx ou csv)", type=["xlsx", "csv"], key=f"lote_planilha_{versao}")
+        if arquivo is None:
+            st.info("Baixe o modelo, preencha valor e documento das parcelas e envie a planilha.")
+            return
+        try:
+            lote = ler_planilha(arquivo)
+        except Exception as e:
+            st.error(f"Não foi possível ler a planilha: {e}", icon="❌")
+            return
+
+    data_iso = data_lanc.isoformat() if hasattr(data_lanc, 'isoformat') else data_lanc
+    registros, erros = validar_lote(lote, parcelas_lancaveis, data_iso)
+
+    if not erros.empty:
+        st.error(f"{len(erros)} problema(s) no lote. Nada foi gravado.", icon="🚨")
+        st.dataframe(erros, hide_index=True, use_container_width=True)
+        return
+    if not registros:
+        st.info("Marque as parcelas a lançar e preencha valor e documento.")
+        return
+
+    total = sum(r["valor"] for r in registros)
+    if st.button(f"Confirmar lançamento de {len(registros)} parcela(s) | R$ {formatar_brl(total)}", type="primary", key="lote_confirmar"):
+        try:
+            indisponiveis = parcelas_indisponiveis(repo, registros)
+            if indisponiveis:
+                mark_stale("parcelas", list(indisponiveis))
+                st.error(
+                    "Nada foi gravado. Parcelas alteradas por outra pessoa desde a carga: "
+                    + ", ".join(f"{i} ({motivo})" for i, motivo in indisponiveis.items()),
+                    icon="🚨",
+                )
+                return
+
+            res = repo.update_rows("parcelas", registros)
+            if res:
+                write_through("parcelas", upserted=res)
+            if len(res) == len(registros):
+                st.toast(f"{len(res)} parcela(s) lançada(s)! ✅")
+                st.rerun()
+            else:
+                gravados = {int(r["id"]) for r in res}
+                faltando = [r["id"] for r in registros if r["id"] not in gravados]
+                mark_stale("parcelas", faltando)
+                st.error(f"Só {len(res)} de {len(registros)} parcela(s) foram gravadas. Não encontradas: {faltando}", icon="❌")
+        except Exception as e:
+            # Sem saber o que chegou a ser gravado, o lote inteiro é relido na próxima carga.
+            mark_stale("parcelas", [r["id"] for r in registros])
+            st.error(f"Erro: {e}", icon="❌")
+
+
+def view_modificar(df, df_filter, repo):
     st.subheader("Alterar ou Desfazer Lançamento")
     
     if df_filter.empty:
         st.warning("Selecione um ano e mês com parcelas para poder modificar.", icon="🚨")
         return
 
-    filtro_modificar = (df["ano"] == df_filter["ano"].iloc[0]) & (df["mes"] == df_filter["mes"].iloc[0]) & (df["status"] == 'LANÇADO')
-    df_modificar = df[filtro_modificar].sort_values(by="contrato", ascending=True)
+    lookup = get_row_lookup(df)
+    posicoes_lancadas = lookup.positions(int(df_filter["ano"].iloc[0]), int(df_filter["mes"].iloc[0]), "LANÇADO")
+    df_modificar = lookup.rows(posicoes_lancadas, sort_by="contrato")
     contratos_modificar = df_modificar["contrato"].dropna().unique()
 
     contrato_mod = st.selectbox("Contrato a modificar parcela:", options=contratos_modificar)
-    parcelas_modificar = df[(df["contrato"] == contrato_mod) & (df['status'] == 'LANÇADO') & (df["mes"] == df_filter["mes"].iloc[0]) & (df["ano"] == df_filter["ano"].iloc[0])]
+    parcelas_modificar = lookup.rows(np.intersect1d(posicoes_lancadas, lookup.contract_positions(contrato_mod)))
 
     if parcelas_modificar.empty:
         st.info("Nenhuma parcela lançada encontrada para o contrato e período selecionados.")
         return
 
-    opcoes_mod = [f"{row['id']} | {row['contrato']} | N° {row['documento']} | R$ {row['valor']}" for _, row in parcelas_modificar.iterrows()]
-    parcela_mod = st.radio("Selecione a parcela:", options=opcoes_mod, key="radio_mod_parcela")
+    ids_mod, rotulos_mod = lookup.options(
+        parcelas_modificar, ["id", "contrato", "documento", "valor"], prefixos={"documento": "N° ", "valor": "R$ "}
+    )
+    id_parcela_mod = st.radio("Selecione a parcela:", options=ids_mod, format_func=rotulos_mod.get, key="radio_mod_parcela")
 
     st.write("---")
     col_mod, col_rev = st.columns(2)
     
-    if parcela_mod:
+    if id_parcela_mod is not None:
         try:
-            id_parcela_mod = int(parcela_mod.split(" | ")[0])
-            parcela_original = df_modificar[df_modificar['id'] == id_parcela_mod]
+            parcela_original = lookup.row(id_parcela_mod)
 
-            if not parcela_original.empty:
+            if parcela_original is not None:
                 with col_mod:
                     st.subheader("Alterar Lançamento")
-                    novo_valor = st.number_input("Valor R$", value=parcela_original["valor"].iloc[0], format="%.2f", step=1.0, min_value=0.01)
-                    novo_doc = st.text_input("N° Documento", value=parcela_original["documento"].iloc[0])
+                    novo_valor = st.number_input("Valor R$", value=parcela_original["valor"], format="%.2f", step=1.0, min_value=0.01)
+                    novo_doc = st.text_input("N° Documento", value=parcela_original["documento"])
 
                     with st.form("form_alterar", clear_on_submit=True):
                         if st.form_submit_button("Confirmar Alteração"):
@@ -132,10 +329,10 @@ def view_modificar(df, df_filter, supabase):
                                 if novo_doc: data_atualizar["documento"] = novo_doc
                                 
                                 if data_atualizar:
-                                    res = supabase.table("parcelas").update(data_atualizar).eq("id", id_parcela_mod).execute()
-                                    if res.data:
-                                        st.success("Parcela atualizada! ✅")
-                                        st.cache_data.clear()
+                                    res = repo.update("parcelas", data_atualizar, {"id": id_parcela_mod})
+                                    if res:
+                                        write_through("parcelas", upserted=res)
+                                        st.toast("Parcela atualizada! ✅")
                                         st.rerun()
                                     else: st.error("Falha na atualização.", icon="❌")
 
@@ -145,17 +342,17 @@ def view_modificar(df, df_filter, supabase):
                         st.text("Cancelar o lançamento da parcela:")
                         if st.form_submit_button("Cancelar Lançamento"):
                             update_data = {"valor": None, "documento": None, "data_lancamento": None, "status": "ABERTO"}
-                            res = supabase.table("parcelas").update(update_data).eq("id", id_parcela_mod).execute()
-                            if res.data:
-                                st.success("Parcela revertida! ✅")
-                                st.cache_data.clear()
+                            res = repo.update("parcelas", update_data, {"id": id_parcela_mod})
+                            if res:
+                                write_through("parcelas", upserted=res)
+                                st.toast("Parcela revertida! ✅")
                                 st.rerun()
                             else: st.error("Falha ao reverter.", icon="❌")
         except Exception as e:
             st.error(f"Erro ao processar parcela: {e}")
 
 
-def view_adicionar(df, df_filter, supabase):
+def view_adicionar(df, df_filter, repo):
     st.subheader("Adicionar Parcela de Contrato")
     contratos_ativos = df.loc[df['situacao'] == 'ATIVO', 'contrato'].dropna().unique()
 
@@ -195,42 +392,44 @@ def view_adicionar(df, df_filter, supabase):
                     "classificacao": row_ref['classificacao']
                 }
                 
-                supabase.table("parcelas").insert([add_data] * qtd_add).execute()
-                st.success(f"{qtd_add} parcela(s) adicionada(s)! ✅")
-                time.sleep(0.5)
-                st.cache_data.clear()
+                ins = repo.insert("parcelas", [add_data] * qtd_add)
+                write_through("parcelas", upserted=ins)
+                st.toast(f"{qtd_add} parcela(s) adicionada(s)! ✅")
                 st.rerun()
             except Exception as e:
                 st.error(f"Erro ao adicionar: {e}", icon="❌")
 
 
-def view_excluir(df, supabase):
+def view_excluir(df, repo):
     st.subheader("Excluir Parcela")
     st.warning("Atenção: Exclusão permanente.", icon="⚠️")
     
-    contrato_exc = st.selectbox("Contrato", options=df["contrato"].sort_values().dropna().unique())
-    ano_exc = st.selectbox("Ano", options=df["ano"].dropna().unique())
-    mes_exc = st.selectbox("Mês", options=df["mes_nome"].dropna().unique())
+    lookup = get_row_lookup(df)
+    index = get_filter_index("parcelas", df)
+    contrato_exc = st.selectbox("Contrato", options=lookup.contracts())
+    ano_exc = st.selectbox("Ano", options=index.values("ano"))
+    mes_exc = st.selectbox("Mês", options=index.values("mes_nome"))
     
-    df_excluir = df[(df["contrato"] == contrato_exc) & (df["mes_nome"] == mes_exc) & (df["ano"] == ano_exc)]
+    posicoes = lookup.positions(ano_exc, MESES.index(mes_exc) + 1) if ano_exc is not None and mes_exc in MESES else []
+    df_excluir = lookup.rows(np.intersect1d(posicoes, lookup.contract_positions(contrato_exc)))
 
     if df_excluir.empty:
         st.warning("Não há parcelas para excluir.", icon="🚨")
         return
 
     with st.form('form_excluir', clear_on_submit=True):
-        opcoes_exc = [f"{row['id']} | {row['ano']} | {row['mes_nome']} | {row['tipo']} | {row['status']}| R$ {row['valor']}" for _, row in df_excluir.iterrows()]
-        parcela_exc = st.radio("Parcela a excluir:", options=opcoes_exc, key="radio_exc_parcela")
+        ids_exc, rotulos_exc = lookup.options(
+            df_excluir, ["id", "ano", "mes_nome", "tipo", "status", "valor"], prefixos={"valor": "R$ "}
+        )
+        id_exc = st.radio("Parcela a excluir:", options=ids_exc, format_func=rotulos_exc.get, key="radio_exc_parcela")
     
         if st.form_submit_button('Confirmar Exclusão', type="primary"):
-            if parcela_exc:
+            if id_exc is not None:
                 try:
-                    id_exc = int(parcela_exc.split(" | ")[0])
-                    response = supabase.table("parcelas").delete().eq("id", id_exc).execute()
-                    if response.data:
-                        st.success(f"Parcela {id_exc} excluída.")
-                        time.sleep(0.7)
-                        st.cache_data.clear()
+                    response = repo.delete("parcelas", {"id": id_exc})
+                    if response:
+                        write_through("parcelas", deleted=response)
+                        st.toast(f"Parcela {id_exc} excluída.")
                         st.rerun()
                     else:
                         st.error("Parcela não encontrada.", icon="❌")
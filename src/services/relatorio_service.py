@@ -0,0 +1,141 @@
+import hashlib
+import numpy as np
+import pandas as pd
+import streamlit as st
+from src.core.cube import AggregateCube
+from src.core.database_connections import get_parcelas_cube, get_report_cache, snapshot_derived
+from src.core.schema import month_names
+from src.utils.formatters import formatar_brl, formatar_brl_frame
+from src.utils.normalizer import load_normalizer
+
+COLUNA_TOTAL = "Total"
+LINHA_TOTAL = "[TOTAL R$]:"
+# Acima disso o relatório é exibido sem Styler (texto pré-formatado).
+STYLER_MAX_CELLS = 2000
+
+
+def _hashes_mensais(cube: AggregateCube, mask_ano) -> dict:
+    """
+    SHA-256 do conteúdo de cada mês do ano: os pares (contrato, valor) das linhas do cubo, sem
+    depender da ordem. Mês com o mesmo hash de antes reaproveita a coluna já calculada.
+    """
+    mes_codes, meses = cube.codes("mes")
+    sel = np.asarray(mask_ano, dtype=bool) & (mes_codes >= 0)
+    if not sel.any():
+        return {}
+    pares = pd.DataFrame({"contrato": cube.frame["contrato"].to_numpy()[sel], "valor": cube.valores[sel]})
+    linhas = pd.util.hash_pandas_object(pares, index=False).to_numpy()
+    codigos = mes_codes[sel]
+    ordem = np.lexsort((linhas, codigos))
+    linhas, codigos = linhas[ordem], codigos[ordem]
+    cortes = np.flatnonzero(np.diff(codigos)) + 1
+    return {
+        int(meses[bloco[0]]): hashlib.sha256(hashes.tobytes()).hexdigest()
+        for hashes, bloco in zip(np.split(linhas, cortes), np.split(codigos, cortes))
+    }
+
+
+def _coluna_mes(cube: AggregateCube, mask_ano, mes: int, normalizer) -> pd.Series:
+    mes_codes, meses = cube.codes("mes")
+    codigo = list(meses).index(mes)
+    totais = cube.totals("contrato", mask_ano & (mes_codes == codigo), nulos="")
+    unificados = normalizer.normalize(pd.Series(np.asarray(totais.index, dtype=object)))
+    return totais.groupby(np.asarray(unificados, dtype=object)).sum()
+
+
+def pivo_anual(cube: AggregateCube, ano: int, env: str = "prod") -> pd.DataFrame:
+    """
+    Parcelas LANÇADO do ano por contrato unificado (linhas) e mês (colunas 1..12 presentes).
+    Meses cujo conteúdo não mudou (mesmo hash, mesmo ambiente) reaproveitam a coluna já calculada.
+    """
+    normalizer = load_normalizer()
+    mask_ano = cube.mask({"ano": ano, "status": "LANÇADO"})
+    cache = get_report_cache()
+
+    colunas = {}
+    for mes, conteudo in _hashes_mensais(cube, mask_ano).items():
+        # O normalizador fica guardado junto com a coluna, então seu id não é reaproveitado enquanto a entrada existir.
+        chave = (env, "parcelas", "relatorio_mes", ano, mes, conteudo, id(normalizer))
+        colunas[mes] = cache.get_or_build(chave, lambda: (normalizer, _coluna_mes(cube, mask_ano, mes, normalizer)))[1]
+
+    pivo = pd.DataFrame(colunas).fillna(0.0)
+    pivo.index.name = "Contrato"
+    return pivo
+
+
+def _pivo_memo(df: pd.DataFrame, ano: int) -> pd.DataFrame:
+    """Pivô do ano guardado no snapshot de parcelas: um cálculo por (ano, versão do snapshot)."""
+    env = st.session_state.get("env", "prod")
+    return snapshot_derived("parcelas", f"relatorio_{ano}", lambda base: pivo_anual(get_parcelas_cube(df), ano, env), df)
+
+
+def _sem_hcompany(dados):
+    return dados[~dados.index.astype(str).str.startswith("HCOMPANY")]
+
+
+def _variacao(atual: pd.Series, anterior: pd.Series) -> pd.Series:
+    anterior = anterior.replace(0, np.nan)
+    return (atual - anterior) / anterior * 100
+
+
+def gerar_relatorio(df: pd.DataFrame, anos, yoy: bool = False) -> pd.DataFrame:
+    """
+    Relatório de parcelas lançadas por contrato unificado (sem HCOMPANY), com linha de total.
+    `anos` inteiro: colunas por mês + Total (e, com `yoy`, o total do ano anterior e a variação %).
+    `anos` (inicio, fim): uma coluna de total por ano (e, com `yoy`, a variação % de cada ano sobre o anterior).
+    """
+    intervalo = isinstance(anos, (tuple, list))
+    inicio, fim = (int(anos[0]), int(anos[-1])) if intervalo else (int(anos), int(anos))
+    pivos = {ano: _pivo_memo(df, ano) for ano in range(inicio - (1 if yoy else 0), fim + 1)}
+
+    totais = {ano: _sem_hcompany(pivo.sum(axis=1)) for ano, pivo in pivos.items()}
+    if intervalo:
+        relatorio = pd.DataFrame({str(ano): totais[ano] for ano in range(inicio, fim + 1)})
+    else:
+        pivo = _sem_hcompany(pivos[fim]).sort_index(axis=1)
+        relatorio = pivo.set_axis(month_names(pd.Series(pivo.columns)).astype(str).tolist(), axis=1)
+        relatorio[COLUNA_TOTAL] = relatorio.sum(axis=1)
+        if yoy:
+            relatorio = relatorio.reindex(relatorio.index.union(totais[fim - 1].index))
+
+    relatorio = relatorio.fillna(0.0)
+    relatorio.loc[LINHA_TOTAL] = relatorio.sum()
+
+    if yoy:
+        for ano in totais:
+            totais[ano] = totais[ano].reindex(relatorio.index).fillna(0.0)
+            totais[ano].loc[LINHA_TOTAL] = totais[ano].drop(LINHA_TOTAL).sum()
+        if intervalo:
+            for ano in range(inicio, fim + 1):
+                relatorio[f"Var. % {ano}"] = _variacao(totais[ano], totais[ano - 1])
+        else:
+            relatorio[f"{COLUNA_TOTAL} {fim - 1}"] = totais[fim - 1]
+            relatorio["Var. %"] = _variacao(relatorio[COLUNA_TOTAL], totais[fim - 1])
+
+    relatorio.index.name = "Contrato"
+    return relatorio.reset_index()
+
+
+def _formatar_percentual(v) -> str:
+    return "-" if pd.isna(v) else f"{v:+.1f}%".replace(".", ",")
+
+
+def estilizar_relatorio(relatorio: pd.DataFrame, max_celulas: int = STYLER_MAX_CELLS):
+    """
+    Relatório pronto para exibir. Até `max_celulas` usa Styler (a grade continua ordenando por número);
+    acima disso devolve o DataFrame já em texto, formatado de forma vetorizada e sem Styler.
+    """
+    percentuais = [c for c in relatorio.columns if str(c).startswith("Var. %")]
+    valores = [c for c in relatorio.columns if c != "Contrato" and c not in percentuais]
+
+    if relatorio.size > max_celulas:
+        texto = formatar_brl_frame(relatorio, valores)
+        for coluna in percentuais:
+            texto[coluna] = relatorio[coluna].map(_formatar_percentual)
+        return texto
+
+    return (
+        relatorio.style
+        .format(formatar_brl, subset=valores)
+        .format(_formatar_percentual, subset=percentuais)
+    )
@@ -0,0 +1,75 @@
+import io
+import math
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+CHUNK_ROWS = 5000
+
+
+def _celula(valor):
+    if valor is None or valor is pd.NA or valor is pd.NaT:
+        return None
+    if isinstance(valor, float) and math.isnan(valor):
+        return None
+    if isinstance(valor, pd.Timestamp):
+        return valor.to_pydatetime()
+    if isinstance(valor, np.generic):
+        return valor.item()
+    if isinstance(valor, (str, int, float, bool, datetime, date)):
+        return valor
+    return str(valor)
+
+
+def to_xlsx(sheets) -> bytes:
+    """
+    Workbook em modo write_only do openpyxl: as linhas são gravadas em blocos de CHUNK_ROWS
+    direto no arquivo, sem montar a planilha inteira em memória. `sheets` é um DataFrame ou
+    um dict {nome da aba: DataFrame} para um workbook com várias abas.
+    """
+    if isinstance(sheets, pd.DataFrame):
+        sheets = {"Relatorio": sheets}
+
+    wb = Workbook(write_only=True)
+    for nome, df in sheets.items():
+        ws = wb.create_sheet(title=str(nome)[:31])
+        ws.append([str(c) for c in df.columns])
+        for inicio in range(0, len(df), CHUNK_ROWS):
+            bloco = df.iloc[inicio:inicio + CHUNK_ROWS]
+            for linha in bloco.itertuples(index=False, name=None):
+                ws.append([_celula(v) for v in linha])
+
+    output = io.BytesIO()
+    wb.save(output)
+    return output.getvalue()
+
+
+def to_csv(df: pd.DataFrame) -> bytes:
+    """CSV no padrão do Excel brasileiro: separador ';', decimal ',' e BOM UTF-8."""
+    return df.to_csv(index=False, sep=";", decimal=",", date_format="%d/%m/%Y").encode("utf-8-sig")
+
+
+def to_parquet(df: pd.DataFrame) -> bytes:
+    output = io.BytesIO()
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), output, compression="zstd")
+    return output.getvalue()
+
+
+# formato -> (função, extensão, mime)
+EXPORT_FORMATS = {
+    "xlsx": (to_xlsx, "xlsx", XLSX_MIME),
+    "csv": (to_csv, "csv", "text/csv"),
+    "parquet": (to_parquet, "parquet", "application/vnd.apache.parquet"),
+}
+
+
+def export_bytes(formato: str, dados) -> bytes:
+    """`dados`: DataFrame ou dict de abas. Formatos de uma tabela só (csv/parquet) usam a primeira aba."""
+    fn = EXPORT_FORMATS[formato][0]
+    if isinstance(dados, dict) and formato != "xlsx":
+        dados = next(iter(dados.values()))
+    return fn(dados)
@@ -0,0 +1,209 @@
+import os
+import json
+import time
+import bisect
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# Segundos. Sobrescreva por variável de ambiente; HEDGE vazio desliga a requisição de reforço.
+TIMEOUT_S = float(os.environ.get("CONTRAX_GEMINI_TIMEOUT", "20"))
+ORCAMENTO_S = float(os.environ.get("CONTRAX_GEMINI_BUDGET", "45"))
+HEDGE_S = float(os.environ["CONTRAX_GEMINI_HEDGE"]) if os.environ.get("CONTRAX_GEMINI_HEDGE") else None
+# Limites superiores (s) dos baldes do histograma; o último balde é "acima de 16s".
+BALDES_S = (0.25, 0.5, 1, 2, 4, 8, 16)
+
+
+class CircuitBreaker:
+    """
+    Por modelo: após `limite` falhas seguidas o circuito abre e o modelo é pulado por `pausa` segundos.
+    Passada a pausa, uma chamada de teste é liberada; sucesso fecha o circuito, falha reabre.
+    """
+
+    def __init__(self, limite: int = 3, pausa: float = 60.0, clock=time.monotonic):
+        self.limite = limite
+        self.pausa = pausa
+        self.clock = clock
+        self._falhas = {}
+        self._aberto_ate = {}
+        self._lock = threading.Lock()
+
+    def permite(self, modelo: str) -> bool:
+        with self._lock:
+            ate = self._aberto_ate.get(modelo)
+            if ate is None:
+                return True
+            if self.clock() >= ate:
+                # Meio-aberto: libera uma chamada e empurra a reabertura para depois dela.
+                self._aberto_ate[modelo] = self.clock() + self.pausa
+                return True
+            return False
+
+    def sucesso(self, modelo: str) -> None:
+        with self._lock:
+            self._falhas[modelo] = 0
+            self._aberto_ate.pop(modelo, None)
+
+    def falha(self, modelo: str) -> None:
+        with self._lock:
+            self._falhas[modelo] = self._falhas.get(modelo, 0) + 1
+            if self._falhas[modelo] >= self.limite:
+                self._aberto_ate[modelo] = self.clock() + self.pausa
+
+    def estado(self) -> dict:
+        with self._lock:
+            agora = self.clock()
+            return {
+                modelo: {"falhas_seguidas": n, "aberto": self._aberto_ate.get(modelo, 0) > agora}
+                for modelo, n in self._falhas.items()
+            }
+
+
+class LatencyHistogram:
+    """Contagem de chamadas por modelo em baldes de latência (BALDES_S), separadas por desfecho."""
+
+    def __init__(self, baldes=BALDES_S):
+        self.baldes = tuple(baldes)
+        self._dados = {}
+        self._lock = threading.Lock()
+
+    def observe(self, modelo: str, segundos: float, desfecho: str = "ok") -> None:
+        with self._lock:
+            d = self._dados.setdefault(modelo, {"contagens": [0] * (len(self.baldes) + 1), "soma": 0.0, "desfechos": {}})
+            d["contagens"][bisect.bisect_left(self.baldes, segundos)] += 1
+            d["soma"] += segundos
+            d["desfechos"][desfecho] = d["desfechos"].get(desfecho, 0) + 1
+
+    def _quantil(self, contagens, q: float) -> float:
+        """Limite superior do balde onde cai o quantil `q` (estimativa conservadora)."""
+        alvo = q * sum(contagens)
+        acumulado = 0
+        for i, n in enumerate(contagens):
+            acumulado += n
+            if acumulado >= alvo and n:
+                return self.baldes[i] if i < len(self.baldes) else float("inf")
+        return 0.0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            resumo = {}
+            for modelo, d in self._dados.items():
+                total = sum(d["contagens"])
+                rotulos = [f"<={b}s" for b in self.baldes] + [f">{self.baldes[-1]}s"]
+                resumo[modelo] = {
+                    "chamadas": total,
+                    "media_s": d["soma"] / total if total else 0.0,
+                    "p50_s": self._quantil(d["contagens"], 0.5),
+                    "p95_s": self._quantil(d["contagens"], 0.95),
+                    "baldes": dict(zip(rotulos, d["contagens"])),
+                    "desfechos": dict(d["desfechos"]),
+                }
+            return resumo
+
+
+class ExtractionClient:
+    """
+    Cadeia de modelos com prazo: cada chamada tem `timeout` e a extração inteira tem `orcamento`.
+    Com `hedge_apos`, se a chamada em curso não respondeu nesse tempo, uma segunda é disparada
+    (no próximo modelo da cadeia, ou no mesmo se ele for o último) e vale a primeira resposta boa.
+    Falhas e timeouts alimentam o CircuitBreaker, que tira da cadeia o modelo que segue falhando; a
+    chamada cortada só porque o orçamento acabou não conta como falha do modelo.
+    `client` é qualquer objeto com `generate(modelo, pdf_bytes, prompt) -> str`.
+    Chamadas abandonadas por prazo continuam na thread até o client devolver; o resultado é descartado.
+    """
+
+    def __init__(self, client, modelos, timeout: float = TIMEOUT_S, orcamento: float = ORCAMENTO_S,
+                 hedge_apos: float = HEDGE_S, breaker: CircuitBreaker = None, histograma: LatencyHistogram = None,
+                 max_workers: int = 8):
+        self.client = client
+        self.modelos = list(modelos)
+        self.timeout = timeout
+        self.orcamento = orcamento
+        self.hedge_apos = hedge_apos
+        self.breaker = breaker or CircuitBreaker()
+        self.histograma = histograma or LatencyHistogram()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="contrax-gemini")
+
+    def _erro(self, mensagem: str) -> dict:
+        return {"error": f"Falha na API Gemini: {mensagem}", "numero_doc": "", "valor_doc": 0.0}
+
+    def extract(self, file_bytes: bytes, prompt: str) -> dict:
+        inicio_total = time.monotonic()
+        prazo_total = inicio_total + self.orcamento
+        fila = list(self.modelos)
+        pendentes = {}
+        ultimo_erro = ""
+
+        def liberado():
+            # O circuito é consultado só na hora de chamar: em meio-aberto, permite() gasta a chamada de teste.
+            while fila:
+                modelo = fila.pop(0)
+                if self.breaker.permite(modelo):
+                    return modelo
+            return None
+
+        def disparar(modelo):
+            inicio = time.monotonic()
+            futuro = self._pool.submit(self.client.generate, modelo, file_bytes, prompt)
+            pendentes[futuro] = (modelo, inicio, min(inicio + self.timeout, prazo_total))
+
+        def registrar_falha(modelo, inicio, agora, desfecho):
+            self.histograma.observe(modelo, agora - inicio, desfecho)
+            self.breaker.falha(modelo)
+
+        primeiro = liberado()
+        if primeiro is None:
+            return self._erro("todos os modelos estão com o circuito aberto")
+        disparar(primeiro)
+        hedge_em = inicio_total + self.hedge_apos if self.hedge_apos is not None else None
+
+        while pendentes:
+            proximo = min(limite for _, _, limite in pendentes.values())
+            if hedge_em is not None:
+                proximo = min(proximo, hedge_em)
+            feitos, _ = wait(pendentes, timeout=max(0.0, proximo - time.monotonic()), return_when=FIRST_COMPLETED)
+            agora = time.monotonic()
+
+            for futuro in feitos:
+                modelo, inicio, _ = pendentes.pop(futuro)
+                try:
+                    resultado = json.loads(futuro.result())
+                except Exception as e:
+                    ultimo_erro = f"{modelo}: {e}"
+                    registrar_falha(modelo, inicio, agora, "erro")
+                    continue
+                self.histograma.observe(modelo, agora - inicio, "ok")
+                self.breaker.sucesso(modelo)
+                for outro in pendentes:
+                    outro.cancel()
+                return {**resultado, "origem": "gemini", "modelo": modelo}
+
+            for futuro, (modelo, inicio, limite) in list(pendentes.items()):
+                if agora >= limite:
+                    pendentes.pop(futuro)
+                    futuro.cancel()
+                    if agora - inicio < self.timeout:
+                        # Cortada pelo orçamento da extração, não pelo próprio timeout: não conta contra o modelo.
+                        self.histograma.observe(modelo, agora - inicio, "orcamento")
+                        continue
+                    ultimo_erro = f"{modelo}: sem resposta em {agora - inicio:.1f}s"
+                    registrar_falha(modelo, inicio, agora, "timeout")
+
+            if agora >= prazo_total:
+                break
+            if hedge_em is not None and agora >= hedge_em:
+                hedge_em = None
+                if pendentes:
+                    disparar(liberado() or next(iter(pendentes.values()))[0])
+            if not pendentes:
+                modelo = liberado()
+                if modelo is not None:
+                    disparar(modelo)
+
+        for futuro in pendentes:
+            futuro.cancel()
+        if time.monotonic() >= prazo_total:
+            return self._erro(f"orçamento de {self.orcamento:g}s esgotado ({ultimo_erro})" if ultimo_erro else f"orçamento de {self.orcamento:g}s esgotado")
+        return self._erro(ultimo_erro)
+
+    def stats(self) -> dict:
+        return {"latencia": self.histograma.snapshot(), "circuitos": self.breaker.estado()}
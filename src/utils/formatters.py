@@ -1,2 +1,71 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+_TROCA_SEPARADORES = str.maketrans({",": ".", ".": ","})
+
+
 def formatar_brl(valor) -> str:
-    return f"{valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
\ No newline at end of file
+    return f"{valor:,.2f}".translate(_TROCA_SEPARADORES)
+
+
+# 1000^5 .. 1000^0: grupos de milhar de até 18 dígitos, do mais alto para o mais baixo.
+_MILHARES = 1000 ** np.arange(6, dtype=np.int64)[::-1]
+try:
+    _TEXTO = pd.StringDtype("pyarrow", na_value=np.nan)
+except TypeError:
+    # pandas < 2.3 não aceita na_value: cai para object, com o mesmo conteúdo.
+    _TEXTO = object
+
+
+def _formatar_array(valores, na_rep: str) -> pd.Series:
+    """
+    Formata floats em R$ (1.234,56) sem laço por valor: o valor vira centavos inteiros, o texto
+    "1,234.56" é montado com as funções de texto do Arrow e um único str.translate troca vírgula
+    e ponto, como no formatar_brl. Empates de arredondamento (...,xx5) seguem o printf.
+    """
+    x = np.asarray(valores, dtype="float64").ravel()
+    nulos = ~np.isfinite(x)
+    absoluto = np.abs(np.where(nulos, 0.0, x))
+
+    escalado = absoluto * 100
+    centavos = np.rint(escalado).astype(np.int64)
+    empates = np.abs(escalado - np.floor(escalado) - 0.5) < 1e-6
+    if empates.any():
+        centavos[empates] = [round(float(f"{v:.2f}") * 100) for v in absoluto[empates]]
+    inteiro, resto = np.divmod(centavos, 100)
+
+    # Todos os grupos com 3 dígitos ("000,001,234"); os zeros e vírgulas à esquerda saem no regex.
+    grupos = [pc.utf8_lpad(pc.cast(pa.array(inteiro // m % 1000), pa.string()), 3, "0") for m in _MILHARES]
+    milhares = pc.replace_substring_regex(pc.binary_join_element_wise(*grupos, ","), r"^[0,]*(\d)", r"\1")
+    decimais = pc.utf8_lpad(pc.cast(pa.array(resto), pa.string()), 2, "0")
+    sinal = pa.array(np.where(np.signbit(x) & ~nulos, "-", ""))
+    texto = pc.binary_join_element_wise(sinal, milhares, ".", decimais, "")
+    if nulos.any():
+        texto = pc.if_else(pa.array(nulos), na_rep, texto)
+    return pd.Series(texto, dtype=_TEXTO).str.translate(_TROCA_SEPARADORES)
+
+
+def formatar_brl_serie(serie, na_rep: str = "") -> pd.Series:
+    """Versão vetorizada de formatar_brl para uma Series inteira (nulos viram `na_rep`)."""
+    serie = pd.Series(serie) if not isinstance(serie, pd.Series) else serie
+    valores = pd.to_numeric(serie, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    return _formatar_array(valores, na_rep).set_axis(serie.index).rename(serie.name)
+
+
+def formatar_brl_frame(df: pd.DataFrame, colunas=None, na_rep: str = "") -> pd.DataFrame:
+    """
+    Cópia de `df` com `colunas` (padrão: todas as numéricas) já em texto R$, formatadas num bloco só.
+    Serve de caminho sem Styler para tabelas grandes.
+    """
+    colunas = list(df.select_dtypes("number").columns) if colunas is None else list(colunas)
+    if not colunas:
+        return df.copy()
+    bloco = df[colunas].apply(pd.to_numeric, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    # Coluna a coluna na memória (ordem Fortran), para cada coluna ser uma fatia contígua do resultado.
+    texto = _formatar_array(bloco.ravel(order="F"), na_rep)
+    saida = df.copy()
+    for i, col in enumerate(colunas):
+        saida[col] = texto.iloc[i * len(df):(i + 1) * len(df)].set_axis(df.index)
+    return saida
@@ -1,17 +1,19 @@
 import google.generativeai as genai
 import streamlit as st
-import json
+import hashlib
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from src.core.extraction_cache import ExtractionCache, content_key
+from src.utils.local_extractor import extract_local, LIMIAR_CONFIANCA
+from src.utils.extraction_client import ExtractionClient, TIMEOUT_S
 
-API_KEY = st.secrets["gemini_api"]["API_KEY"]
-genai.configure(api_key=API_KEY)
+MODELOS = ["gemini-2.0-flash-lite", "gemini-2.5-flash-lite"]
+MAX_WORKERS = 4
 
-def process_invoice(uploaded_file):
-
-    modelos = ["gemini-2.0-flash-lite", "gemini-2.5-flash-lite"]
-    
-    prompt = """
+PROMPT = """
     Analise este documento fiscal e extraia estritamente em JSON:
-    
+
     1. "numero_doc" (string): O número oficial da Nota Fiscal (NFS-e).
        - REGRA DE OURO: Se houver "RPS" e "Número da Nota", O RPS É O PROVISÓRIO (LIXO). Pegue a Nota Definitiva.
        - CASO COMO DE BARUERI/INGRAM: O número da nota é curto (ex: 116321) e o RPS é longo (ex: 000120343). ESCOLHA O CURTO.
@@ -21,34 +23,134 @@ def process_invoice(uploaded_file):
        - Priorize o valor total da nota sobre o valor líquido.
        - Converta para float (ponto decimal).
 
+    3. "cnpj_emitente" (string): O CNPJ do prestador/emitente da nota (não o do tomador). Vazio se não houver.
+
+    4. "nome_emitente" (string): A razão social ou nome fantasia do prestador/emitente.
+
     > Desconsidere zeros a esquerda no número do documento, caso seja do tipo 'NÚMERO / SÉRIE', retorne somente o número
 
-    Retorne apenas: {"numero_doc": "...", "valor_doc": 0.00}
+    Retorne apenas: {"numero_doc": "...", "valor_doc": 0.00, "cnpj_emitente": "...", "nome_emitente": "..."}
     """
 
+
+class GeminiClient:
+    """Chamada ao Gemini para um PDF. Qualquer objeto com `generate(modelo, pdf_bytes, prompt) -> str` serve no lugar."""
+
+    def __init__(self, api_key: str = None, timeout: float = TIMEOUT_S):
+        self.api_key = api_key
+        self.timeout = timeout
+        self._configurado = False
+
+    def generate(self, modelo: str, pdf_bytes: bytes, prompt: str) -> str:
+        if not self._configurado:
+            genai.configure(api_key=self.api_key or st.secrets["gemini_api"]["API_KEY"])
+            self._configurado = True
+        model = genai.GenerativeModel(modelo, generation_config={"response_mime_type": "application/json"})
+        response = model.generate_content(
+            [{"mime_type": "application/pdf", "data": pdf_bytes}, prompt], request_options={"timeout": self.timeout}
+        )
+        return response.text
+
+
+_cliente_padrao = None
+_cache_padrao = None
+# Um ExtractionClient (com circuito e histograma próprios) por client de modelo.
+_extratores = weakref.WeakKeyDictionary()
+_extratores_lock = threading.Lock()
+
+
+def default_client() -> GeminiClient:
+    global _cliente_padrao
+    if _cliente_padrao is None:
+        _cliente_padrao = GeminiClient()
+    return _cliente_padrao
+
+
+def extraction_client(client=None, modelos=MODELOS) -> ExtractionClient:
+    """ExtractionClient persistente para `client` (padrão: o Gemini); um ExtractionClient passado volta como está."""
+    if isinstance(client, ExtractionClient):
+        return client
+    client = client or default_client()
+    with _extratores_lock:
+        extrator = _extratores.get(client)
+        if extrator is None or extrator.modelos != list(modelos):
+            extrator = ExtractionClient(client, modelos)
+            _extratores[client] = extrator
+        return extrator
+
+
+def default_cache() -> ExtractionCache:
+    global _cache_padrao
+    if _cache_padrao is None:
+        _cache_padrao = ExtractionCache()
+    return _cache_padrao
+
+
+def extraction_version(modelos=MODELOS) -> str:
+    """Muda quando o prompt ou a lista de modelos muda, invalidando as extrações em cache."""
+    return hashlib.sha256("\n".join([PROMPT, *modelos]).encode()).hexdigest()[:16]
+
+
+def extract_bytes(file_bytes: bytes, client=None, modelos=MODELOS) -> dict:
+    """
+    Extrai numero_doc/valor_doc (e emitente) de um PDF pela cadeia de `modelos`, com timeout por
+    chamada, orçamento total, hedge opcional e circuito por modelo (ver ExtractionClient).
+    """
+    return extraction_client(client, modelos).extract(file_bytes, PROMPT)
+
+
+def extract_cached(file_bytes: bytes, client=None, cache: ExtractionCache = None, modelos=MODELOS) -> dict:
+    """extract_bytes com o cache em disco por conteúdo: o mesmo PDF não volta ao modelo."""
+    cache = cache or default_cache()
+    return cache.get_or_extract(file_bytes, extraction_version(modelos), lambda: extract_bytes(file_bytes, client, modelos))
+
+
+def extract_invoice(file_bytes: bytes, client=None, cache: ExtractionCache = None, limiar: float = LIMIAR_CONFIANCA) -> dict:
+    """
+    Leitura local pela camada de texto do PDF primeiro; o modelo só é chamado quando a confiança
+    local fica abaixo de `limiar`. Se o modelo falhar, o que foi lido localmente é mantido junto do erro.
+    """
+    local = extract_local(file_bytes)
+    if local["confianca"] >= limiar:
+        return local
+
+    resultado = extract_cached(file_bytes, client, cache)
+    if resultado.get("error"):
+        return {**resultado, **{k: v for k, v in local.items() if v}}
+    return resultado
+
+
+def process_invoice(uploaded_file, client=None, cache: ExtractionCache = None):
     uploaded_file.seek(0)
-    file_bytes = uploaded_file.getvalue()
-    
-    last_error = ""
-
-    for nome_modelo in modelos:
-        try:
-            model = genai.GenerativeModel(
-                nome_modelo,
-                generation_config={"response_mime_type": "application/json"}
-            )
-            
-            response = model.generate_content(
-                [
-                    {"mime_type": "application/pdf", "data": file_bytes},
-                    prompt
-                ]
-            )
-            
-            return json.loads(response.text)
-            
-        except Exception as e:
-            last_error = str(e)
-            continue
-            
-    return {"error": f"Falha na API Gemini: {last_error}", "numero_doc": "", "valor_doc": 0.0}
\ No newline at end of file
+    return extract_invoice(uploaded_file.getvalue(), client, cache)
+
+
+def process_invoices(arquivos, client=None, max_workers: int = MAX_WORKERS, on_result=None, cache: ExtractionCache = None) -> list:
+    """
+    Extrai vários PDFs (ver extract_invoice) em paralelo, no máximo `max_workers` ao mesmo tempo; arquivos de
+    conteúdo idêntico são extraídos uma vez só. `on_result(i, nome, resultado)` é chamado na thread
+    de quem chamou, à medida que cada arquivo termina (serve para atualizar progresso no Streamlit).
+    Devolve os resultados na ordem de `arquivos`, cada um com a chave "arquivo".
+    """
+    client = extraction_client(client)
+    versao = extraction_version()
+    nomes, grupos = [], {}
+    for arquivo in arquivos:
+        arquivo.seek(0)
+        dados = arquivo.getvalue()
+        grupos.setdefault(content_key(dados, versao), (dados, []))[1].append(len(nomes))
+        nomes.append(getattr(arquivo, "name", str(len(nomes))))
+
+    resultados = [None] * len(nomes)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(grupos) or 1))) as pool:
+        futuros = {pool.submit(extract_invoice, dados, client, cache): indices for dados, indices in grupos.values()}
+        for futuro in as_completed(futuros):
+            try:
+                resultado = futuro.result()
+            except Exception as e:
+                resultado = {"error": str(e), "numero_doc": "", "valor_doc": 0.0}
+            for i in futuros[futuro]:
+                resultados[i] = {"arquivo": nomes[i], **resultado}
+                if on_result is not None:
+                    on_result(i, nomes[i], resultados[i])
+    return resultados
@@ -0,0 +1,143 @@
+import io
+import re
+import unicodedata
+from pypdf import PdfReader
+
+# Abaixo disso a nota vai para o modelo (ver gemini_extractor.extract_invoice).
+LIMIAR_CONFIANCA = 0.8
+MAX_PAGINAS = 3
+
+# Padrões sobre o texto em maiúsculas e sem acento (ver _normalizar). "Nº" vira "NO" no NFKD.
+_NUM = r"\s*[:\-]?\s*(\d[\d.]*)"
+_BRL = r"\s*(?:\(R\$\))?\s*[=:]?\s*(?:R\$)?\s*(\d{1,3}(?:\.\d{3})+,\d{2}|\d+,\d{2})"
+
+# Marcas de cada prefeitura e onde ela imprime o número definitivo da nota.
+MUNICIPIOS = {
+    "sao_paulo": {
+        "marcas": ["PREFEITURA DO MUNICIPIO DE SAO PAULO", "PREFEITURA DE SAO PAULO"],
+        "numero": [r"NUMERO DA NOTA" + _NUM],
+    },
+    "barueri": {
+        "marcas": ["BARUERI"],
+        "numero": [r"NUMERO DA NOTA" + _NUM, r"NOTA FISCAL (?:ELETRONICA )?NO\.?" + _NUM],
+        # O RPS de Barueri é longo (000120343) e a nota é curta (116321): entre candidatos, a mais curta.
+        "mais_curto": True,
+    },
+    "rio_de_janeiro": {
+        "marcas": ["NOTA CARIOCA", "MUNICIPIO DO RIO DE JANEIRO"],
+        "numero": [r"NUMERO DA NOTA" + _NUM],
+    },
+    "nacional": {
+        "marcas": ["DANFSE", "DOCUMENTO AUXILIAR DA NFS-E"],
+        "numero": [r"NUMERO DA NFS-?E" + _NUM],
+    },
+}
+NUMERO_GENERICO = [
+    r"NUMERO DA (?:NOTA|NFS-?E)" + _NUM,
+    r"NFS-?E\s*(?:NO|N°|N\.)\.?" + _NUM,
+    r"NOTA FISCAL(?: DE SERVICOS?)?(?: ELETRONICA)?\s*(?:NO|N°|N\.)\.?" + _NUM,
+]
+RPS = r"RPS\s*(?:NO|N°|N\.)?\.?" + _NUM
+VALOR_TOTAL = [r"VALOR TOTAL (?:DA NOTA|DA NFS-?E|DO SERVICO|DOS SERVICOS)" + _BRL]
+VALOR_SERVICO = [r"VALOR (?:DOS SERVICOS|DO SERVICO)(?: DA NFS-?E| DA NOTA)?" + _BRL]
+# Líquido (após retenções) só entra sem total nem valor do serviço, e não soma confiança: vai ao modelo.
+VALOR_LIQUIDO = [r"VALOR LIQUIDO(?: DA NFS-?E| DA NOTA)?" + _BRL, r"TOTAL A PAGAR" + _BRL]
+CNPJ = r"\d{2}\.?\d{3}\.?\d{3}/?\d{4}-?\d{2}"
+RAZAO_SOCIAL = r"(?:NOME\s*/\s*RAZAO SOCIAL|RAZAO SOCIAL|NOME EMPRESARIAL)\s*[:\-]?\s*([^\n]+)"
+
+# Peso de cada campo no score; padrão da prefeitura vale mais que o genérico.
+PESO_ESPECIFICO = 0.5
+PESO_GENERICO = 0.35
+PENALIDADE_AMBIGUO = 0.15
+
+
+def pdf_text(file_bytes: bytes) -> str:
+    """Texto da camada de texto das primeiras páginas; vazio para PDF escaneado ou ilegível."""
+    try:
+        leitor = PdfReader(io.BytesIO(file_bytes))
+        return "\n".join(pagina.extract_text() or "" for pagina in leitor.pages[:MAX_PAGINAS])
+    except Exception:
+        return ""
+
+
+def _normalizar(texto: str) -> str:
+    texto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in texto if not unicodedata.combining(c)).upper()
+
+
+def _municipio(texto: str):
+    for nome, perfil in MUNICIPIOS.items():
+        if any(marca in texto for marca in perfil["marcas"]):
+            return nome, perfil
+    return None, {}
+
+
+def _candidatos(padroes, texto: str) -> list:
+    vistos = []
+    for padrao in padroes:
+        for achado in re.findall(padrao, texto):
+            if achado not in vistos:
+                vistos.append(achado)
+    return vistos
+
+
+def _numero_doc(texto: str, perfil: dict):
+    """(número sem zeros à esquerda, peso) priorizando o padrão da prefeitura e descartando números de RPS."""
+    rps = {n.replace(".", "").lstrip("0") for n in re.findall(RPS, texto)}
+    for padroes, peso in ((perfil.get("numero", []), PESO_ESPECIFICO), (NUMERO_GENERICO, PESO_GENERICO)):
+        numeros = []
+        for n in _candidatos(padroes, texto):
+            n = n.replace(".", "").lstrip("0")
+            if n and n not in rps and n not in numeros:
+                numeros.append(n)
+        if numeros:
+            if perfil.get("mais_curto"):
+                numeros.sort(key=len)
+            return numeros[0], peso - (PENALIDADE_AMBIGUO if len(numeros) > 1 else 0.0)
+    return "", 0.0
+
+
+def _valor_doc(texto: str):
+    """(valor, peso) na ordem total > valor do serviço > líquido."""
+    for padroes, peso in ((VALOR_TOTAL, PESO_ESPECIFICO), (VALOR_SERVICO, PESO_GENERICO), (VALOR_LIQUIDO, 0.0)):
+        valores = []
+        for v in _candidatos(padroes, texto):
+            v = float(v.replace(".", "").replace(",", "."))
+            if v > 0 and v not in valores:
+                valores.append(v)
+        if valores:
+            return valores[0], peso - (PENALIDADE_AMBIGUO if len(valores) > 1 else 0.0)
+    return 0.0, 0.0
+
+
+def _emitente(texto: str):
+    """CNPJ e razão social do bloco do prestador (entre PRESTADOR e TOMADOR), se houver."""
+    inicio = texto.find("PRESTADOR")
+    fim = texto.find("TOMADOR", inicio + 1) if inicio >= 0 else -1
+    bloco = texto[inicio:fim if fim > inicio else None] if inicio >= 0 else texto
+    cnpj = re.search(CNPJ, bloco) or re.search(CNPJ, texto)
+    nome = re.search(RAZAO_SOCIAL, bloco)
+    return (cnpj.group(0) if cnpj else ""), (nome.group(1).strip() if nome else "")
+
+
+def extract_text_fields(texto: str) -> dict:
+    """Campos da nota a partir do texto já extraído, com `confianca` de 0 a 1."""
+    texto = _normalizar(texto)
+    municipio, perfil = _municipio(texto)
+    numero, peso_numero = _numero_doc(texto, perfil)
+    valor, peso_valor = _valor_doc(texto)
+    cnpj, nome = _emitente(texto)
+    return {
+        "numero_doc": numero,
+        "valor_doc": valor,
+        "cnpj_emitente": cnpj,
+        "nome_emitente": nome,
+        "municipio": municipio or "",
+        "confianca": round(max(0.0, peso_numero) + max(0.0, peso_valor), 2),
+        "origem": "local",
+    }
+
+
+def extract_local(file_bytes: bytes) -> dict:
+    """Leitura local da nota pela camada de texto do PDF, sem rede."""
+    return extract_text_fields(pdf_text(file_bytes))
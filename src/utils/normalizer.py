@@ -0,0 +1,66 @@
+import os
+import re
+import json
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+RULES_PATH = Path(os.environ.get("CONTRAX_NORMALIZER_RULES", Path(__file__).with_name("normalizer_rules.json")))
+_carregados = {}
+
+
+class VendorNormalizer:
+    """
+    Unifica nomes de contrato por uma tabela de regras (ver normalizer_rules.json).
+    As regras viram uma única alternância regex ancorada, na ordem de prioridade, e são
+    avaliadas uma vez por nome distinto; o resultado volta para as linhas pelos códigos.
+    """
+
+    def __init__(self, regras: list, remover_sufixo: str = r"\s+\d+$", vazio: str = "Sem Contrato"):
+        partes = []
+        for i, regra in enumerate(regras):
+            if "prefixo" in regra:
+                padrao = re.escape(regra["prefixo"].upper())
+            elif "contem" in regra:
+                padrao = ".*?" + re.escape(regra["contem"].upper())
+            else:
+                raise ValueError(f"Regra sem 'prefixo' ou 'contem': {regra}")
+            partes.append(f"(?P<r{i}>{padrao})")
+
+        self._regex = re.compile("|".join(partes), re.DOTALL) if partes else None
+        self._nomes = [regra["nome"] for regra in regras]
+        self._sufixo = re.compile(remover_sufixo)
+        self.vazio = vazio
+
+    def normalize_name(self, nome) -> str:
+        nome = "" if nome is None or (isinstance(nome, float) and np.isnan(nome)) else str(nome)
+        match = self._regex.match(nome.upper().strip()) if self._regex else None
+        if match:
+            return self._nomes[int(match.lastgroup[1:])]
+        return self._sufixo.sub("", nome) or self.vazio
+
+    def normalize(self, serie: pd.Series) -> pd.Series:
+        """Série categórica com o nome unificado de cada linha; nulos viram `vazio`."""
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            codes, nomes = serie.cat.codes.to_numpy(), serie.cat.categories
+        else:
+            codes, nomes = pd.factorize(serie)
+
+        unificados = np.array([self.normalize_name(n) for n in nomes] + [self.vazio], dtype=object)
+        categorias, inversos = np.unique(unificados, return_inverse=True)
+        # Código -1 (nulo) aponta para o último item, `vazio`.
+        novos = inversos[np.where(codes < 0, len(nomes), codes)]
+        return pd.Series(pd.Categorical.from_codes(novos, categories=categorias), index=serie.index, name=serie.name)
+
+
+def load_normalizer(path: Path = None) -> VendorNormalizer:
+    """Normalizador da tabela de regras em disco; relido quando o arquivo muda."""
+    path = Path(path or RULES_PATH)
+    chave = (path, path.stat().st_mtime_ns)
+    if chave not in _carregados:
+        config = json.loads(path.read_text(encoding="utf-8"))
+        _carregados.clear()
+        _carregados[chave] = VendorNormalizer(
+            config["regras"], config.get("remover_sufixo", r"\s+\d+$"), config.get("vazio", "Sem Contrato"),
+        )
+    return _carregados[chave]
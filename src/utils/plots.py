@@ -1,59 +1,33 @@
 import plotly.express as px
-import pandas as pd
+import plotly.graph_objects as go
 from datetime import datetime
-from src.utils.formatters import formatar_brl
+from src.utils.formatters import formatar_brl_serie
 
-def plot_despesa_mensal(df):
-    df_agrupado = df.groupby(['mes', 'mes_nome'], observed=True)['valor'].sum().reset_index()
-    df_agrupado = df_agrupado.sort_values('mes')
-    df_agrupado['TextoValor'] = df_agrupado['valor'].apply(formatar_brl)
+def plot_despesa_mensal(df_agrupado):
+    df_agrupado = df_agrupado.assign(TextoValor=formatar_brl_serie(df_agrupado['valor']))
     fig = px.bar(df_agrupado, x='mes_nome', y='valor', title='Despesas Mensais', labels={"mes_nome": "Mês", "valor": "Total R$"}, text='TextoValor')
     fig.update_traces(textposition='outside', textangle=0)
     return fig
 
-def plot_total_estabelecimento_bar(df):
-    df_agrupado = df.groupby('estabelecimento', observed=True)['valor'].sum().reset_index().sort_values('valor')
-    df_agrupado['TextoValor'] = df_agrupado['valor'].apply(formatar_brl)
+def plot_total_estabelecimento_bar(df_agrupado):
+    df_agrupado = df_agrupado.assign(TextoValor=formatar_brl_serie(df_agrupado['valor']))
     fig = px.bar(df_agrupado, x='valor', y='estabelecimento', orientation='h', title='Total por Estabelecimento', labels={"estabelecimento": "Estabelecimento", "valor": "Total R$"}, text='TextoValor', color="estabelecimento", color_discrete_sequence=px.colors.sequential.Viridis)
     return fig
 
-def plot_classificacao(df):
-    df_agrupado = df.groupby('classificacao', observed=True)['valor'].sum().reset_index()
-    df_agrupado['TextoValor'] = df_agrupado['valor'].apply(formatar_brl)
+def plot_classificacao(df_agrupado):
+    df_agrupado = df_agrupado.assign(TextoValor=formatar_brl_serie(df_agrupado['valor']))
     fig = px.bar(df_agrupado, x='classificacao', y='valor', title='Despesas por Classificação', labels={"classificacao": "Classificação", "valor": "Total R$"}, text='TextoValor')
     fig.update_traces(textposition='outside', textangle=0)
     return fig
 
-def plot_top_prestadores(df):
-    df_agrupado = df.groupby('contrato', observed=True)['valor'].sum().nlargest(10).sort_values().reset_index()
-    df_agrupado['TextoValor'] = df_agrupado['valor'].apply(formatar_brl)
+def plot_top_prestadores(df_agrupado):
+    df_agrupado = df_agrupado.assign(TextoValor=formatar_brl_serie(df_agrupado['valor']))
     fig = px.bar(df_agrupado, x='valor', y='contrato', orientation='h', title='Top 10 Prestadores', labels={"contrato": "Prestador", "valor": "Total R$"}, text='TextoValor')
     return fig
 
-def plot_faturamento_hcompany(df, dash_ano_selecionado):
-    from src.utils.stamp import mes_dict
-
-    df_hcompany = df[
-        (df['contrato'].str.startswith("HCOMPANY")) &
-        (df['ano'].isin(dash_ano_selecionado)) &
-        (df['status'] == 'LANÇADO')
-    ]
-
-    df_agrupado = df_hcompany.groupby(['mes', 'mes_nome'], observed=True)['valor'].sum().reset_index()
-
-    meses_completos = pd.DataFrame({
-        'mes_nome': list(mes_dict.keys()),
-        'mes': list(mes_dict.values())
-    })
-
-    df_completo = meses_completos.merge(df_agrupado, on=['mes', 'mes_nome'], how='left')
-    df_completo['valor'] = df_completo['valor'].fillna(0)
-    
-    df_completo = df_completo.sort_values('mes')
-
-    
+def plot_faturamento_hcompany(df_agrupado):
     fig = px.line(
-        df_completo, 
+        df_agrupado, 
         x='mes_nome', 
         y='valor', 
         title='Faturamento HCOMPANY', 
@@ -62,23 +36,27 @@ def plot_faturamento_hcompany(df, dash_ano_selecionado):
     )
     return fig
 
-def plot_gantt_contratos(contratos_df):
-    contratos = contratos_df.copy()
-    contratos["inicio"] = pd.to_datetime(contratos["inicio"])
-    contratos["termino"] = pd.to_datetime(contratos["termino"])
+def plot_gantt_contratos(barras, titulo="Cronograma de Vigência de Contratos"):
+    """
+    Gantt em um único trace WebGL (Scattergl): cada barra é um segmento de linha grossa entre
+    início e término, separado dos outros por None. A altura acompanha o número de barras, com teto.
+    """
+    x, y, texto = [], [], []
+    for rotulo, inicio, termino, contratos in barras[["rotulo", "inicio", "termino", "contratos"]].itertuples(index=False):
+        detalhe = f"{rotulo}<br>{inicio:%d/%m/%Y} a {termino:%d/%m/%Y}"
+        if contratos > 1:
+            detalhe += f"<br>{contratos} contratos"
+        x += [inicio, termino, None]
+        y += [rotulo, rotulo, None]
+        texto += [detalhe, detalhe, None]
+
+    altura = min(900, max(300, 26 * len(barras) + 120))
+    fig = go.Figure(go.Scattergl(
+        x=x, y=y, mode="lines", text=texto, hoverinfo="text",
+        line=dict(width=max(6, min(18, 500 // max(len(barras), 1))), color=px.colors.sequential.Viridis[5]),
+    ))
+    fig.update_layout(title=titulo, height=altura, showlegend=False, margin=dict(l=10, r=10, t=60, b=30))
 
-    df_gantt = contratos.dropna(subset=["inicio", "termino"])
-    
-    fig = px.timeline(
-        df_gantt, 
-        x_start="inicio", 
-        x_end="termino", 
-        y="contrato",   
-        color_discrete_sequence=px.colors.sequential.Viridis[2:],
-        title="Cronograma de Vigência de Contratos",
-        height=1400,
-        width=1900
-    )
     hoje = datetime.now()
     fig.add_vline(
         x=hoje,
@@ -96,5 +74,5 @@ def plot_gantt_contratos(contratos_df):
         align="center"
     )
 
-    fig.update_yaxes(autorange="reversed")
-    return fig
\ No newline at end of file
+    fig.update_yaxes(autorange="reversed", type="category")
+    return fig
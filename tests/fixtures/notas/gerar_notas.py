@@ -0,0 +1,125 @@
+"""
+Gera os PDFs de notas usados em tests/test_local_extractor.py.
+
+    python tests/fixtures/notas/gerar_notas.py
+
+Layouts reduzidos das prefeituras atendidas (só os rótulos que o extrator lê, na ordem em que
+aparecem na nota real), com dados fictícios. `escaneada.pdf` tem só imagem, sem camada de texto.
+"""
+import zlib
+from pathlib import Path
+
+PASTA = Path(__file__).parent
+
+NOTAS = {
+    "sao_paulo.pdf": [
+        "PREFEITURA DO MUNICÍPIO DE SÃO PAULO",
+        "SECRETARIA MUNICIPAL DA FAZENDA",
+        "NOTA FISCAL ELETRÔNICA DE SERVIÇOS - NFS-e",
+        "Número da Nota",
+        "00012345",
+        "Data e Hora de Emissão 05/11/2026 10:00:00",
+        "Código de Verificação ABCD-1234",
+        "RPS Nº 987 Série 1, emitido em 05/11/2026",
+        "PRESTADOR DE SERVIÇOS",
+        "CPF/CNPJ: 12.345.678/0001-90",
+        "Nome/Razão Social: INGRAM MICRO BRASIL LTDA",
+        "TOMADOR DE SERVIÇOS",
+        "CPF/CNPJ: 98.765.432/0001-10",
+        "Nome/Razão Social: HCOMPANY",
+        "VALOR TOTAL DA NOTA = R$ 12.345,67",
+    ],
+    "barueri.pdf": [
+        "PREFEITURA MUNICIPAL DE BARUERI",
+        "NOTA FISCAL ELETRÔNICA DE SERVIÇOS",
+        "RPS Nº 000120343",
+        "Número da Nota 116321",
+        "Prestador de Serviços",
+        "Razão Social: INGRAM MICRO",
+        "CNPJ 11.222.333/0001-44",
+        "Tomador de Serviços",
+        "CNPJ 98.765.432/0001-10",
+        "Valor Líquido R$ 4.200,00",
+        "Valor Total da Nota R$ 4.500,00",
+    ],
+    "nota_carioca.pdf": [
+        "PREFEITURA DA CIDADE DO RIO DE JANEIRO",
+        "NOTA CARIOCA",
+        "Número da Nota 00002871",
+        "PRESTADOR DE SERVIÇOS",
+        "Razão Social: SERVICOS CARIOCAS LTDA",
+        "CNPJ: 33.444.555/0001-66",
+        "TOMADOR DE SERVIÇOS",
+        "CNPJ: 98.765.432/0001-10",
+        "Valor Líquido R$ 2.100,00",
+        "Valor dos Serviços R$ 2.300,00",
+    ],
+    "danfse.pdf": [
+        "DANFSe v1.0",
+        "Documento Auxiliar da NFS-e",
+        "Número da NFS-e 871",
+        "EMITENTE DA NFS-e / PRESTADOR",
+        "CNPJ 44.555.666/0001-77",
+        "Nome / Nome Empresarial: NUVEM SOLUCOES DIGITAIS LTDA",
+        "TOMADOR DO SERVIÇO",
+        "CNPJ 98.765.432/0001-10",
+        "Valor Líquido da NFS-e R$ 931,00",
+        "Valor Total do Serviço R$ 980,00",
+    ],
+}
+
+
+def _montar(objetos: list) -> bytes:
+    saida = b"%PDF-1.4\n"
+    posicoes = []
+    for i, objeto in enumerate(objetos, 1):
+        posicoes.append(len(saida))
+        saida += b"%d 0 obj\n" % i + objeto + b"\nendobj\n"
+    xref = len(saida)
+    saida += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    saida += b"".join(b"%010d 00000 n \n" % p for p in posicoes)
+    saida += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, xref)
+    return saida
+
+
+def _stream(dicionario: bytes, dados: bytes) -> bytes:
+    return b"<< " + dicionario + b" /Length %d >>\nstream\n" % len(dados) + dados + b"\nendstream"
+
+
+def pdf_texto(linhas: list) -> bytes:
+    """Uma página A4 com as linhas em Helvetica (WinAnsi), uma abaixo da outra."""
+    def escapar(t):
+        return t.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    corpo = "BT /F1 10 Tf 40 800 Td 14 TL " + " ".join(f"({escapar(l)}) '" for l in linhas) + " ET"
+    return _montar([
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents 4 0 R /Resources << /Font << /F1 5 0 R >> >> >>",
+        _stream(b"", corpo.encode("cp1252")),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ])
+
+
+def pdf_escaneado(largura: int = 64, altura: int = 32) -> bytes:
+    """Uma página só com imagem (listras em tons de cinza), como sai de um scanner."""
+    pixels = bytes((x * 4 + y * 2) % 256 for y in range(altura) for x in range(largura))
+    imagem = _stream(
+        b"/Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /FlateDecode"
+        % (largura, altura),
+        zlib.compress(pixels),
+    )
+    return _montar([
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents 4 0 R /Resources << /XObject << /Im1 5 0 R >> >> >>",
+        _stream(b"", b"q 515 0 0 762 40 40 cm /Im1 Do Q"),
+        imagem,
+    ])
+
+
+if __name__ == "__main__":
+    for nome, linhas in NOTAS.items():
+        (PASTA / nome).write_bytes(pdf_texto(linhas))
+    (PASTA / "escaneada.pdf").write_bytes(pdf_escaneado())
+    print(f"{len(NOTAS) + 1} PDFs gravados em {PASTA}")
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.services.conciliacao_service import SCORE_MINIMO, casar_notas
+
+CONTRATOS = pd.DataFrame([
+    {"id": 1, "contrato": "INGRAM 1", "cnpj": "12.345.678/0001-90"},
+    {"id": 2, "contrato": "TOTVS", "cnpj": "53.113.791/0001-22"},
+    {"id": 3, "contrato": "CLARO", "cnpj": "40.432.544/0001-47"},
+])
+
+
+def _parcelas(linhas):
+    return pd.DataFrame(linhas, columns=["id", "contrato_id", "contrato", "valor", "status", "ano", "mes"])
+
+
+PARCELAS = _parcelas([
+    (10, 1, "INGRAM 1", np.nan, "ABERTO", 2026, 11),
+    (20, 2, "TOTVS", 1000.0, "ABERTO", 2026, 11),
+    (30, 3, "CLARO", 500.0, "ABERTO", 2026, 11),
+])
+
+
+def _nota(arquivo, cnpj="", nome="", valor=0.0, **extra):
+    return {"arquivo": arquivo, "numero_doc": "1", "valor_doc": valor, "cnpj_emitente": cnpj, "nome_emitente": nome, **extra}
+
+
+def _por_arquivo(casamento):
+    return casamento.set_index("arquivo")
+
+
+def test_cnpj_e_nome_casam_com_a_parcela_do_contrato():
+    notas = [
+        _nota("ingram.pdf", "12345678000190", "INGRAM MICRO BRASIL LTDA", 750.0),
+        _nota("totvs.pdf", "53.113.791/0001-22", "TOTVS S/A", 1000.0),
+    ]
+    r = _por_arquivo(casar_notas(notas, PARCELAS, CONTRATOS))
+    assert r.loc["ingram.pdf", "id"] == 10
+    assert r.loc["ingram.pdf", "score"] == pytest.approx(0.8)
+    assert r.loc["totvs.pdf", "id"] == 20
+    assert r.loc["totvs.pdf", "score"] == pytest.approx(1.0)
+    assert (r["problema"] == "").all()
+
+
+def test_so_o_valor_nao_basta():
+    # Valor idêntico ao da parcela da CLARO, mas emitente desconhecido: score 0.2 < SCORE_MINIMO.
+    r = casar_notas([_nota("avulsa.pdf", "99999999000199", "FORNECEDOR QUALQUER", 500.0)], PARCELAS, CONTRATOS)
+    assert 0.2 < SCORE_MINIMO
+    assert r.loc[0, "id"] is None
+    assert r.loc[0, "problema"] == "Nenhuma parcela em aberto compatível."
+
+
+def test_nome_e_valor_sem_cnpj_passam_do_minimo():
+    r = casar_notas([_nota("claro.pdf", "", "CLARO S.A.", 500.0)], PARCELAS, CONTRATOS)
+    assert r.loc[0, "id"] == 30
+    assert r.loc[0, "score"] == pytest.approx(0.5)
+
+
+def test_guloso_um_para_um():
+    # Duas notas da TOTVS para uma única parcela: fica com a de maior score (valor mais próximo).
+    notas = [
+        _nota("totvs_longe.pdf", "53113791000122", "TOTVS", 400.0),
+        _nota("totvs_perto.pdf", "53113791000122", "TOTVS", 990.0),
+    ]
+    r = _por_arquivo(casar_notas(notas, PARCELAS, CONTRATOS))
+    assert r.loc["totvs_perto.pdf", "id"] == 20
+    assert r.loc["totvs_longe.pdf", "id"] is None
+    assert r.loc["totvs_longe.pdf", "problema"] == "Nenhuma parcela em aberto compatível."
+
+
+def test_cada_parcela_recebe_no_maximo_uma_nota():
+    parcelas = _parcelas([(20, 2, "TOTVS", 1000.0, "ABERTO", 2026, 11), (21, 2, "TOTVS", 2000.0, "ABERTO", 2026, 11)])
+    notas = [_nota(f"totvs_{v}.pdf", "53113791000122", "TOTVS", float(v)) for v in (2000, 1000)]
+    r = _por_arquivo(casar_notas(notas, parcelas, CONTRATOS))
+    assert r.loc["totvs_1000.pdf", "id"] == 20
+    assert r.loc["totvs_2000.pdf", "id"] == 21
+
+
+def test_referencia_usada_quando_a_parcela_nao_tem_valor():
+    referencias = pd.Series({"INGRAM 1": 750.0})
+    nota = _nota("ingram.pdf", "12345678000190", "INGRAM", 750.0)
+    r = casar_notas([nota], PARCELAS, CONTRATOS, referencias)
+    assert r.loc[0, "score"] == pytest.approx(1.0)
+
+
+def test_nota_com_erro_nao_casa():
+    nota = _nota("erro.pdf", "12345678000190", "INGRAM", 750.0, error="Falha na API Gemini: timeout")
+    r = casar_notas([nota], PARCELAS, CONTRATOS)
+    assert r.loc[0, "id"] is None
+    assert r.loc[0, "problema"] == "Falha na API Gemini: timeout"
+
+
+def test_sem_parcelas_em_aberto():
+    r = casar_notas([_nota("a.pdf", "12345678000190", "INGRAM", 1.0)], PARCELAS.iloc[0:0], CONTRATOS)
+    assert r.loc[0, "problema"] == "Sem parcela em aberto para casar."
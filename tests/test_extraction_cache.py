@@ -0,0 +1,89 @@
+import os
+import hashlib
+import pytest
+from src.core.extraction_cache import ExtractionCache, content_key
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ExtractionCache(tmp_path / "extracoes")
+
+
+def _envelhecer(cache, chave, segundos):
+    """Recua o mtime da entrada (o LRU do cache é pelo mtime)."""
+    arquivo = cache._arquivo(chave)
+    instante = arquivo.stat().st_mtime - segundos
+    os.utime(arquivo, (instante, instante))
+
+
+def test_content_key_e_sha256_do_conteudo_com_a_versao():
+    assert content_key(b"pdf", "v1") == hashlib.sha256(b"v1\0pdf").hexdigest()
+    assert content_key(b"pdf", "v1") != content_key(b"pdf", "v2")
+    assert content_key(b"pdf", "v1") != content_key(b"pdf2", "v1")
+
+
+def test_get_or_extract_acerto_e_falta(cache):
+    chamadas = []
+
+    def extrair():
+        chamadas.append(1)
+        return {"numero_doc": "123", "valor_doc": 10.0}
+
+    assert cache.get_or_extract(b"pdf", "v1", extrair) == {"numero_doc": "123", "valor_doc": 10.0}
+    assert cache.get_or_extract(b"pdf", "v1", extrair) == {"numero_doc": "123", "valor_doc": 10.0}
+    assert len(chamadas) == 1
+    cache.get_or_extract(b"pdf", "v2", extrair)
+    assert len(chamadas) == 2
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entradas"]) == (1, 2, 2)
+    assert stats["taxa_acerto"] == pytest.approx(1 / 3)
+
+
+def test_entrada_persistida_em_disco(cache):
+    cache.get_or_extract(b"pdf", "v1", lambda: {"numero_doc": "1"})
+    outro = ExtractionCache(cache.path)
+    assert outro.get(content_key(b"pdf", "v1")) == {"numero_doc": "1"}
+    assert cache._arquivo(content_key(b"pdf", "v1")).exists()
+
+
+def test_erro_nao_fica_em_cache(cache):
+    chamadas = []
+
+    def falhar():
+        chamadas.append(1)
+        return {"error": "timeout", "numero_doc": "", "valor_doc": 0.0}
+
+    cache.get_or_extract(b"pdf", "v1", falhar)
+    cache.get_or_extract(b"pdf", "v1", falhar)
+    assert len(chamadas) == 2
+    assert cache.stats()["entradas"] == 0
+
+
+def test_evicao_abaixo_do_limite_pelas_menos_usadas(tmp_path):
+    resultado = {"nome_emitente": "X" * 200}
+    cache = ExtractionCache(tmp_path / "extracoes", max_bytes=10**9)
+    chaves = [content_key(f"pdf{i}".encode(), "v1") for i in range(4)]
+    for i, chave in enumerate(chaves):
+        cache.put(chave, resultado)
+        _envelhecer(cache, chave, 100 - i)
+    # A contagem em memória bate com o disco (a primeira entrada não é somada duas vezes).
+    assert cache.stats()["bytes"] == sum(cache._arquivo(c).stat().st_size for c in chaves)
+    por_entrada = cache.stats()["bytes"] // 4
+
+    # A mais antiga é lida: vira a mais recente e sobrevive à evicção.
+    assert cache.get(chaves[0]) == resultado
+    cache.max_bytes = por_entrada * 4
+    cache.put(content_key(b"pdf_novo", "v1"), resultado)
+
+    assert cache.stats()["bytes"] <= cache.max_bytes * 0.9
+    assert cache.get(chaves[0]) == resultado
+    assert cache.get(chaves[1]) is None
+    assert cache.get(chaves[2]) is None
+
+
+def test_clear(cache):
+    cache.get_or_extract(b"pdf", "v1", lambda: {"numero_doc": "1"})
+    cache.clear()
+    assert cache.stats()["entradas"] == 0
+    assert cache.stats()["bytes"] == 0
@@ -0,0 +1,157 @@
+import json
+import time
+import threading
+import pytest
+from src.utils.extraction_client import CircuitBreaker, ExtractionClient, LatencyHistogram
+
+
+class ClienteFake:
+    """`plano[modelo] = (atraso_s, falha)`; registra a ordem das chamadas."""
+
+    def __init__(self, plano):
+        self.plano = plano
+        self.chamadas = []
+        self._lock = threading.Lock()
+
+    def generate(self, modelo, pdf_bytes, prompt):
+        with self._lock:
+            self.chamadas.append(modelo)
+        atraso, falha = self.plano[modelo]
+        time.sleep(atraso)
+        if falha:
+            raise RuntimeError(f"{modelo} indisponível")
+        return json.dumps({"numero_doc": modelo, "valor_doc": 1.0})
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 0.0
+
+    def __call__(self):
+        return self.agora
+
+
+def _extrator(plano, modelos=("a", "b"), **kwargs):
+    cliente = ClienteFake(plano)
+    return ExtractionClient(cliente, modelos, **kwargs), cliente
+
+
+def test_primeiro_modelo_responde():
+    extrator, cliente = _extrator({"a": (0, False), "b": (0, False)}, timeout=1, orcamento=2)
+    r = extrator.extract(b"pdf", "prompt")
+    assert (r["numero_doc"], r["origem"], r["modelo"]) == ("a", "gemini", "a")
+    assert cliente.chamadas == ["a"]
+
+
+def test_erro_passa_para_o_proximo_modelo():
+    extrator, cliente = _extrator({"a": (0, True), "b": (0, False)}, timeout=1, orcamento=2)
+    assert extrator.extract(b"pdf", "prompt")["modelo"] == "b"
+    assert cliente.chamadas == ["a", "b"]
+    assert extrator.stats()["latencia"]["a"]["desfechos"] == {"erro": 1}
+
+
+def test_timeout_passa_para_o_proximo_modelo():
+    extrator, cliente = _extrator({"a": (2, False), "b": (0, False)}, timeout=0.2, orcamento=1.5)
+    inicio = time.monotonic()
+    r = extrator.extract(b"pdf", "prompt")
+    assert r["modelo"] == "b"
+    assert time.monotonic() - inicio < 1
+    assert extrator.stats()["latencia"]["a"]["desfechos"] == {"timeout": 1}
+
+
+def test_hedge_dispara_segunda_chamada_e_vale_a_primeira_resposta():
+    extrator, cliente = _extrator({"a": (1, False), "b": (0.05, False)}, timeout=2, orcamento=3, hedge_apos=0.1)
+    inicio = time.monotonic()
+    r = extrator.extract(b"pdf", "prompt")
+    assert r["modelo"] == "b"
+    assert cliente.chamadas == ["a", "b"]
+    assert time.monotonic() - inicio < 0.8
+
+
+def test_hedge_no_mesmo_modelo_quando_e_o_ultimo():
+    extrator, cliente = _extrator({"a": (0.3, False)}, modelos=("a",), timeout=2, orcamento=3, hedge_apos=0.1)
+    assert extrator.extract(b"pdf", "prompt")["modelo"] == "a"
+    assert cliente.chamadas == ["a", "a"]
+
+
+def test_orcamento_esgotado_nao_conta_como_falha():
+    extrator, cliente = _extrator({"a": (2, False), "b": (2, False)}, timeout=1.5, orcamento=0.2)
+    inicio = time.monotonic()
+    r = extrator.extract(b"pdf", "prompt")
+    assert "orçamento de 0.2s esgotado" in r["error"]
+    assert (r["numero_doc"], r["valor_doc"]) == ("", 0.0)
+    assert time.monotonic() - inicio < 1
+    assert cliente.chamadas == ["a"]
+    assert extrator.stats()["latencia"]["a"]["desfechos"] == {"orcamento": 1}
+    assert extrator.stats()["circuitos"] == {}
+
+
+def test_circuito_aberto_pula_o_modelo():
+    relogio = Relogio()
+    breaker = CircuitBreaker(limite=2, pausa=60, clock=relogio)
+    extrator, cliente = _extrator({"a": (0, True), "b": (0, False)}, timeout=1, orcamento=2, breaker=breaker)
+    for _ in range(3):
+        assert extrator.extract(b"pdf", "prompt")["modelo"] == "b"
+    assert cliente.chamadas == ["a", "b", "a", "b", "b"]
+    assert breaker.estado()["a"] == {"falhas_seguidas": 2, "aberto": True}
+
+
+def test_todos_os_circuitos_abertos():
+    breaker = CircuitBreaker(limite=1, pausa=60, clock=Relogio())
+    breaker.falha("a")
+    breaker.falha("b")
+    extrator, cliente = _extrator({"a": (0, False), "b": (0, False)}, timeout=1, orcamento=2, breaker=breaker)
+    assert "circuito aberto" in extrator.extract(b"pdf", "prompt")["error"]
+    assert cliente.chamadas == []
+
+
+def test_circuit_breaker_aberto_meio_aberto_fechado():
+    relogio = Relogio()
+    breaker = CircuitBreaker(limite=2, pausa=10, clock=relogio)
+    breaker.falha("a")
+    assert breaker.permite("a")
+    breaker.falha("a")
+    assert not breaker.permite("a")
+
+    relogio.agora = 10
+    assert breaker.permite("a")          # meio-aberto: uma chamada de teste
+    assert not breaker.permite("a")      # e só uma
+    breaker.falha("a")
+    relogio.agora = 15
+    assert not breaker.permite("a")      # falha no teste reabre
+
+    relogio.agora = 20
+    assert breaker.permite("a")
+    breaker.sucesso("a")
+    assert breaker.permite("a") and breaker.permite("a")
+    assert breaker.estado()["a"] == {"falhas_seguidas": 0, "aberto": False}
+
+
+def test_meio_aberto_nao_gasta_o_teste_de_modelo_nao_chamado():
+    relogio = Relogio()
+    breaker = CircuitBreaker(limite=1, pausa=10, clock=relogio)
+    breaker.falha("b")
+    relogio.agora = 10
+    extrator, cliente = _extrator({"a": (0, False), "b": (0, False)}, timeout=1, orcamento=2, breaker=breaker)
+    assert extrator.extract(b"pdf", "prompt")["modelo"] == "a"
+    assert breaker.permite("b")
+
+
+def test_latency_histogram_percentis():
+    histograma = LatencyHistogram(baldes=(0.5, 1, 2))
+    for segundos in [0.1] * 90 + [1.5] * 9 + [3.0]:
+        histograma.observe("a", segundos)
+    histograma.observe("a", 0.2, "erro")
+    resumo = histograma.snapshot()["a"]
+    assert resumo["chamadas"] == 101
+    assert resumo["p50_s"] == 0.5
+    assert resumo["p95_s"] == 2
+    assert resumo["baldes"] == {"<=0.5s": 91, "<=1s": 0, "<=2s": 9, ">2s": 1}
+    assert resumo["desfechos"] == {"ok": 100, "erro": 1}
+    assert resumo["media_s"] == pytest.approx((9 + 13.5 + 3 + 0.2) / 101)
+
+
+def test_latency_histogram_cauda_acima_do_ultimo_balde():
+    histograma = LatencyHistogram(baldes=(1,))
+    histograma.observe("a", 5)
+    assert histograma.snapshot()["a"]["p95_s"] == float("inf")
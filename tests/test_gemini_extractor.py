@@ -0,0 +1,93 @@
+import io
+import json
+import time
+import threading
+import pytest
+from src.core.extraction_cache import ExtractionCache
+from src.utils.gemini_extractor import process_invoices
+
+
+class ModeloLento:
+    """Devolve o conteúdo do "PDF" como numero_doc, com atraso por arquivo, e mede a concorrência."""
+
+    def __init__(self, atrasos=None):
+        self.atrasos = atrasos or {}
+        self.chamadas = []
+        self.em_curso = 0
+        self.pico = 0
+        self._lock = threading.Lock()
+
+    def generate(self, modelo, pdf_bytes, prompt):
+        conteudo = pdf_bytes.decode()
+        with self._lock:
+            self.chamadas.append(conteudo)
+            self.em_curso += 1
+            self.pico = max(self.pico, self.em_curso)
+        try:
+            time.sleep(self.atrasos.get(conteudo, 0.05))
+        finally:
+            with self._lock:
+                self.em_curso -= 1
+        return json.dumps({"numero_doc": conteudo, "valor_doc": 1.0})
+
+
+def _arquivo(nome: str, conteudo: str):
+    arquivo = io.BytesIO(conteudo.encode())
+    arquivo.name = nome
+    return arquivo
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ExtractionCache(tmp_path / "extracoes")
+
+
+def test_resultados_na_ordem_dos_arquivos(cache):
+    # O primeiro termina por último: a ordem de saída continua a de entrada.
+    modelo = ModeloLento({"n1": 0.3, "n2": 0.1, "n3": 0.0})
+    arquivos = [_arquivo(f"{n}.pdf", n) for n in ("n1", "n2", "n3")]
+    resultados = process_invoices(arquivos, modelo, max_workers=3, cache=cache)
+    assert [r["arquivo"] for r in resultados] == ["n1.pdf", "n2.pdf", "n3.pdf"]
+    assert [r["numero_doc"] for r in resultados] == ["n1", "n2", "n3"]
+
+
+def test_conteudo_repetido_extraido_uma_vez(cache):
+    modelo = ModeloLento()
+    arquivos = [_arquivo("a.pdf", "x"), _arquivo("b.pdf", "y"), _arquivo("a_copia.pdf", "x")]
+    resultados = process_invoices(arquivos, modelo, cache=cache)
+    assert sorted(modelo.chamadas) == ["x", "y"]
+    assert [(r["arquivo"], r["numero_doc"]) for r in resultados] == [("a.pdf", "x"), ("b.pdf", "y"), ("a_copia.pdf", "x")]
+
+
+def test_concorrencia_limitada_e_paralela(cache):
+    modelo = ModeloLento({f"n{i}": 0.15 for i in range(6)})
+    arquivos = [_arquivo(f"n{i}.pdf", f"n{i}") for i in range(6)]
+    inicio = time.monotonic()
+    process_invoices(arquivos, modelo, max_workers=2, cache=cache)
+    assert modelo.pico == 2
+    # 6 arquivos de 0.15s com 2 ao mesmo tempo: ~0.45s, bem menos que a soma (0.9s).
+    assert time.monotonic() - inicio < 0.8
+
+
+def test_on_result_por_arquivo_na_thread_de_quem_chamou(cache):
+    vistos = []
+    chamador = threading.get_ident()
+
+    def on_result(i, nome, resultado):
+        vistos.append((i, nome, resultado["numero_doc"], threading.get_ident() == chamador))
+
+    arquivos = [_arquivo("a.pdf", "x"), _arquivo("b.pdf", "x"), _arquivo("c.pdf", "z")]
+    process_invoices(arquivos, ModeloLento(), on_result=on_result, cache=cache)
+    assert sorted(vistos) == [(0, "a.pdf", "x", True), (1, "b.pdf", "x", True), (2, "c.pdf", "z", True)]
+
+
+def test_falha_de_um_arquivo_nao_derruba_o_lote(cache):
+    class Quebra(ModeloLento):
+        def generate(self, modelo, pdf_bytes, prompt):
+            if pdf_bytes == b"ruim":
+                raise RuntimeError("arquivo ilegível")
+            return super().generate(modelo, pdf_bytes, prompt)
+
+    resultados = process_invoices([_arquivo("ok.pdf", "bom"), _arquivo("ruim.pdf", "ruim")], Quebra(), cache=cache)
+    assert resultados[0]["numero_doc"] == "bom" and not resultados[0].get("error")
+    assert "arquivo ilegível" in resultados[1]["error"]
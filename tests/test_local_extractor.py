@@ -0,0 +1,111 @@
+import json
+from pathlib import Path
+import pytest
+from src.core.extraction_cache import ExtractionCache
+from src.utils.gemini_extractor import extract_invoice
+from src.utils.local_extractor import LIMIAR_CONFIANCA, extract_local, extract_text_fields, pdf_text
+
+NOTAS = Path(__file__).parent / "fixtures" / "notas"
+
+
+def _nota(nome: str) -> bytes:
+    return (NOTAS / nome).read_bytes()
+
+
+class ModeloFake:
+    """Client de modelo que conta as chamadas e devolve sempre a mesma leitura."""
+
+    def __init__(self, resposta=None, falha: bool = False):
+        self.resposta = resposta or {"numero_doc": "999", "valor_doc": 1.0, "cnpj_emitente": "", "nome_emitente": "MODELO"}
+        self.falha = falha
+        self.chamadas = 0
+
+    def generate(self, modelo, pdf_bytes, prompt):
+        self.chamadas += 1
+        if self.falha:
+            raise RuntimeError("indisponível")
+        return json.dumps(self.resposta)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ExtractionCache(tmp_path / "extracoes")
+
+
+@pytest.mark.parametrize("arquivo, municipio, numero, valor, cnpj, nome, confianca", [
+    ("sao_paulo.pdf", "sao_paulo", "12345", 12345.67, "12.345.678/0001-90", "INGRAM MICRO BRASIL LTDA", 1.0),
+    # RPS longo antes da nota, líquido antes do total: fica a nota curta e o total.
+    ("barueri.pdf", "barueri", "116321", 4500.0, "11.222.333/0001-44", "INGRAM MICRO", 1.0),
+    # Só valor dos serviços (genérico) e líquido impresso antes dele: vale o dos serviços.
+    ("nota_carioca.pdf", "rio_de_janeiro", "2871", 2300.0, "33.444.555/0001-66", "SERVICOS CARIOCAS LTDA", 0.85),
+    ("danfse.pdf", "nacional", "871", 980.0, "44.555.666/0001-77", "NUVEM SOLUCOES DIGITAIS LTDA", 1.0),
+])
+def test_extract_local_notas(arquivo, municipio, numero, valor, cnpj, nome, confianca):
+    r = extract_local(_nota(arquivo))
+    assert r["municipio"] == municipio
+    assert r["numero_doc"] == numero
+    assert r["valor_doc"] == pytest.approx(valor)
+    assert r["cnpj_emitente"] == cnpj
+    assert r["nome_emitente"] == nome
+    assert r["confianca"] == pytest.approx(confianca)
+    assert r["confianca"] >= LIMIAR_CONFIANCA
+    assert r["origem"] == "local"
+
+
+def test_extract_local_escaneada_sem_texto():
+    dados = _nota("escaneada.pdf")
+    assert pdf_text(dados).strip() == ""
+    r = extract_local(dados)
+    assert (r["numero_doc"], r["valor_doc"], r["confianca"]) == ("", 0.0, 0.0)
+
+
+def test_extract_local_bytes_invalidos():
+    assert extract_local(b"nao e um pdf")["confianca"] == 0.0
+
+
+def test_valor_liquido_nao_conta_na_confianca():
+    r = extract_text_fields("PREFEITURA DO MUNICÍPIO DE SÃO PAULO\nNúmero da Nota 123\nValor Líquido R$ 1.250,00")
+    assert r["numero_doc"] == "123"
+    assert r["valor_doc"] == pytest.approx(1250.0)
+    assert r["confianca"] == pytest.approx(0.5)
+    assert r["confianca"] < LIMIAR_CONFIANCA
+
+
+def test_valor_ambiguo_penaliza():
+    texto = "Número da Nota 123\nNOTA CARIOCA\nValor dos Serviços R$ 100,00\nValor do Serviço R$ 200,00"
+    r = extract_text_fields(texto)
+    assert r["valor_doc"] == pytest.approx(100.0)
+    assert r["confianca"] == pytest.approx(0.5 + 0.35 - 0.15)
+
+
+def test_extract_invoice_confiante_nao_chama_modelo(cache):
+    modelo = ModeloFake()
+    r = extract_invoice(_nota("danfse.pdf"), modelo, cache)
+    assert r["origem"] == "local"
+    assert modelo.chamadas == 0
+
+
+def test_extract_invoice_escaneada_vai_ao_modelo(cache):
+    modelo = ModeloFake()
+    r = extract_invoice(_nota("escaneada.pdf"), modelo, cache)
+    assert r["origem"] == "gemini"
+    assert r["numero_doc"] == "999"
+    assert modelo.chamadas == 1
+    # Mesmo conteúdo: vem do cache, sem nova chamada.
+    extract_invoice(_nota("escaneada.pdf"), modelo, cache)
+    assert modelo.chamadas == 1
+
+
+def test_extract_invoice_limiar_maior_vai_ao_modelo(cache):
+    modelo = ModeloFake()
+    r = extract_invoice(_nota("nota_carioca.pdf"), modelo, cache, limiar=0.9)
+    assert r["origem"] == "gemini"
+    assert modelo.chamadas == 1
+
+
+def test_extract_invoice_modelo_falha_mantem_leitura_local(cache):
+    modelo = ModeloFake(falha=True)
+    r = extract_invoice(_nota("nota_carioca.pdf"), modelo, cache, limiar=0.9)
+    assert r["error"]
+    assert r["numero_doc"] == "2871"
+    assert r["valor_doc"] == pytest.approx(2300.0)